@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from app.db.postgres import fetch
+from app.metrics import anomaly_dedup_index_size
+from app.utils.time import ensure_utc, utcnow
+
+# A candidate is a duplicate of the latest anomaly on the same metric when that
+# one's window ended within the horizon and the severities are this close.
+DEDUP_HORIZON = timedelta(minutes=8)
+DEDUP_SEVERITY_DELTA = 8
+
+
+@dataclass(frozen=True)
+class RecentAnomaly:
+    anomaly_id: str
+    severity: int
+    window_end: datetime
+
+
+def is_duplicate(latest: RecentAnomaly | None, severity: int, now: datetime) -> bool:
+    if latest is None or latest.window_end < now - DEDUP_HORIZON:
+        return False
+    return abs(latest.severity - severity) <= DEDUP_SEVERITY_DELTA
+
+
+# Latest anomaly per (workspace, metric) inside the dedup horizon, so the detection
+# hot path needs no dedup query. Only the worker inserts anomalies and each metric
+# is detected by exactly one replica (its hash-ring owner), so the owner's index
+# is authoritative; it is re-warmed from Postgres whenever ownership moves.
+class RecentAnomalyIndex:
+    def __init__(self) -> None:
+        self._latest: dict[tuple[str, str], RecentAnomaly] = {}
+
+    def __len__(self) -> int:
+        return len(self._latest)
+
+    def get(self, workspace_id: str, metric_name: str) -> RecentAnomaly | None:
+        return self._latest.get((workspace_id, metric_name))
+
+    def record(self, workspace_id: str, metric_name: str, anomaly: RecentAnomaly) -> None:
+        self._latest[(workspace_id, metric_name)] = anomaly
+        anomaly_dedup_index_size.set(len(self._latest))
+
+    def prune(self, now: datetime | None = None) -> None:
+        cutoff = (now or utcnow()) - DEDUP_HORIZON
+        for key in [key for key, anomaly in self._latest.items() if anomaly.window_end < cutoff]:
+            del self._latest[key]
+        anomaly_dedup_index_size.set(len(self._latest))
+
+    async def warm(self) -> None:
+        rows = await fetch(
+            """
+            SELECT DISTINCT ON (workspace_id, metric_name)
+                workspace_id, metric_name, anomaly_id, severity, window_end
+            FROM anomalies
+            WHERE window_end >= NOW() - make_interval(secs => $1)
+            ORDER BY workspace_id, metric_name, detected_at DESC
+            """,
+            DEDUP_HORIZON.total_seconds(),
+        )
+        self._latest = {
+            (str(row["workspace_id"]), str(row["metric_name"])): RecentAnomaly(
+                anomaly_id=str(row["anomaly_id"]),
+                severity=int(row["severity"]),
+                window_end=ensure_utc(row["window_end"]),
+            )
+            for row in rows
+        }
+        anomaly_dedup_index_size.set(len(self._latest))
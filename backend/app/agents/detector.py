@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import logging
+from datetime import datetime, timedelta
+
+from app.clickhouse.async_client import AsyncClickHouseService
+from app.sonification.rolling import RollingFeatureWindow
+from app.utils.time import ensure_utc, utcnow
+
+logger = logging.getLogger(__name__)
+
+
+# Per-(workspace, metric) rolling windows fed only with points newer than the
+# last cycle. Each metric's newest point is its own watermark; one fetch from
+# the oldest watermark minus the lateness allowance covers every metric, and a
+# metric whose overlap with that fetch differs from its window (a late point
+# landed inside it) is re-read in full. Only points landing before the fetch
+# start wait for the periodic full resync.
+class IncrementalAnomalyDetector:
+    def __init__(self, window_minutes: int, lateness_seconds: int, resync_cycles: int) -> None:
+        self.window = timedelta(minutes=window_minutes)
+        self.lateness = timedelta(seconds=lateness_seconds)
+        self.resync_cycles = resync_cycles
+        self._windows: dict[str, dict[str, RollingFeatureWindow]] = {}
+        self._cycles: dict[str, int] = {}
+        self._owned: dict[str, frozenset[str] | None] = {}
+
+    async def refresh(
+        self,
+        clickhouse: AsyncClickHouseService,
+        workspace_id: str,
+        metrics: list[str] | None = None,
+    ) -> dict[str, RollingFeatureWindow]:
+        # ``metrics`` restricts the workspace to this replica's shard. Gaining a
+        # metric (rebalance) forces a resync so its window starts with full history.
+        minutes = int(self.window.total_seconds() // 60)
+        cycle = self._cycles.get(workspace_id, 0)
+        windows = self._windows.get(workspace_id, {})
+        watermarks = [window.last_ts for window in windows.values() if window.last_ts is not None]
+        owned = frozenset(metrics) if metrics is not None else None
+        known = workspace_id in self._owned
+        previous = self._owned.get(workspace_id)
+        if owned is None:
+            gained = known and previous is not None
+        else:
+            gained = previous is None or not owned <= previous
+        self._owned[workspace_id] = owned
+
+        if not watermarks or cycle % self.resync_cycles == 0 or gained:
+            series = await clickhouse.recent_series(workspace_id, minutes=minutes, metrics=metrics)
+            windows = self._windows[workspace_id] = {}
+            for metric, raw_points in series.items():
+                windows[metric] = _build_window(raw_points)
+        else:
+            since = min(watermarks) - self.lateness
+            series = await clickhouse.recent_series(workspace_id, minutes=minutes, since=since, metrics=metrics)
+            if owned is not None:
+                for metric in list(windows):
+                    if metric not in owned:
+                        del windows[metric]
+            stale = [
+                metric
+                for metric, raw_points in series.items()
+                if metric not in windows or not _extend_window(windows[metric], raw_points, since)
+            ]
+            if stale:
+                logger.debug("anomaly windows resynced workspace=%s metrics=%s", workspace_id, stale)
+                reread = await clickhouse.recent_series(workspace_id, minutes=minutes, metrics=stale)
+                for metric in stale:
+                    windows[metric] = _build_window(reread.get(metric, []))
+
+        cutoff = utcnow() - self.window
+        for metric in list(windows):
+            windows[metric].evict_before(cutoff)
+            if not len(windows[metric]):
+                del windows[metric]
+
+        self._cycles[workspace_id] = cycle + 1
+        return windows
+
+
+def _build_window(raw_points: list[tuple[datetime, float]]) -> RollingFeatureWindow:
+    window = RollingFeatureWindow()
+    for ts, value in raw_points:
+        window.append(ensure_utc(ts), value)
+    return window
+
+
+# Appends the points past the window's overlap with an incremental fetch
+# (points after ``since``): what the window already holds after ``since`` must
+# come back unchanged and in the same order, or the window cannot be extended
+# in place and False is returned.
+def _extend_window(
+    window: RollingFeatureWindow,
+    raw_points: list[tuple[datetime, float]],
+    since: datetime,
+) -> bool:
+    held: list[tuple[datetime, float]] = []
+    for idx in range(len(window) - 1, -1, -1):
+        ts = window.timestamps[idx]
+        if ts <= since:
+            break
+        held.append((ts, window.values[idx]))
+    held.reverse()
+    fetched = [(ensure_utc(ts), float(value)) for ts, value in raw_points]
+    if fetched[: len(held)] != held:
+        return False
+    for ts, value in fetched[len(held) :]:
+        window.append(ts, value)
+    return True
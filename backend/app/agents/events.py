@@ -3,40 +3,123 @@ from __future__ import annotations
 import asyncio
 import json
 import logging
+import os
 import random
-from datetime import datetime, timezone
+import socket
+from datetime import datetime
+from functools import partial
 from statistics import median
 from typing import Any
 
+import asyncpg
+
+from app.agents.dedup import DEDUP_HORIZON, RecentAnomaly, RecentAnomalyIndex, is_duplicate
+from app.agents.detector import IncrementalAnomalyDetector
+from app.agents.fairshare import WeightedFairQueue
+from app.agents.sharding import ShardMembership
+from app.agents.supervisor import Supervisor, TaskSpec
 from app.agents.n8n_client import N8NClient
-from app.clickhouse.client import get_clickhouse
+from app.agents.outbox import OutboxDispatcher, enqueue_webhooks
+from app.clickhouse.async_client import get_async_clickhouse
 from app.config import get_settings
-from app.db.postgres import execute, fetch, fetchrow
-from app.metrics import anomaly_detected_total, audio_render_total
-from app.sonification.features import compute_anomaly_features
+from app.db.notify import AUDIO_JOBS_CHANNEL, WEBHOOK_OUTBOX_CHANNEL, get_notification_listener, notify
+from app.db.postgres import connection, execute, fetch, fetchrow, fetchval
+from app.db.realtime_partitions import maintain_realtime_event_partitions
+from app.metrics import (
+    anomaly_dedup_suppressed_total,
+    anomaly_detected_total,
+    audio_job_queue_wait_seconds,
+    audio_job_leases_lost_total,
+    audio_job_wakeups_total,
+    audio_jobs_dead_lettered_total,
+    audio_jobs_reclaimed_total,
+    audio_jobs_stuck,
+    audio_render_cache_total,
+    audio_render_total,
+    worker_shard_owned_metrics,
+    worker_workspace_detection_lag_seconds,
+    worker_workspace_queue_depth,
+    worker_workspace_queue_lag_seconds,
+)
+from app.sonification.delivery import deliver_render
+from app.sonification.executor import get_render_executor
+from app.sonification.features import compute_anomaly_features, compute_anomaly_features_many
 from app.sonification.mapping import map_features_to_control_curves
 from app.sonification.presets import normalize_preset_name
-from app.sonification.sc_engine import create_mp3_preview, render_wav
-from app.storage.artifacts import artifact_keys
+from app.sonification.rolling import RollingFeatureWindow
+from app.storage.artifacts import artifact_keys, render_hash, render_seed
 from app.storage.minio_client import get_minio
 from app.utils.ids import new_id
-from app.utils.time import utcnow
+from app.utils.time import ensure_utc, utcnow
 
 logger = logging.getLogger(__name__)
 
 
+# Appended to realtime_events inserts: every row is announced on its workspace's
+# channel (see app.realtime). A notification that would reach the 8000-byte
+# NOTIFY limit once built and escaped goes out without the body, and
+# subscribers' brokers read the row instead.
+_NOTIFY_INSERTED_EVENTS = """
+SELECT pg_notify(
+    'realtime_' || md5(inserted.workspace_id),
+    CASE WHEN octet_length(full_message.body) < 8000
+        THEN full_message.body
+        ELSE json_build_object(
+            'id', inserted.id, 'type', inserted.event_type, 'created_at', inserted.created_at
+        )::text
+    END
+)
+FROM inserted
+CROSS JOIN LATERAL (
+    SELECT json_build_object(
+        'id', inserted.id,
+        'type', inserted.event_type,
+        'payload', inserted.payload::text,
+        'created_at', inserted.created_at
+    )::text AS body
+) AS full_message
+"""
+
+
 async def emit_realtime_event(workspace_id: str, event_type: str, payload: dict[str, Any]) -> None:
     await execute(
         """
-        INSERT INTO realtime_events (workspace_id, event_type, payload)
-        VALUES ($1, $2, $3::jsonb)
-        """,
+        WITH inserted AS (
+            INSERT INTO realtime_events (workspace_id, event_type, payload)
+            VALUES ($1, $2, $3::jsonb)
+            RETURNING id, workspace_id, event_type, payload, created_at
+        )
+        """
+        + _NOTIFY_INSERTED_EVENTS,
         workspace_id,
         event_type,
         json.dumps(payload),
     )
 
 
+async def insert_realtime_events(
+    conn: asyncpg.Connection,
+    workspace_id: str,
+    events: list[tuple[str, dict[str, Any]]],
+) -> None:
+    if not events:
+        return
+    await conn.execute(
+        """
+        WITH inserted AS (
+            INSERT INTO realtime_events (workspace_id, event_type, payload)
+            SELECT $1, event_type, payload::jsonb
+            FROM unnest($2::text[], $3::text[]) AS t(event_type, payload)
+            RETURNING id, workspace_id, event_type, payload, created_at
+        )
+        """
+        + _NOTIFY_INSERTED_EVENTS,
+        workspace_id,
+        [event_type for event_type, _ in events],
+        [json.dumps(payload) for _, payload in events],
+    )
+
+
 def _normalized_overrides(raw_controls: Any) -> dict[str, float]:
     if not raw_controls:
         return {}
@@ -72,12 +155,38 @@ def _normalized_overrides(raw_controls: Any) -> dict[str, float]:
     return normalized
 
 
-def _detect_anomaly_candidate(points: list[tuple[datetime, float]]) -> dict[str, Any] | None:
-    if len(points) < 24:
+def _detect_anomaly_candidates(
+    series: dict[str, list[tuple[datetime, float]]],
+) -> list[tuple[str, dict[str, Any]]]:
+    eligible = {metric: points for metric, points in series.items() if len(points) >= 24}
+    if not eligible:
+        return []
+
+    feature_rows = compute_anomaly_features_many([[value for _, value in points] for points in eligible.values()])
+    candidates: list[tuple[str, dict[str, Any]]] = []
+    for (metric, points), features in zip(eligible.items(), feature_rows):
+        candidate = _candidate_from_features(features, points[max(0, len(points) - 20)][0], points[-1][0])
+        if candidate:
+            candidates.append((metric, candidate))
+    return candidates
+
+
+def _detect_window_candidate(window: RollingFeatureWindow) -> dict[str, Any] | None:
+    count = len(window)
+    if count < 24:
         return None
+    return _candidate_from_features(
+        window.features(),
+        window.timestamps[max(0, count - 20)],
+        window.timestamps[-1],
+    )
 
-    values = [float(v) for _, v in points]
-    features = compute_anomaly_features(values)
+
+def _candidate_from_features(
+    features: dict[str, Any],
+    start_ts: datetime,
+    end_ts: datetime,
+) -> dict[str, Any] | None:
     severity = int(features["severity"])
 
     # Require either strong robust z-score or residual anomaly to reduce noise.
@@ -88,8 +197,6 @@ def _detect_anomaly_candidate(points: list[tuple[datetime, float]]) -> dict[str,
     ):
         return None
 
-    end_ts = points[-1][0]
-    start_ts = points[max(0, len(points) - 20)][0]
     return {
         "window_start": start_ts,
         "window_end": end_ts,
@@ -98,62 +205,156 @@ def _detect_anomaly_candidate(points: list[tuple[datetime, float]]) -> dict[str,
     }
 
 
-async def run_anomaly_detection_cycle(workspace_id: str, n8n: N8NClient) -> int:
-    clickhouse = get_clickhouse()
-    metrics = clickhouse.metric_names(workspace_id, minutes=240)
-    created = 0
-
-    for metric in metrics:
-        raw_points = clickhouse.recent_points(workspace_id, metric, minutes=180)
-        points: list[tuple[datetime, float]] = []
-        for ts, value in raw_points:
-            if isinstance(ts, str):
-                normalized = datetime.fromisoformat(ts.replace("Z", "+00:00"))
-            else:
-                normalized = ts
-            if normalized.tzinfo is None:
-                normalized = normalized.replace(tzinfo=timezone.utc)
-            points.append((normalized, float(value)))
-
-        candidate = _detect_anomaly_candidate(points)
-        if not candidate:
-            continue
+async def _owned_metrics(workspace_id: str, shard: ShardMembership | None) -> list[str] | None:
+    # None means every metric: no sharding, or this replica is the only member.
+    if shard is None or not shard.sharded:
+        return None
+    names = await get_async_clickhouse().metric_names(workspace_id, minutes=get_settings().anomaly_window_minutes)
+    owned = [metric for metric in names if shard.owns(workspace_id, metric)]
+    worker_shard_owned_metrics.labels(workspace=workspace_id).set(len(owned))
+    return owned
+
+
+async def _anomaly_candidates(
+    workspace_id: str,
+    detector: IncrementalAnomalyDetector | None,
+    shard: ShardMembership | None = None,
+) -> list[tuple[str, dict[str, Any]]]:
+    clickhouse = get_async_clickhouse()
+    candidates: list[tuple[str, dict[str, Any]]] = []
+    metrics = await _owned_metrics(workspace_id, shard)
+
+    if detector is not None:
+        windows = await detector.refresh(clickhouse, workspace_id, metrics=metrics)
+        for metric, window in windows.items():
+            candidate = _detect_window_candidate(window)
+            if candidate:
+                candidates.append((metric, candidate))
+        return candidates
+
+    if metrics == []:
+        return []
+    series = await clickhouse.recent_series(
+        workspace_id,
+        minutes=get_settings().anomaly_window_minutes,
+        metrics=metrics,
+    )
+    return _detect_anomaly_candidates(
+        {
+            metric: [(ensure_utc(ts), float(value)) for ts, value in raw_points]
+            for metric, raw_points in series.items()
+        }
+    )
 
-        # Dedup in a short horizon.
-        existing = await fetchrow(
-            """
-            SELECT anomaly_id, severity
-            FROM anomalies
-            WHERE workspace_id = $1 AND metric_name = $2
-              AND window_end >= NOW() - INTERVAL '8 minutes'
-            ORDER BY detected_at DESC
-            LIMIT 1
-            """,
-            workspace_id,
-            metric,
-        )
-        if existing and abs(int(existing["severity"]) - int(candidate["severity"])) <= 8:
-            continue
 
-        anomaly_id = new_id()
-        await execute(
-            """
-            INSERT INTO anomalies (
-                anomaly_id, workspace_id, metric_name,
-                window_start, window_end, severity, features
+async def run_anomaly_detection_cycle(
+    workspace_id: str,
+    detector: IncrementalAnomalyDetector | None = None,
+    shard: ShardMembership | None = None,
+    index: RecentAnomalyIndex | None = None,
+) -> int:
+    candidates = dict(await _anomaly_candidates(workspace_id, detector, shard))
+    now = utcnow()
+    # The index answers dedup in memory once ownership is settled; while the ring
+    # is moving, two replicas may briefly both own a metric, so Postgres decides.
+    verify = index is None or (shard is not None and not shard.settled())
+    if not verify:
+        for metric in list(candidates):
+            if is_duplicate(index.get(workspace_id, metric), int(candidates[metric]["severity"]), now):
+                del candidates[metric]
+                anomaly_dedup_suppressed_total.labels(source="index").inc()
+    if not candidates:
+        return 0
+    metrics = sorted(candidates)
+
+    # Every write for the cycle is batched: multi-row inserts for anomalies,
+    # webhook outbox and realtime events in one transaction, one ClickHouse insert.
+    async with connection() as conn:
+        async with conn.transaction():
+            if verify:
+                # Locks are taken in sorted order so replicas cannot deadlock.
+                await conn.execute(
+                    "SELECT pg_advisory_xact_lock(hashtextextended(key, 0)) FROM unnest($1::text[]) AS key",
+                    [f"anomaly:{workspace_id}:{metric}" for metric in metrics],
+                )
+                recent = await conn.fetch(
+                    """
+                    SELECT DISTINCT ON (metric_name) metric_name, anomaly_id, severity, window_end
+                    FROM anomalies
+                    WHERE workspace_id = $1 AND metric_name = ANY($2::text[])
+                      AND window_end >= NOW() - make_interval(secs => $3)
+                    ORDER BY metric_name, detected_at DESC
+                    """,
+                    workspace_id,
+                    metrics,
+                    DEDUP_HORIZON.total_seconds(),
+                )
+                for row in recent:
+                    latest = RecentAnomaly(str(row["anomaly_id"]), int(row["severity"]), ensure_utc(row["window_end"]))
+                    if index is not None:
+                        index.record(workspace_id, str(row["metric_name"]), latest)
+                    if is_duplicate(latest, int(candidates[str(row["metric_name"])]["severity"]), now):
+                        del candidates[str(row["metric_name"])]
+                        anomaly_dedup_suppressed_total.labels(source="postgres").inc()
+
+            created = [(new_id(), metric, candidates[metric]) for metric in metrics if metric in candidates]
+            if not created:
+                return 0
+
+            await conn.execute(
+                """
+                INSERT INTO anomalies (
+                    anomaly_id, workspace_id, metric_name,
+                    window_start, window_end, severity, features
+                )
+                SELECT anomaly_id, $1, metric_name, window_start, window_end, severity, features::jsonb
+                FROM unnest($2::uuid[], $3::text[], $4::timestamptz[], $5::timestamptz[], $6::int[], $7::text[])
+                    AS t(anomaly_id, metric_name, window_start, window_end, severity, features)
+                """,
+                workspace_id,
+                [anomaly_id for anomaly_id, _, _ in created],
+                [metric for _, metric, _ in created],
+                [candidate["window_start"] for _, _, candidate in created],
+                [candidate["window_end"] for _, _, candidate in created],
+                [int(candidate["severity"]) for _, _, candidate in created],
+                [json.dumps(candidate["features"]) for _, _, candidate in created],
             )
-            VALUES ($1::uuid, $2, $3, $4, $5, $6, $7::jsonb)
-            """,
-            anomaly_id,
-            workspace_id,
-            metric,
-            candidate["window_start"],
-            candidate["window_end"],
-            candidate["severity"],
-            json.dumps(candidate["features"]),
-        )
 
-        clickhouse.insert_anomaly(
+            events: list[tuple[str, dict[str, Any]]] = []
+            webhooks: list[tuple[str, dict[str, Any]]] = []
+            for anomaly_id, metric, candidate in created:
+                event_payload = {
+                    "anomaly_id": anomaly_id,
+                    "workspace_id": workspace_id,
+                    "metric_name": metric,
+                    "severity": int(candidate["severity"]),
+                    "window_start": candidate["window_start"].isoformat(),
+                    "window_end": candidate["window_end"].isoformat(),
+                    "features": candidate["features"],
+                }
+                events.append(("anomaly.detected", event_payload))
+                webhooks.append(("anomaly_correlator", event_payload))
+                if int(candidate["severity"]) >= 78:
+                    webhooks.append(("incident_narrator", event_payload))
+
+            # n8n is notified through the outbox, committed with the anomalies.
+            await enqueue_webhooks(conn, workspace_id, webhooks)
+            await insert_realtime_events(conn, workspace_id, events)
+
+    # Committed: the index must know these before the ClickHouse write, which
+    # may fail, or the next settled cycle would create them again.
+    for anomaly_id, metric, candidate in created:
+        anomaly_detected_total.labels(metric=metric).inc()
+        if index is not None:
+            index.record(
+                workspace_id,
+                metric,
+                RecentAnomaly(anomaly_id, int(candidate["severity"]), ensure_utc(candidate["window_end"])),
+            )
+
+    detected_at = utcnow()
+    await get_async_clickhouse().insert_anomalies(
+        [
             (
                 workspace_id,
                 anomaly_id,
@@ -162,58 +363,205 @@ async def run_anomaly_detection_cycle(workspace_id: str, n8n: N8NClient) -> int:
                 candidate["window_end"],
                 int(candidate["severity"]),
                 json.dumps(candidate["features"]),
-                utcnow(),
+                detected_at,
             )
-        )
+            for anomaly_id, metric, candidate in created
+        ]
+    )
+    return len(created)
 
-        anomaly_detected_total.labels(metric=metric).inc()
-        created += 1
-
-        event_payload = {
-            "anomaly_id": anomaly_id,
-            "workspace_id": workspace_id,
-            "metric_name": metric,
-            "severity": int(candidate["severity"]),
-            "window_start": candidate["window_start"].isoformat(),
-            "window_end": candidate["window_end"].isoformat(),
-            "features": candidate["features"],
-        }
 
-        await emit_realtime_event(workspace_id, "anomaly.detected", event_payload)
-        await n8n.anomaly_correlator(event_payload)
-        if int(candidate["severity"]) >= 78:
-            await n8n.incident_narrator(event_payload)
+def worker_identity() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
 
-    return created
 
+async def notify_audio_job(workspace_id: str, job_id: str, status: str) -> None:
+    await notify(
+        AUDIO_JOBS_CHANNEL,
+        json.dumps({"workspace_id": workspace_id, "job_id": job_id, "status": status}),
+    )
 
-async def _claim_next_audio_job(workspace_id: str) -> dict[str, Any] | None:
-    row = await fetchrow(
+
+async def _audio_queue_stats(max_attempts: int) -> dict[str, dict[str, Any]]:
+    # Claimable jobs per workspace (queued plus expired leases with attempts left)
+    # and the age of the oldest queued one.
+    rows = await fetch(
         """
-        WITH candidate AS (
-            SELECT job_id
-            FROM audio_jobs
-            WHERE workspace_id = $1 AND status = 'queued'
-            ORDER BY created_at ASC
-            FOR UPDATE SKIP LOCKED
-            LIMIT 1
+        SELECT workspace_id,
+               COUNT(*) FILTER (WHERE status = 'queued') AS queued,
+               COUNT(*) FILTER (
+                   WHERE status = 'processing'
+                     AND (lease_expires_at IS NULL OR lease_expires_at < NOW())
+                     AND attempts < $1
+               ) AS expired,
+               MIN(created_at) FILTER (WHERE status = 'queued') AS oldest_queued_at
+        FROM audio_jobs
+        WHERE status IN ('queued', 'processing')
+        GROUP BY workspace_id
+        """,
+        max_attempts,
+    )
+    return {
+        str(row["workspace_id"]): {
+            "claimable": int(row["queued"]) + int(row["expired"]),
+            "queued": int(row["queued"]),
+            "oldest_queued_at": row["oldest_queued_at"],
+        }
+        for row in rows
+    }
+
+
+async def _claim_audio_jobs(
+    allocation: dict[str, int],
+    owner: str,
+    lease_seconds: float,
+    max_attempts: int,
+) -> list[dict[str, Any]]:
+    # Takes up to allocation[workspace] jobs per workspace: queued jobs and jobs
+    # whose lease ran out (their worker died or hung), leasing them to this
+    # worker. A NULL lease is a row claimed before leases existed and is treated
+    # as expired.
+    allocation = {workspace_id: count for workspace_id, count in allocation.items() if count > 0}
+    if not allocation:
+        return []
+    rows = await fetch(
+        """
+        WITH alloc AS (
+            SELECT * FROM unnest($1::text[], $2::int[]) AS a (workspace_id, n)
+        ),
+        candidate AS (
+            SELECT picked.job_id, picked.previous_status
+            FROM alloc
+            CROSS JOIN LATERAL (
+                SELECT job_id, status AS previous_status
+                FROM audio_jobs
+                WHERE workspace_id = alloc.workspace_id
+                  AND (
+                      status = 'queued'
+                      OR (
+                          status = 'processing'
+                          AND (lease_expires_at IS NULL OR lease_expires_at < NOW())
+                          AND attempts < $5
+                      )
+                  )
+                ORDER BY created_at ASC
+                FOR UPDATE SKIP LOCKED
+                LIMIT alloc.n
+            ) AS picked
         )
+        UPDATE audio_jobs AS j
+        SET status = 'processing',
+            lease_owner = $3,
+            lease_expires_at = NOW() + make_interval(secs => $4),
+            attempts = j.attempts + 1,
+            updated_at = NOW()
+        FROM candidate
+        WHERE j.job_id = candidate.job_id
+        RETURNING j.*, candidate.previous_status
+        """,
+        list(allocation),
+        list(allocation.values()),
+        owner,
+        lease_seconds,
+        max_attempts,
+    )
+    jobs = sorted((dict(row) for row in rows), key=lambda job: job["created_at"])
+    now = utcnow()
+    for job in jobs:
+        if job["previous_status"] == "queued":
+            audio_job_queue_wait_seconds.observe(max(0.0, (now - job["created_at"]).total_seconds()))
+        else:
+            audio_jobs_reclaimed_total.inc()
+            logger.warning("reclaimed audio job %s after expired lease attempt=%s", job["job_id"], job["attempts"])
+    return jobs
+
+
+async def _renew_audio_leases(job_ids: list[str], owner: str, lease_seconds: float) -> set[str]:
+    # Heartbeat for running renders. Returns the jobs this worker no longer holds:
+    # cancelled through the API, or reclaimed by another worker after a stall.
+    if not job_ids:
+        return set()
+    rows = await fetch(
+        """
         UPDATE audio_jobs
-        SET status = 'processing', updated_at = NOW()
-        WHERE job_id = (SELECT job_id FROM candidate)
-        RETURNING *
+        SET lease_expires_at = NOW() + make_interval(secs => $3)
+        WHERE job_id = ANY($1::uuid[]) AND status = 'processing' AND lease_owner = $2
+        RETURNING job_id
         """,
-        workspace_id,
+        job_ids,
+        owner,
+        lease_seconds,
     )
-    return dict(row) if row else None
+    held = {str(row["job_id"]) for row in rows}
+    released = set(job_ids) - held
+    if released:
+        rows = await fetch(
+            "SELECT job_id FROM audio_jobs WHERE job_id = ANY($1::uuid[]) AND status <> 'cancelled'",
+            list(released),
+        )
+        if rows:
+            audio_job_leases_lost_total.inc(len(rows))
+            logger.warning("audio worker lost leases for jobs %s", [str(row["job_id"]) for row in rows])
+    return released
 
 
-async def run_audio_job_cycle(workspace_id: str) -> int:
-    job = await _claim_next_audio_job(workspace_id)
-    if not job:
-        return 0
+async def _dead_letter_audio_jobs(max_attempts: int) -> None:
+    # Expired leases that already used every attempt are parked instead of being
+    # retried forever; whatever is left expired is what the next claim will take.
+    rows = await fetch(
+        """
+        UPDATE audio_jobs
+        SET status = 'dead_letter',
+            error = 'lease expired after ' || attempts || ' attempts',
+            lease_owner = NULL,
+            lease_expires_at = NULL,
+            updated_at = NOW()
+        WHERE status = 'processing'
+          AND (lease_expires_at IS NULL OR lease_expires_at < NOW())
+          AND attempts >= $1
+        RETURNING job_id, workspace_id, metric_name, attempts
+        """,
+        max_attempts,
+    )
+    for row in rows:
+        audio_jobs_dead_lettered_total.inc()
+        await emit_realtime_event(
+            str(row["workspace_id"]),
+            "audio.render.dead_lettered",
+            {
+                "job_id": str(row["job_id"]),
+                "metric_name": str(row["metric_name"]),
+                "attempts": int(row["attempts"]),
+            },
+        )
+    stuck = await fetchval(
+        """
+        SELECT COUNT(*)
+        FROM audio_jobs
+        WHERE status = 'processing'
+          AND (lease_expires_at IS NULL OR lease_expires_at < NOW())
+        """
+    )
+    audio_jobs_stuck.set(int(stuck or 0))
+
+
+async def _has_cached_render(workspace_id: str, content_hash: str) -> bool:
+    row = await fetchrow(
+        """
+        SELECT 1
+        FROM audio_artifacts
+        WHERE workspace_id = $1 AND render_hash = $2
+        LIMIT 1
+        """,
+        workspace_id,
+        content_hash,
+    )
+    return row is not None
 
-    clickhouse = get_clickhouse()
+
+async def process_audio_job(workspace_id: str, job: dict[str, Any]) -> int:
+    settings = get_settings()
+    clickhouse = get_async_clickhouse()
     minio = get_minio()
 
     try:
@@ -225,7 +573,7 @@ async def run_audio_job_cycle(workspace_id: str) -> int:
         overrides = _normalized_overrides(job.get("controls"))
 
         minutes = max(5, int((end_ts - start_ts).total_seconds() // 60) + 5)
-        series = clickhouse.recent_points(workspace_id, metric, minutes=minutes)
+        series = await clickhouse.recent_points(workspace_id, metric, minutes=minutes)
         if not series:
             raise RuntimeError("no kpi points found for requested window")
 
@@ -234,21 +582,32 @@ async def run_audio_job_cycle(workspace_id: str) -> int:
         controls = map_features_to_control_curves(metric, feature_pack, preset, overrides=overrides)
         controls["preset_name"] = preset
 
-        correlation_seed = abs(hash(str(job["correlation_id"]))) % 2_000_000
-        wav_path, render_ms, engine = await render_wav(controls, duration, correlation_seed)
-        mp3_path = await create_mp3_preview(wav_path)
+        seed = render_seed(controls, duration)
+        content_hash = render_hash(controls, duration, seed)
+        key_wav, key_mp3 = artifact_keys(workspace_id, content_hash)
+        cache_hit = await _has_cached_render(workspace_id, content_hash)
+        if cache_hit:
+            audio_render_cache_total.labels(result="hit").inc()
+            render_ms = 0
+            engine = "cache"
+        else:
+            audio_render_cache_total.labels(result="miss").inc()
+            render_ms, engine = await get_render_executor().render(
+                controls,
+                duration,
+                seed,
+                timeout_seconds=settings.audio_render_timeout_seconds,
+                deliver=partial(deliver_render, minio, key_wav, key_mp3),
+            )
 
         artifact_id = new_id()
-        key_wav, key_mp3 = artifact_keys(workspace_id, metric, artifact_id)
-        minio.upload_file(key_wav, wav_path, "audio/wav")
-        minio.upload_file(key_mp3, mp3_path, "audio/mpeg")
-
         await execute(
             """
             INSERT INTO audio_artifacts (
                 artifact_id, workspace_id, anomaly_id, metric_name, preset,
-                duration_seconds, controls, minio_key_wav, minio_key_mp3, render_ms
-            ) VALUES ($1::uuid, $2, $3::uuid, $4, $5, $6, $7::jsonb, $8, $9, $10)
+                duration_seconds, controls, minio_key_wav, minio_key_mp3, render_ms,
+                render_hash, cache_hit
+            ) VALUES ($1::uuid, $2, $3::uuid, $4, $5, $6, $7::jsonb, $8, $9, $10, $11, $12)
             """,
             artifact_id,
             workspace_id,
@@ -260,19 +619,29 @@ async def run_audio_job_cycle(workspace_id: str) -> int:
             key_wav,
             key_mp3,
             render_ms,
+            content_hash,
+            cache_hit,
         )
 
-        await execute(
+        completed = await execute(
             """
             UPDATE audio_jobs
-            SET status = 'completed', artifact_id = $2::uuid, updated_at = NOW()
-            WHERE job_id = $1::uuid
+            SET status = 'completed', artifact_id = $2::uuid,
+                lease_owner = NULL, lease_expires_at = NULL, updated_at = NOW()
+            WHERE job_id = $1::uuid AND status = 'processing' AND lease_owner = $3
             """,
             job["job_id"],
             artifact_id,
+            job["lease_owner"],
         )
-
-        clickhouse.insert_audio_render(
+        if completed == "UPDATE 0":
+            # Cancelled or reclaimed while finishing; the artifact row stays for
+            # the render cache but this worker no longer reports the job.
+            audio_job_leases_lost_total.inc()
+            logger.warning("audio job %s lost its lease before completion", job["job_id"])
+            return 0
+
+        await clickhouse.insert_audio_render(
             (
                 workspace_id,
                 artifact_id,
@@ -297,21 +666,41 @@ async def run_audio_job_cycle(workspace_id: str) -> int:
                 "preset": preset,
                 "render_ms": render_ms,
                 "engine": engine,
+                "cache_hit": cache_hit,
                 "controls": controls,
             },
         )
         return 1
 
+    except asyncio.CancelledError:
+        # Cancelled through the API (status already 'cancelled') or by worker
+        # shutdown, in which case the job goes back to the queue.
+        status = await execute(
+            """
+            UPDATE audio_jobs
+            SET status = 'queued', lease_owner = NULL, lease_expires_at = NULL,
+                attempts = GREATEST(attempts - 1, 0), updated_at = NOW()
+            WHERE job_id = $1::uuid AND status = 'processing' AND lease_owner = $2
+            """,
+            job["job_id"],
+            job["lease_owner"],
+        )
+        # Nothing to announce when the job was cancelled or reclaimed meanwhile.
+        if status == "UPDATE 1":
+            await notify_audio_job(workspace_id, str(job["job_id"]), "queued")
+        raise
+
     except Exception as exc:  # noqa: BLE001
         logger.exception("audio job failed")
         await execute(
             """
             UPDATE audio_jobs
-            SET status = 'failed', error = $2, updated_at = NOW()
-            WHERE job_id = $1::uuid
+            SET status = 'failed', error = $2, lease_owner = NULL, lease_expires_at = NULL, updated_at = NOW()
+            WHERE job_id = $1::uuid AND status = 'processing' AND lease_owner = $3
             """,
             job["job_id"],
             str(exc),
+            job["lease_owner"],
         )
         await emit_realtime_event(
             workspace_id,
@@ -325,24 +714,236 @@ async def run_audio_job_cycle(workspace_id: str) -> int:
         return 0
 
 
+async def _discover_workspaces(minutes: int) -> set[str]:
+    # Workspaces with recent KPI traffic, plus the default one so a fresh install
+    # still runs; audio backlogs are added from the queue stats on every pass.
+    workspaces = {get_settings().default_workspace_id}
+    try:
+        workspaces.update(await get_async_clickhouse().active_workspaces(minutes=minutes))
+    except Exception:  # noqa: BLE001
+        logger.warning("workspace discovery failed", exc_info=True)
+    return workspaces
+
+
+async def _run_detection_round(
+    workspaces: set[str],
+    detector: IncrementalAnomalyDetector | None,
+    fair_queue: WeightedFairQueue,
+    concurrency: int,
+    last_detection: dict[str, float],
+    shard: ShardMembership | None = None,
+    index: RecentAnomalyIndex | None = None,
+) -> int:
+    # Workspaces start in fair-queue order behind a concurrency cap and are charged
+    # for the time their cycle took, so a tenant with a heavy cycle goes last next
+    # round. One tenant failing does not stop the others.
+    slots = asyncio.Semaphore(concurrency)
+    loop = asyncio.get_running_loop()
+
+    async def detect(workspace_id: str) -> int:
+        async with slots:
+            started = loop.time()
+            try:
+                return await run_anomaly_detection_cycle(workspace_id, detector, shard, index)
+            except Exception:  # noqa: BLE001
+                logger.exception("anomaly cycle failed workspace=%s", workspace_id)
+                return 0
+            finally:
+                fair_queue.charge(workspace_id, loop.time() - started)
+                last_detection[workspace_id] = loop.time()
+
+    results = await asyncio.gather(*(detect(workspace_id) for workspace_id in fair_queue.order(workspaces)))
+    return sum(results)
+
+
+def _update_workspace_gauges(
+    workspaces: set[str],
+    queue_stats: dict[str, dict[str, Any]],
+    last_detection: dict[str, float],
+    now: float,
+) -> None:
+    wall_now = utcnow()
+    for workspace_id in workspaces:
+        stats = queue_stats.get(workspace_id)
+        worker_workspace_queue_depth.labels(workspace=workspace_id).set(stats["queued"] if stats else 0)
+        oldest = stats["oldest_queued_at"] if stats else None
+        worker_workspace_queue_lag_seconds.labels(workspace=workspace_id).set(
+            max(0.0, (wall_now - oldest).total_seconds()) if oldest else 0.0
+        )
+        if workspace_id in last_detection:
+            worker_workspace_detection_lag_seconds.labels(workspace=workspace_id).set(now - last_detection[workspace_id])
+
+
 async def worker_loop() -> None:
     settings = get_settings()
-    workspace_id = settings.default_workspace_id
-    n8n = N8NClient()
-    anomaly_every = 30.0
-    last_anomaly_ts = 0.0
-
-    while True:
-        now = asyncio.get_event_loop().time()
-
-        if now - last_anomaly_ts >= anomaly_every:
-            created = await run_anomaly_detection_cycle(workspace_id, n8n)
-            if created:
-                logger.info("anomaly cycle created=%s", created)
-            last_anomaly_ts = now
-
-        await run_audio_job_cycle(workspace_id)
-        await asyncio.sleep(2)
+    outbox = OutboxDispatcher(
+        N8NClient(),
+        batch_size=settings.n8n_outbox_batch_size,
+        concurrency=settings.n8n_dispatch_concurrency,
+        max_attempts=settings.n8n_outbox_max_attempts,
+        retry_base_seconds=settings.n8n_outbox_retry_base_seconds,
+        retention_hours=settings.n8n_outbox_retention_hours,
+    )
+    detector: IncrementalAnomalyDetector | None = None
+    if settings.anomaly_detector_mode == "incremental":
+        detector = IncrementalAnomalyDetector(
+            window_minutes=settings.anomaly_window_minutes,
+            lateness_seconds=settings.anomaly_lateness_seconds,
+            resync_cycles=settings.anomaly_resync_cycles,
+        )
+    render_jobs: dict[str, asyncio.Task[int]] = {}
+    render_workspaces: dict[str, str] = {}
+    loop = asyncio.get_running_loop()
+
+    # Every workspace shares one worker: detection rounds and render slots are
+    # handed out by weighted fair queuing (WORKSPACE_WEIGHTS) so a noisy tenant
+    # cannot starve the others.
+    workspaces: set[str] = {settings.default_workspace_id}
+    detection_queue = WeightedFairQueue(settings.workspace_weights)
+    render_queue = WeightedFairQueue(settings.workspace_weights)
+    last_detection: dict[str, float] = {}
+    reported: set[str] = set()
+
+    # NOTIFY from the API (new or cancelled jobs), a finished render freeing a
+    # slot and a listener reconnect all wake the render dispatcher; its poll
+    # interval is only a safety net for lost notifications.
+    render_wakeup = asyncio.Event()
+    wake_reason = "poll"
+
+    def wake(reason: str) -> None:
+        nonlocal wake_reason
+        if not render_wakeup.is_set():
+            wake_reason = reason
+            render_wakeup.set()
+
+    owner = worker_identity()
+    lease_seconds = settings.audio_job_lease_seconds
+
+    def on_audio_job_notify(payload: str) -> None:
+        # A cancel stops its render right away instead of at the next lease
+        # renewal; any other status only wakes the dispatcher.
+        try:
+            message = json.loads(payload)
+        except ValueError:
+            message = {}
+        if isinstance(message, dict) and message.get("status") == "cancelled":
+            task = render_jobs.get(str(message.get("job_id")))
+            if task is not None:
+                task.cancel()
+        wake("notify")
+
+    listener = get_notification_listener()
+    listener.listen(AUDIO_JOBS_CHANNEL, on_audio_job_notify)
+    listener.on_connect(lambda: wake("reconnect"))
+    listener.listen(WEBHOOK_OUTBOX_CHANNEL, lambda _payload: outbox.ready.set())
+    listener.on_connect(outbox.ready.set)
+
+    def on_render_done(_task: asyncio.Task[int], key: str) -> None:
+        render_jobs.pop(key, None)
+        render_workspaces.pop(key, None)
+        wake("slot")
+
+    # Replicas split (workspace, metric) detection work by consistent hashing over
+    # the live members; audio jobs need no split since claims are SKIP LOCKED.
+    shard = ShardMembership(owner, settings.worker_member_ttl_seconds, settings.worker_shard_vnodes)
+    await shard.start()
+
+    dedup_index = RecentAnomalyIndex()
+    index_generation = -1
+
+    async def detection_cycle() -> None:
+        nonlocal workspaces, index_generation
+        if index_generation != shard.generation:
+            # Warm at startup and again whenever metrics change owner.
+            generation = shard.generation
+            await dedup_index.warm()
+            index_generation = generation
+        else:
+            dedup_index.prune()
+        workspaces = await _discover_workspaces(settings.anomaly_window_minutes)
+        created = await _run_detection_round(
+            workspaces,
+            detector,
+            detection_queue,
+            settings.anomaly_workspace_concurrency,
+            last_detection,
+            shard,
+            dedup_index,
+        )
+        if created:
+            logger.info("anomaly cycle created=%s workspaces=%s", created, len(workspaces))
+        detection_queue.forget(workspaces)
+
+    async def renew_leases() -> None:
+        # Renewal also reports jobs this worker no longer holds (cancelled or
+        # reclaimed); their renders are stopped.
+        for job_id in await _renew_audio_leases(list(render_jobs), owner, lease_seconds):
+            task = render_jobs.get(job_id)
+            if task is not None:
+                task.cancel()
+
+    async def render_cycle() -> None:
+        nonlocal wake_reason
+        audio_job_wakeups_total.labels(reason=wake_reason).inc()
+        if wake_reason == "reconnect":
+            # Cancel notifications sent while the listener was down are lost.
+            await renew_leases()
+        wake_reason = "poll"
+
+        queue_stats = await _audio_queue_stats(settings.audio_job_max_attempts)
+        reported.update(workspaces, queue_stats)
+        _update_workspace_gauges(reported, queue_stats, last_detection, loop.time())
+
+        free_slots = settings.audio_render_max_concurrent_jobs - len(render_jobs)
+        if free_slots <= 0:
+            return
+        allocation = render_queue.allocate(
+            {workspace_id: stats["claimable"] for workspace_id, stats in queue_stats.items()},
+            free_slots,
+        )
+        claimed = await _claim_audio_jobs(allocation, owner, lease_seconds, settings.audio_job_max_attempts)
+        for job in claimed:
+            job_id = str(job["job_id"])
+            job_workspace = str(job["workspace_id"])
+            render_queue.charge(job_workspace, 1.0)
+            task = asyncio.create_task(process_audio_job(job_workspace, job))
+            task.add_done_callback(lambda _task, key=job_id: on_render_done(_task, key))
+            render_jobs[job_id] = task
+            render_workspaces[job_id] = job_workspace
+        render_queue.forget(set(queue_stats) | set(render_workspaces.values()))
+
+    async def lease_cycle() -> None:
+        await renew_leases()
+        await _dead_letter_audio_jobs(settings.audio_job_max_attempts)
+
+    async def partition_cycle() -> None:
+        await maintain_realtime_event_partitions(
+            settings.realtime_event_retention_days,
+            settings.realtime_event_partition_premake_days,
+        )
+
+    # Each subsystem runs on its own cadence, so a slow detection round (or a
+    # stalled webhook) cannot hold up render claims or lease renewals.
+    supervisor = Supervisor(settings.worker_task_restart_backoff_seconds)
+    supervisor.add(TaskSpec("detection", detection_cycle, settings.anomaly_interval_seconds))
+    supervisor.add(
+        TaskSpec("render", render_cycle, settings.audio_job_poll_interval_seconds, wakeup=render_wakeup)
+    )
+    supervisor.add(
+        TaskSpec("webhooks", outbox.dispatch_batch, settings.n8n_outbox_poll_seconds, wakeup=outbox.ready)
+    )
+    supervisor.add(TaskSpec("outbox_prune", outbox.prune, 3600.0))
+    supervisor.add(TaskSpec("realtime_partitions", partition_cycle, 3600.0))
+    supervisor.add(TaskSpec("leases", lease_cycle, lease_seconds / 4))
+    supervisor.add(TaskSpec("membership", shard.maintain, settings.worker_member_ttl_seconds / 3))
+
+    try:
+        await supervisor.run()
+    finally:
+        for task in render_jobs.values():
+            task.cancel()
+        await asyncio.gather(*render_jobs.values(), return_exceptions=True)
+        await shard.close()
 
 
 async def build_daily_brief_data(workspace_id: str) -> dict[str, Any]:
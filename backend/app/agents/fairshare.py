@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+from collections.abc import Iterable
+
+
+# Weighted fair queuing over workspaces. Each workspace has a virtual clock that
+# advances by cost / weight whenever it is served; the workspace with the
+# earliest clock goes next. A workspace returning from idle starts at the
+# current minimum, so it cannot bank credit while it had nothing to do.
+class WeightedFairQueue:
+    def __init__(self, weights: dict[str, float] | None = None, default_weight: float = 1.0) -> None:
+        self.weights = dict(weights or {})
+        self.default_weight = default_weight
+        self._clock: dict[str, float] = {}
+
+    def weight(self, workspace_id: str) -> float:
+        return max(self.weights.get(workspace_id, self.default_weight), 1e-6)
+
+    def order(self, workspace_ids: Iterable[str]) -> list[str]:
+        active = list(workspace_ids)
+        self._activate(active)
+        return sorted(active, key=lambda workspace_id: (self._clock[workspace_id], workspace_id))
+
+    def charge(self, workspace_id: str, cost: float) -> None:
+        self._activate([workspace_id])
+        self._clock[workspace_id] += cost / self.weight(workspace_id)
+
+    def allocate(self, demand: dict[str, int], slots: int, unit_cost: float = 1.0) -> dict[str, int]:
+        # Hands out slots one at a time to the backlogged workspace that would
+        # finish earliest. Clocks are not charged here; callers charge what they
+        # actually started.
+        backlog = {workspace_id: count for workspace_id, count in demand.items() if count > 0}
+        self._activate(backlog)
+        finish = {workspace_id: self._clock[workspace_id] for workspace_id in backlog}
+        allocation: dict[str, int] = {}
+        for _ in range(slots):
+            if not backlog:
+                break
+            workspace_id = min(backlog, key=lambda key: (finish[key] + unit_cost / self.weight(key), key))
+            finish[workspace_id] += unit_cost / self.weight(workspace_id)
+            allocation[workspace_id] = allocation.get(workspace_id, 0) + 1
+            backlog[workspace_id] -= 1
+            if not backlog[workspace_id]:
+                del backlog[workspace_id]
+        return allocation
+
+    def forget(self, keep: Iterable[str]) -> None:
+        keep = set(keep)
+        for workspace_id in list(self._clock):
+            if workspace_id not in keep:
+                del self._clock[workspace_id]
+
+    def _activate(self, workspace_ids: Iterable[str]) -> None:
+        floor = min(self._clock.values(), default=0.0)
+        for workspace_id in workspace_ids:
+            if workspace_id not in self._clock:
+                self._clock[workspace_id] = floor
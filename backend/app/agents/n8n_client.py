@@ -10,10 +10,40 @@ from app.config import get_settings
 
 logger = logging.getLogger(__name__)
 
+_http: httpx.AsyncClient | None = None
+
+
+def _shared_http() -> httpx.AsyncClient:
+    # One keep-alive client per process instead of a TCP (and TLS) handshake per
+    # webhook.
+    global _http
+    if _http is None or _http.is_closed:
+        settings = get_settings()
+        _http = httpx.AsyncClient(
+            timeout=settings.n8n_timeout_seconds,
+            limits=httpx.Limits(
+                max_connections=settings.n8n_dispatch_concurrency * 2,
+                max_keepalive_connections=settings.n8n_dispatch_concurrency,
+            ),
+        )
+    return _http
+
+
+async def close_n8n_client() -> None:
+    global _http
+    if _http is not None:
+        await _http.aclose()
+        _http = None
+
 
 class N8NClient:
     def __init__(self) -> None:
         self.settings = get_settings()
+        self.webhook_urls = {
+            "incident_narrator": self.settings.n8n_webhook_incident,
+            "exec_brief_generator": self.settings.n8n_webhook_exec_brief,
+            "anomaly_correlator": self.settings.n8n_webhook_anomaly_correlator,
+        }
 
     async def _post(self, url: str, payload: dict[str, Any]) -> None:
         tracer = trace.get_tracer("sonataops.n8n")
@@ -27,10 +57,15 @@ class N8NClient:
             headers: dict[str, str] = {}
             propagate.inject(headers)
 
-            async with httpx.AsyncClient(timeout=15.0) as client:
-                response = await client.post(url, json=payload, headers=headers)
-                span.set_attribute("http.status_code", response.status_code)
-                response.raise_for_status()
+            response = await _shared_http().post(url, json=payload, headers=headers)
+            span.set_attribute("http.status_code", response.status_code)
+            response.raise_for_status()
+
+    async def post(self, webhook: str, payload: dict[str, Any]) -> None:
+        url = self.webhook_urls.get(webhook)
+        if url is None:
+            raise ValueError(f"unknown n8n webhook: {webhook}")
+        await self._post(url, payload)
 
     async def incident_narrator(self, payload: dict[str, Any]) -> None:
         await self._post(self.settings.n8n_webhook_incident, payload)
@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import math
+import random
+from typing import Any
+
+import asyncpg
+import httpx
+
+from app.agents.n8n_client import N8NClient
+from app.db.notify import WEBHOOK_OUTBOX_CHANNEL
+from app.db.postgres import execute, fetch, fetchrow
+from app.metrics import (
+    n8n_outbox_dispatch_lag_seconds,
+    n8n_outbox_oldest_pending_seconds,
+    n8n_outbox_pending,
+    n8n_webhook_deliveries_total,
+)
+from app.utils.time import utcnow
+
+logger = logging.getLogger(__name__)
+
+_MAX_RETRY_SECONDS = 900.0
+
+CLAIM_OUTBOX_QUERY = """
+UPDATE webhook_outbox AS o
+SET attempts = o.attempts + 1,
+    next_attempt_at = NOW() + make_interval(secs => $2)
+FROM (
+    SELECT outbox_id
+    FROM webhook_outbox
+    WHERE status = 'pending' AND next_attempt_at <= NOW()
+    ORDER BY next_attempt_at, outbox_id
+    LIMIT $1
+    FOR UPDATE SKIP LOCKED
+) AS due
+WHERE o.outbox_id = due.outbox_id
+RETURNING o.outbox_id, o.workspace_id, o.webhook, o.payload, o.attempts, o.created_at
+"""
+
+
+async def enqueue_webhooks(
+    conn: asyncpg.Connection,
+    workspace_id: str,
+    webhooks: list[tuple[str, dict[str, Any]]],
+) -> None:
+    # Call inside the transaction that writes the data the webhooks describe: the
+    # rows (and the NOTIFY waking the dispatcher) only become visible on commit.
+    if not webhooks:
+        return
+    await conn.execute(
+        """
+        INSERT INTO webhook_outbox (workspace_id, webhook, payload)
+        SELECT $1, webhook, payload::jsonb
+        FROM unnest($2::text[], $3::text[]) AS t(webhook, payload)
+        """,
+        workspace_id,
+        [webhook for webhook, _ in webhooks],
+        [json.dumps(payload) for _, payload in webhooks],
+    )
+    await conn.execute("SELECT pg_notify($1, $2)", WEBHOOK_OUTBOX_CHANNEL, workspace_id)
+
+
+def _retryable(exc: Exception) -> bool:
+    if isinstance(exc, httpx.HTTPStatusError):
+        status = exc.response.status_code
+        return status >= 500 or status in (408, 425, 429)
+    return not isinstance(exc, ValueError)
+
+
+# Drains webhook_outbox: claims a batch of due rows (pushing next_attempt_at out
+# as a claim lease, so rows held by a dead worker come due again), posts them
+# over the shared keep-alive client behind a concurrency cap and settles the
+# whole batch in three statements. Delivery is at-least-once; failures retry
+# with jittered exponential backoff until max_attempts.
+class OutboxDispatcher:
+    def __init__(
+        self,
+        client: N8NClient,
+        batch_size: int,
+        concurrency: int,
+        max_attempts: int,
+        retry_base_seconds: float,
+        retention_hours: float,
+    ) -> None:
+        self.client = client
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.retention_hours = retention_hours
+        # Long enough for every post of a full batch to time out in turn.
+        self.claim_seconds = client.settings.n8n_timeout_seconds * math.ceil(batch_size / concurrency) + 30.0
+        self.ready = asyncio.Event()
+
+    def retry_delay(self, attempts: int) -> float:
+        delay = min(_MAX_RETRY_SECONDS, self.retry_base_seconds * 2 ** max(0, attempts - 1))
+        return delay * random.uniform(0.8, 1.2)
+
+    async def dispatch_batch(self) -> bool:
+        rows = await fetch(CLAIM_OUTBOX_QUERY, self.batch_size, self.claim_seconds)
+        if rows:
+            slots = asyncio.Semaphore(self.concurrency)
+            errors = await asyncio.gather(*(self._deliver(row, slots) for row in rows))
+            await self._settle(rows, errors)
+        await self._report_backlog()
+        return len(rows) == self.batch_size
+
+    async def _deliver(self, row: asyncpg.Record, slots: asyncio.Semaphore) -> Exception | None:
+        async with slots:
+            try:
+                await self.client.post(str(row["webhook"]), json.loads(row["payload"]))
+            except Exception as exc:  # noqa: BLE001
+                return exc
+        return None
+
+    async def _settle(self, rows: list[asyncpg.Record], errors: list[Exception | None]) -> None:
+        now = utcnow()
+        delivered: list[int] = []
+        retry_ids: list[int] = []
+        retry_delays: list[float] = []
+        retry_errors: list[str] = []
+        failed_ids: list[int] = []
+        failed_errors: list[str] = []
+
+        for row, exc in zip(rows, errors):
+            webhook = str(row["webhook"])
+            if exc is None:
+                delivered.append(int(row["outbox_id"]))
+                n8n_webhook_deliveries_total.labels(webhook=webhook, outcome="delivered").inc()
+                n8n_outbox_dispatch_lag_seconds.labels(webhook=webhook).observe(
+                    max(0.0, (now - row["created_at"]).total_seconds())
+                )
+                continue
+            detail = str(exc).splitlines()
+            message = f"{type(exc).__name__}: {detail[0] if detail else ''}"[:500]
+            attempts = int(row["attempts"])
+            if _retryable(exc) and attempts < self.max_attempts:
+                retry_ids.append(int(row["outbox_id"]))
+                retry_delays.append(self.retry_delay(attempts))
+                retry_errors.append(message)
+                n8n_webhook_deliveries_total.labels(webhook=webhook, outcome="retry").inc()
+            else:
+                failed_ids.append(int(row["outbox_id"]))
+                failed_errors.append(message)
+                n8n_webhook_deliveries_total.labels(webhook=webhook, outcome="failed").inc()
+                logger.warning(
+                    "n8n webhook gave up outbox_id=%s webhook=%s attempts=%s error=%s",
+                    row["outbox_id"],
+                    webhook,
+                    attempts,
+                    message,
+                )
+
+        if delivered:
+            await execute(
+                """
+                UPDATE webhook_outbox
+                SET status = 'delivered', delivered_at = NOW(), last_error = NULL
+                WHERE outbox_id = ANY($1::bigint[])
+                """,
+                delivered,
+            )
+        if retry_ids:
+            await execute(
+                """
+                UPDATE webhook_outbox AS o
+                SET next_attempt_at = NOW() + make_interval(secs => r.delay), last_error = r.error
+                FROM unnest($1::bigint[], $2::float8[], $3::text[]) AS r(outbox_id, delay, error)
+                WHERE o.outbox_id = r.outbox_id
+                """,
+                retry_ids,
+                retry_delays,
+                retry_errors,
+            )
+        if failed_ids:
+            await execute(
+                """
+                UPDATE webhook_outbox AS o
+                SET status = 'failed', last_error = r.error
+                FROM unnest($1::bigint[], $2::text[]) AS r(outbox_id, error)
+                WHERE o.outbox_id = r.outbox_id
+                """,
+                failed_ids,
+                failed_errors,
+            )
+
+    async def _report_backlog(self) -> None:
+        row = await fetchrow(
+            """
+            SELECT COUNT(*) AS pending, EXTRACT(EPOCH FROM NOW() - MIN(created_at)) AS oldest_seconds
+            FROM webhook_outbox
+            WHERE status = 'pending'
+            """
+        )
+        n8n_outbox_pending.set(int(row["pending"]) if row else 0)
+        n8n_outbox_oldest_pending_seconds.set(float(row["oldest_seconds"] or 0.0) if row else 0.0)
+
+    async def prune(self) -> None:
+        await execute(
+            """
+            DELETE FROM webhook_outbox
+            WHERE status IN ('delivered', 'failed')
+              AND created_at < NOW() - make_interval(secs => $1)
+            """,
+            self.retention_hours * 3600,
+        )
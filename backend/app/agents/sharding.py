@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import time
+from bisect import bisect_right
+
+from app.db.postgres import execute, fetch
+from app.metrics import worker_shard_members, worker_shard_rebalances_total
+
+logger = logging.getLogger(__name__)
+
+
+def _ring_hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+# Consistent hashing over worker members with virtual nodes: a key belongs to the
+# first node clockwise from its hash, so a member joining or leaving only moves
+# about 1/N of the keys.
+class HashRing:
+    def __init__(self, members: list[str], vnodes: int) -> None:
+        self.members = sorted(set(members))
+        points = sorted((_ring_hash(f"{member}#{idx}"), member) for member in self.members for idx in range(vnodes))
+        self._hashes = [point for point, _ in points]
+        self._owners = [member for _, member in points]
+
+    def owner(self, key: str) -> str | None:
+        if not self._hashes:
+            return None
+        idx = bisect_right(self._hashes, _ring_hash(key)) % len(self._hashes)
+        return self._owners[idx]
+
+
+# Live replicas register in worker_members and refresh a heartbeat; members whose
+# heartbeat is older than the TTL drop out of the ring. Every replica rebuilds
+# the ring from the same table, so they agree on ownership of each
+# (workspace, metric) up to one refresh interval around membership changes.
+class ShardMembership:
+    def __init__(self, member_id: str, ttl_seconds: float, vnodes: int) -> None:
+        self.member_id = member_id
+        self.ttl_seconds = ttl_seconds
+        self.vnodes = vnodes
+        self.ring = HashRing([member_id], vnodes)
+        # Bumped on every ring change; ownership is only trusted once the ring
+        # has been stable for a TTL, by when every live replica has seen it too.
+        self.generation = 0
+        self._changed_at = float("-inf")
+
+    @property
+    def sharded(self) -> bool:
+        return len(self.ring.members) > 1
+
+    def settled(self) -> bool:
+        return time.monotonic() - self._changed_at >= self.ttl_seconds
+
+    def owns(self, workspace_id: str, metric_name: str) -> bool:
+        owner = self.ring.owner(f"{workspace_id}\x1f{metric_name}")
+        return owner is None or owner == self.member_id
+
+    async def start(self) -> None:
+        await self.refresh()
+
+    async def close(self) -> None:
+        # Leave right away so the others take over without waiting for the TTL.
+        try:
+            await execute("DELETE FROM worker_members WHERE member_id = $1", self.member_id)
+        except Exception:  # noqa: BLE001
+            logger.warning("failed to deregister worker member", exc_info=True)
+
+    async def refresh(self) -> None:
+        await execute(
+            """
+            INSERT INTO worker_members (member_id, started_at, heartbeat_at)
+            VALUES ($1, NOW(), NOW())
+            ON CONFLICT (member_id) DO UPDATE SET heartbeat_at = NOW()
+            """,
+            self.member_id,
+        )
+        rows = await fetch(
+            """
+            SELECT member_id
+            FROM worker_members
+            WHERE heartbeat_at >= NOW() - make_interval(secs => $1)
+            """,
+            self.ttl_seconds,
+        )
+        members = sorted({str(row["member_id"]) for row in rows} | {self.member_id})
+        if members != self.ring.members:
+            logger.info("shard membership changed members=%s", members)
+            if len(self.ring.members) > 1 or len(members) > 1:
+                worker_shard_rebalances_total.inc()
+            self.ring = HashRing(members, self.vnodes)
+            self.generation += 1
+            self._changed_at = time.monotonic()
+        worker_shard_members.set(len(members))
+
+    async def maintain(self) -> None:
+        # Run every ttl/3 by the worker supervisor.
+        await self.refresh()
+        await execute(
+            "DELETE FROM worker_members WHERE heartbeat_at < NOW() - make_interval(secs => $1)",
+            self.ttl_seconds * 4,
+        )
@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import random
+from collections import Counter
+from typing import Any
+
+import uvicorn
+from fastapi import FastAPI, Response
+
+# Stand-in for n8n's webhook endpoints, for exercising the outbox dispatcher
+# locally without an n8n instance:
+#   python -m app.agents.stub_n8n --port 5680 --fail-rate 0.2 --delay 0.5
+#   N8N_MOCK_MODE=false N8N_WEBHOOK_ANOMALY_CORRELATOR=http://localhost:5680/webhook/anomaly-correlator ...
+# GET /received reports what arrived; POST /reset clears it.
+
+logger = logging.getLogger(__name__)
+
+
+def build_app(fail_rate: float = 0.0, fail_status: int = 503, delay_seconds: float = 0.0) -> FastAPI:
+    stub = FastAPI(title="n8n webhook stub")
+    received: Counter[str] = Counter()
+    failed: Counter[str] = Counter()
+    last: dict[str, Any] = {}
+
+    @stub.post("/webhook/{name}")
+    async def webhook(name: str, payload: dict[str, Any]) -> Response:
+        if delay_seconds:
+            await asyncio.sleep(delay_seconds)
+        if random.random() < fail_rate:
+            failed[name] += 1
+            return Response(status_code=fail_status)
+        received[name] += 1
+        last[name] = payload
+        logger.info("stub webhook name=%s count=%s", name, received[name])
+        return Response(status_code=200)
+
+    @stub.get("/received")
+    async def report() -> dict[str, Any]:
+        return {"received": dict(received), "failed": dict(failed), "last": last}
+
+    @stub.post("/reset")
+    async def reset() -> dict[str, bool]:
+        received.clear()
+        failed.clear()
+        last.clear()
+        return {"reset": True}
+
+    return stub
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Local n8n webhook stub")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5680)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--fail-status", type=int, default=503)
+    parser.add_argument("--delay", type=float, default=0.0)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    uvicorn.run(build_app(args.fail_rate, args.fail_status, args.delay), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+
+from app.metrics import (
+    worker_task_cycle_seconds,
+    worker_task_failures_total,
+    worker_task_overruns_total,
+    worker_task_running,
+)
+
+logger = logging.getLogger(__name__)
+
+# A cycle returns True when it knows more work is waiting, to run again at once.
+Cycle = Callable[[], Awaitable[bool | None]]
+
+
+# One worker subsystem. `concurrency` runners execute the cycle side by side
+# (for queue consumers; schedulers keep 1). A cycle starts `interval_seconds`
+# after the previous start, or as soon as `wakeup` is set. A failing cycle is
+# retried with exponential backoff when `restart` is set; otherwise it stops
+# the whole worker.
+@dataclass
+class TaskSpec:
+    name: str
+    cycle: Cycle
+    interval_seconds: float
+    concurrency: int = 1
+    restart: bool = True
+    wakeup: asyncio.Event | None = None
+
+
+# Runs every subsystem as its own task in one TaskGroup, so a slow cycle in one
+# never delays the cadence of another.
+class Supervisor:
+    def __init__(self, restart_backoff_seconds: float, max_backoff_seconds: float = 60.0) -> None:
+        self.restart_backoff_seconds = restart_backoff_seconds
+        self.max_backoff_seconds = max(max_backoff_seconds, restart_backoff_seconds)
+        self._specs: list[TaskSpec] = []
+
+    def add(self, spec: TaskSpec) -> None:
+        self._specs.append(spec)
+
+    async def run(self) -> None:
+        async with asyncio.TaskGroup() as group:
+            for spec in self._specs:
+                for idx in range(spec.concurrency):
+                    group.create_task(self._runner(spec), name=f"worker-{spec.name}-{idx}")
+
+    async def _wait(self, spec: TaskSpec, delay: float, wakeable: bool) -> None:
+        if delay > 0:
+            if spec.wakeup is None or not wakeable:
+                await asyncio.sleep(delay)
+            else:
+                try:
+                    await asyncio.wait_for(spec.wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+        if spec.wakeup is not None and wakeable:
+            spec.wakeup.clear()
+
+    async def _runner(self, spec: TaskSpec) -> None:
+        loop = asyncio.get_running_loop()
+        backoff = 0.0
+        due = loop.time()
+        while True:
+            await self._wait(spec, due - loop.time(), wakeable=not backoff)
+            started = loop.time()
+            worker_task_running.labels(task=spec.name).inc()
+            try:
+                more = await spec.cycle()
+            except Exception:
+                worker_task_failures_total.labels(task=spec.name).inc()
+                if not spec.restart:
+                    logger.exception("worker task %s failed, stopping worker", spec.name)
+                    raise
+                backoff = min(self.max_backoff_seconds, backoff * 2 or self.restart_backoff_seconds)
+                logger.exception("worker task %s failed, restarting in %.1fs", spec.name, backoff)
+                due = loop.time() + backoff
+                continue
+            finally:
+                elapsed = loop.time() - started
+                worker_task_running.labels(task=spec.name).dec()
+                worker_task_cycle_seconds.labels(task=spec.name).observe(elapsed)
+
+            backoff = 0.0
+            if elapsed > spec.interval_seconds:
+                # The next cycle starts right away; missed ticks are not replayed.
+                worker_task_overruns_total.labels(task=spec.name).inc()
+            due = loop.time() if more else started + spec.interval_seconds
@@ -6,9 +6,9 @@ from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel, Field
 
 from app.agents.events import build_daily_brief_data
-from app.agents.n8n_client import N8NClient
+from app.agents.outbox import enqueue_webhooks
 from app.config import get_settings
-from app.db.postgres import execute, fetch, fetchrow
+from app.db.postgres import connection, execute, fetch, fetchrow
 from app.db.seed import seed_demo
 from app.rag.indexer import IngestDoc, ingest_documents
 from app.rag.llm_provider import build_llm_provider
@@ -164,23 +164,25 @@ async def trigger_exec_brief(payload: TriggerBriefRequest | None = None) -> dict
     workspace_id = data.workspace_id or get_settings().default_workspace_id
 
     summary = await build_daily_brief_data(workspace_id)
-    n8n = N8NClient()
     webhook_payload = {
         "workspace_id": workspace_id,
         "summary": summary,
         "actor": data.actor,
     }
-    await n8n.exec_brief_generator(webhook_payload)
 
-    await execute(
-        """
-        INSERT INTO audit_logs (workspace_id, actor, action, details)
-        VALUES ($1, $2, 'exec_brief.trigger', $3::jsonb)
-        """,
-        workspace_id,
-        data.actor,
-        json.dumps(webhook_payload),
-    )
+    # The worker's outbox dispatcher delivers the webhook once this commits.
+    async with connection() as conn:
+        async with conn.transaction():
+            await enqueue_webhooks(conn, workspace_id, [("exec_brief_generator", webhook_payload)])
+            await conn.execute(
+                """
+                INSERT INTO audit_logs (workspace_id, actor, action, details)
+                VALUES ($1, $2, 'exec_brief.trigger', $3::jsonb)
+                """,
+                workspace_id,
+                data.actor,
+                json.dumps(webhook_payload),
+            )
 
     return {
         "workspace_id": workspace_id,
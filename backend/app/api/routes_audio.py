@@ -6,7 +6,7 @@ import json
 from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel, Field
 
-from app.agents.events import emit_realtime_event
+from app.agents.events import emit_realtime_event, notify_audio_job
 from app.config import get_settings
 from app.db.postgres import execute, fetchrow
 from app.sonification.presets import normalize_preset_name
@@ -62,6 +62,7 @@ async def queue_audio_render(payload: AudioRenderRequest) -> dict[str, object]:
         json.dumps(payload.controls),
         correlation_id,
     )
+    await notify_audio_job(workspace_id, job_id, "queued")
 
     await emit_realtime_event(
         workspace_id,
@@ -121,6 +122,40 @@ async def get_audio_job(
     }
 
 
+@router.post("/audio/jobs/{job_id}/cancel")
+async def cancel_audio_job(
+    job_id: str,
+    workspace_id: str = Query(default_factory=lambda: get_settings().default_workspace_id),
+) -> dict[str, object]:
+    row = await fetchrow(
+        """
+        UPDATE audio_jobs
+        SET status = 'cancelled', updated_at = NOW()
+        WHERE job_id = $1::uuid AND workspace_id = $2 AND status IN ('queued', 'processing')
+        RETURNING job_id, metric_name
+        """,
+        job_id,
+        workspace_id,
+    )
+    if not row:
+        existing = await fetchrow(
+            "SELECT status FROM audio_jobs WHERE job_id = $1::uuid AND workspace_id = $2",
+            job_id,
+            workspace_id,
+        )
+        if not existing:
+            raise HTTPException(status_code=404, detail="job not found")
+        raise HTTPException(status_code=409, detail=f"job already {existing['status']}")
+    await notify_audio_job(workspace_id, job_id, "cancelled")
+
+    await emit_realtime_event(
+        workspace_id,
+        "audio.render.cancelled",
+        {"job_id": job_id, "metric_name": row["metric_name"]},
+    )
+    return {"job_id": job_id, "status": "cancelled", "workspace_id": workspace_id}
+
+
 @router.get("/audio/{artifact_id}/url", response_model=AudioUrlResponse)
 async def get_audio_url(
     artifact_id: str,
@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from fastapi import APIRouter
 
-from app.clickhouse.client import get_clickhouse
+from app.clickhouse.async_client import get_async_clickhouse
 from app.db.postgres import fetchval
 from app.storage.minio_client import get_minio
 
@@ -22,7 +22,7 @@ async def health() -> dict[str, object]:
         postgres_ok = False
 
     try:
-        clickhouse_ok = get_clickhouse().dump() == '{"status": "ok"}'
+        clickhouse_ok = await get_async_clickhouse().dump() == '{"status": "ok"}'
     except Exception:
         clickhouse_ok = False
 
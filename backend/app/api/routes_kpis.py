@@ -1,17 +1,18 @@
 from __future__ import annotations
 
-import asyncio
-import json
 from datetime import datetime
 from typing import Any
 
 from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel, Field
 
-from app.clickhouse.client import get_clickhouse
+from app.clickhouse.buffer import insert_kpi_points as buffered_insert_kpi_points
+from app.clickhouse.async_client import get_async_clickhouse
 from app.clickhouse.ingest import clickhouse_rows_from_points
 from app.config import get_settings
-from app.db.postgres import execute, fetch
+from app.db.kpi_recent import write_recent_points
+from app.db.postgres import fetch
+from app.kpi_stream import publish_kpi_points
 from app.metrics import clickhouse_ingest_rows_total, kpi_ingest_total
 
 router = APIRouter(tags=["kpis"])
@@ -47,40 +48,18 @@ async def ingest_kpis(payload: KpiIngestRequest) -> dict[str, object]:
         for item in payload.points
     ]
 
-    clickhouse = get_clickhouse()
-    await asyncio.to_thread(clickhouse.insert_kpi_points, clickhouse_rows_from_points(points))
+    await buffered_insert_kpi_points(clickhouse_rows_from_points(points))
 
-    for point in points:
-        await execute(
-            """
-            INSERT INTO kpi_points_recent (workspace_id, metric_name, ts, value, tags)
-            VALUES ($1, $2, $3, $4, $5::jsonb)
-            """,
-            point["workspace_id"],
-            point["metric_name"],
-            point["timestamp"],
-            float(point["value"]),
-            json.dumps(point.get("tags", {})),
-        )
-
-    # Keep operational copy bounded per workspace+metric.
     metrics = sorted({point["metric_name"] for point in points})
-    for metric in metrics:
-        await execute(
-            """
-            DELETE FROM kpi_points_recent
-            WHERE id IN (
-                SELECT id
-                FROM kpi_points_recent
-                WHERE workspace_id = $1 AND metric_name = $2
-                ORDER BY ts DESC
-                OFFSET $3
-            )
-            """,
-            workspace_id,
-            metric,
-            get_settings().max_recent_operational_points,
-        )
+    # Keep operational copy bounded per workspace+metric.
+    await write_recent_points(
+        workspace_id,
+        points,
+        keep_per_metric=settings.max_recent_operational_points,
+    )
+
+    # Live dashboards get per-metric deltas instead of re-polling the reads below.
+    publish_kpi_points(workspace_id, points)
 
     kpi_ingest_total.inc(len(points))
     clickhouse_ingest_rows_total.inc(len(points))
@@ -142,8 +121,7 @@ async def analytics_kpi(
     minutes: int = Query(default=180, ge=5, le=10080),
     workspace_id: str = Query(default_factory=lambda: get_settings().default_workspace_id),
 ) -> dict[str, object]:
-    clickhouse = get_clickhouse()
-    rows = await asyncio.to_thread(clickhouse.kpi_rollups, workspace_id, metric, minutes)
+    rows = await get_async_clickhouse().kpi_rollups(workspace_id, metric, minutes)
     return {"workspace_id": workspace_id, "metric": metric, "rows": rows}
 
 
@@ -152,8 +130,7 @@ async def analytics_anomalies(
     minutes: int = Query(default=1440, ge=15, le=10080),
     workspace_id: str = Query(default_factory=lambda: get_settings().default_workspace_id),
 ) -> dict[str, object]:
-    clickhouse = get_clickhouse()
-    data = await asyncio.to_thread(clickhouse.anomalies_analytics, workspace_id, minutes)
+    data = await get_async_clickhouse().anomalies_analytics(workspace_id, minutes)
     return {"workspace_id": workspace_id, **data}
 
 
@@ -162,6 +139,5 @@ async def analytics_audio(
     minutes: int = Query(default=1440, ge=15, le=10080),
     workspace_id: str = Query(default_factory=lambda: get_settings().default_workspace_id),
 ) -> dict[str, object]:
-    clickhouse = get_clickhouse()
-    data = await asyncio.to_thread(clickhouse.audio_analytics, workspace_id, minutes)
+    data = await get_async_clickhouse().audio_analytics(workspace_id, minutes)
     return {"workspace_id": workspace_id, "rows": data}
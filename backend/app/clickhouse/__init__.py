@@ -1,3 +1,20 @@
+from app.clickhouse.async_client import (
+    AsyncClickHouseService,
+    close_async_clickhouse,
+    get_async_clickhouse,
+    init_async_clickhouse,
+)
+from app.clickhouse.buffer import close_kpi_buffer, init_kpi_buffer
 from app.clickhouse.client import ClickHouseService, get_clickhouse, init_clickhouse
 
-__all__ = ["ClickHouseService", "get_clickhouse", "init_clickhouse"]
+__all__ = [
+    "AsyncClickHouseService",
+    "ClickHouseService",
+    "close_async_clickhouse",
+    "close_kpi_buffer",
+    "get_async_clickhouse",
+    "get_clickhouse",
+    "init_async_clickhouse",
+    "init_clickhouse",
+    "init_kpi_buffer",
+]
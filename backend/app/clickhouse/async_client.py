@@ -0,0 +1,294 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import re
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import Any, Callable
+from urllib.parse import urlparse
+
+import httpx
+import orjson
+from opentelemetry import trace
+
+from app.clickhouse.queries import (
+    ACTIVE_WORKSPACES_QUERY,
+    ANOMALY_ANALYTICS_QUERY,
+    ANOMALY_COLUMNS,
+    AUDIO_ANALYTICS_QUERY,
+    AUDIO_RENDER_COLUMNS,
+    KPI_POINT_COLUMNS,
+    KPI_ROLLUP_QUERY,
+    METRIC_NAMES_QUERY,
+    RECENT_POINTS_QUERY,
+    RECENT_SERIES_QUERY,
+    SEVERITY_ANALYTICS_QUERY,
+    anomaly_analytics_rows,
+    audio_analytics_rows,
+    kpi_rollup_rows,
+    recent_series_rows,
+)
+from app.config import get_settings
+from app.metrics import clickhouse_pool_acquire_seconds, clickhouse_pool_in_use
+
+logger = logging.getLogger(__name__)
+
+_ach: "AsyncClickHouseService | None" = None
+
+_WIDE_INT_RE = re.compile(r"U?Int(64|128|256)")
+
+
+def _array_param(values: list[str]) -> str:
+    # HTTP query parameters take ClickHouse literal syntax for arrays.
+    quoted = (value.replace("\\", "\\\\").replace("'", "\\'") for value in values)
+    return "[" + ",".join(f"'{value}'" for value in quoted) + "]"
+
+
+def _parse_datetime(value: Any) -> Any:
+    if not isinstance(value, str):
+        return value
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def _converter(type_name: str) -> Callable[[Any], Any] | None:
+    if type_name.startswith("Array(") and type_name.endswith(")"):
+        inner = _converter(type_name[len("Array(") : -1])
+        if inner is None:
+            return None
+        return lambda value: [inner(item) for item in value] if value is not None else None
+    if "DateTime" in type_name:
+        return _parse_datetime
+    if _WIDE_INT_RE.search(type_name):
+        return lambda value: int(value) if value is not None else None
+    return None
+
+
+def _decode_rows(payload: dict[str, Any]) -> list[list[Any]]:
+    converters = [_converter(str(column["type"])) for column in payload.get("meta", [])]
+    rows: list[list[Any]] = payload.get("data", [])
+    if not any(converters):
+        return rows
+    for row in rows:
+        for idx, convert in enumerate(converters):
+            if convert is not None:
+                row[idx] = convert(row[idx])
+    return rows
+
+
+# Bounded httpx client for one workload; requests beyond `size` wait for a slot
+# (up to acquire_timeout) instead of queueing inside httpx, so the wait is visible.
+class AsyncClientLane:
+    def __init__(self, name: str, size: int, acquire_timeout: float, client: httpx.AsyncClient) -> None:
+        self.name = name
+        self.size = size
+        self.acquire_timeout = acquire_timeout
+        self.client = client
+        self._slots = asyncio.Semaphore(size)
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[httpx.AsyncClient]:
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.acquire_timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"clickhouse {self.name} pool exhausted after {self.acquire_timeout:.1f}s") from None
+        clickhouse_pool_acquire_seconds.labels(lane=self.name).observe(time.perf_counter() - started)
+        clickhouse_pool_in_use.labels(lane=self.name).inc()
+        try:
+            yield self.client
+        finally:
+            clickhouse_pool_in_use.labels(lane=self.name).dec()
+            self._slots.release()
+
+
+# Mirrors ClickHouseService on top of the ClickHouse HTTP interface, so API
+# handlers and the worker never block the event loop. Like the sync service,
+# reads and writes use separate lanes so a large ingest insert never holds the
+# connections that dashboard analytics queries need.
+class AsyncClickHouseService:
+    def __init__(self) -> None:
+        settings = get_settings()
+        parsed = urlparse(settings.clickhouse_url)
+        scheme = parsed.scheme or "http"
+        host = parsed.hostname or "clickhouse"
+        port = parsed.port or 8123
+        self._base_url = f"{scheme}://{host}:{port}"
+        self._headers = {
+            "X-ClickHouse-User": settings.clickhouse_user,
+            "X-ClickHouse-Key": settings.clickhouse_password,
+        }
+        self._timeout = settings.clickhouse_async_timeout_seconds
+        acquire_timeout = settings.clickhouse_pool_acquire_timeout_seconds
+        self.read_lane = self._lane("read", settings.clickhouse_read_pool_size, acquire_timeout)
+        self.write_lane = self._lane("write", settings.clickhouse_write_pool_size, acquire_timeout)
+
+    def _lane(self, name: str, size: int, acquire_timeout: float) -> AsyncClientLane:
+        client = httpx.AsyncClient(
+            base_url=self._base_url,
+            headers=self._headers,
+            limits=httpx.Limits(max_connections=size, max_keepalive_connections=size),
+            timeout=httpx.Timeout(self._timeout),
+        )
+        return AsyncClientLane(name, size, acquire_timeout, client)
+
+    async def close(self) -> None:
+        await asyncio.gather(self.read_lane.client.aclose(), self.write_lane.client.aclose())
+
+    async def _post(self, lane: AsyncClientLane, params: dict[str, object], content: bytes | str) -> httpx.Response:
+        async with lane.acquire() as client:
+            response = await client.post("/", params=params, content=content)
+        if response.status_code >= 400:
+            raise RuntimeError(f"clickhouse error {response.status_code}: {response.text[:300]}")
+        return response
+
+    async def _query(self, query: str, parameters: dict[str, object] | None = None) -> list[list[Any]]:
+        tracer = trace.get_tracer("sonataops.clickhouse")
+        with tracer.start_as_current_span("clickhouse.query") as span:
+            span.set_attribute("db.system", "clickhouse")
+            span.set_attribute("db.operation", "select")
+            span.set_attribute("db.statement", query[:300])
+            params: dict[str, object] = {
+                "default_format": "JSONCompact",
+                "date_time_output_format": "iso",
+            }
+            for key, value in (parameters or {}).items():
+                params[f"param_{key}"] = value
+            response = await self._post(self.read_lane, params, query)
+            return _decode_rows(response.json())
+
+    async def _insert(self, table: str, rows: list[tuple[object, ...]], column_names: list[str]) -> None:
+        tracer = trace.get_tracer("sonataops.clickhouse")
+        with tracer.start_as_current_span(f"clickhouse.insert.{table}") as span:
+            span.set_attribute("db.system", "clickhouse")
+            span.set_attribute("db.operation", "insert")
+            span.set_attribute("db.table", table)
+            span.set_attribute("db.rows", len(rows))
+            columns = ", ".join(column_names)
+            body = b"\n".join(orjson.dumps(list(row), default=str) for row in rows)
+            await self._post(
+                self.write_lane,
+                {
+                    "query": f"INSERT INTO {table} ({columns}) FORMAT JSONCompactEachRow",
+                    "date_time_input_format": "best_effort",
+                },
+                body,
+            )
+
+    async def insert_kpi_points(self, rows: list[tuple[object, ...]]) -> None:
+        if not rows:
+            return
+        await self._insert("kpi_points_raw", rows, column_names=KPI_POINT_COLUMNS)
+
+    async def insert_anomaly(self, row: tuple[object, ...]) -> None:
+        await self._insert("anomalies_raw", [row], column_names=ANOMALY_COLUMNS)
+
+    async def insert_anomalies(self, rows: list[tuple[object, ...]]) -> None:
+        if not rows:
+            return
+        await self._insert("anomalies_raw", rows, column_names=ANOMALY_COLUMNS)
+
+    async def insert_audio_render(self, row: tuple[object, ...]) -> None:
+        await self._insert("audio_renders", [row], column_names=AUDIO_RENDER_COLUMNS)
+
+    async def metric_names(self, workspace_id: str, minutes: int = 180) -> list[str]:
+        rows = await self._query(
+            METRIC_NAMES_QUERY,
+            parameters={"workspace_id": workspace_id, "minutes": minutes},
+        )
+        return [str(row[0]) for row in rows]
+
+    async def active_workspaces(self, minutes: int = 180) -> list[str]:
+        rows = await self._query(ACTIVE_WORKSPACES_QUERY, parameters={"minutes": minutes})
+        return [str(row[0]) for row in rows]
+
+    async def recent_points(self, workspace_id: str, metric_name: str, minutes: int = 120) -> list[tuple[datetime, float]]:
+        rows = await self._query(
+            RECENT_POINTS_QUERY,
+            parameters={
+                "workspace_id": workspace_id,
+                "metric_name": metric_name,
+                "minutes": minutes,
+            },
+        )
+        return [(row[0], float(row[1])) for row in rows]
+
+    async def recent_series(
+        self,
+        workspace_id: str,
+        minutes: int = 180,
+        since: datetime | None = None,
+        metrics: list[str] | None = None,
+    ) -> dict[str, list[tuple[datetime, float]]]:
+        rows = await self._query(
+            RECENT_SERIES_QUERY,
+            parameters={
+                "workspace_id": workspace_id,
+                "minutes": minutes,
+                "since_ms": int(since.timestamp() * 1000) if since else 0,
+                "filter_metrics": 1 if metrics is not None else 0,
+                "metrics": _array_param(metrics or []),
+            },
+        )
+        return recent_series_rows(rows)
+
+    async def kpi_rollups(self, workspace_id: str, metric_name: str, minutes: int) -> list[dict[str, object]]:
+        rows = await self._query(
+            KPI_ROLLUP_QUERY,
+            parameters={
+                "workspace_id": workspace_id,
+                "metric_name": metric_name,
+                "minutes": minutes,
+            },
+        )
+        return kpi_rollup_rows(rows)
+
+    async def anomalies_analytics(self, workspace_id: str, minutes: int) -> dict[str, list[dict[str, object]]]:
+        counts, p95 = await asyncio.gather(
+            self._query(
+                ANOMALY_ANALYTICS_QUERY,
+                parameters={"workspace_id": workspace_id, "minutes": minutes},
+            ),
+            self._query(
+                SEVERITY_ANALYTICS_QUERY,
+                parameters={"workspace_id": workspace_id, "minutes": minutes},
+            ),
+        )
+        return anomaly_analytics_rows(counts, p95)
+
+    async def audio_analytics(self, workspace_id: str, minutes: int) -> list[dict[str, object]]:
+        rows = await self._query(
+            AUDIO_ANALYTICS_QUERY,
+            parameters={"workspace_id": workspace_id, "minutes": minutes},
+        )
+        return audio_analytics_rows(rows)
+
+    async def dump(self) -> str:
+        return json.dumps({"status": "ok"})
+
+
+def init_async_clickhouse() -> None:
+    global _ach
+    if _ach:
+        return
+    _ach = AsyncClickHouseService()
+    logger.info("async clickhouse initialized")
+
+
+async def close_async_clickhouse() -> None:
+    global _ach
+    if _ach:
+        await _ach.close()
+        _ach = None
+
+
+def get_async_clickhouse() -> AsyncClickHouseService:
+    if _ach is None:
+        raise RuntimeError("async clickhouse is not initialized")
+    return _ach
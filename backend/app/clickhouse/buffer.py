@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+
+from app.clickhouse.async_client import get_async_clickhouse
+from app.config import get_settings
+from app.metrics import kpi_ingest_buffer_rows, kpi_ingest_flush_seconds, kpi_ingest_flushes_total
+
+logger = logging.getLogger(__name__)
+
+_buffer: "KpiIngestBuffer | None" = None
+
+
+# Merges kpi_points_raw rows from concurrent ingest calls into fewer INSERTs.
+# submit() resolves once the batch holding its rows is written, so callers keep
+# direct-insert durability; buffered + in-flight rows are capped for backpressure.
+class KpiIngestBuffer:
+    def __init__(self, flush_rows: int, flush_interval_seconds: float, max_pending_rows: int) -> None:
+        self.flush_rows = flush_rows
+        self.flush_interval_seconds = flush_interval_seconds
+        self.max_pending_rows = max(max_pending_rows, flush_rows)
+        self._rows: list[tuple[object, ...]] = []
+        self._waiters: list[asyncio.Future[None]] = []
+        self._first_row_at: float | None = None
+        self._pending = 0
+        self._space = asyncio.Condition()
+        self._wakeup = asyncio.Event()
+        self._closed = False
+        self._task: asyncio.Task[None] | None = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="kpi-ingest-buffer")
+
+    async def submit(self, rows: list[tuple[object, ...]]) -> None:
+        if not rows:
+            return
+        if self._closed:
+            raise RuntimeError("kpi ingest buffer is closed")
+
+        loop = asyncio.get_running_loop()
+        async with self._space:
+            # An oversized batch is admitted alone once the buffer drains.
+            await self._space.wait_for(
+                lambda: self._closed or self._pending == 0 or self._pending + len(rows) <= self.max_pending_rows
+            )
+            closed = self._closed
+            if not closed:
+                waiter: asyncio.Future[None] = loop.create_future()
+                self._rows.extend(rows)
+                self._waiters.append(waiter)
+                self._pending += len(rows)
+                if self._first_row_at is None:
+                    self._first_row_at = time.monotonic()
+                kpi_ingest_buffer_rows.set(self._pending)
+                if len(self._rows) >= self.flush_rows:
+                    self._wakeup.set()
+                elif len(self._waiters) == 1:
+                    # Re-arm the age timer for the first rows of a new batch.
+                    self._wakeup.set()
+
+        if closed:
+            # Closed while waiting for space: the flush task may already be
+            # gone, so write these rows directly.
+            await get_async_clickhouse().insert_kpi_points(rows)
+            return
+        await waiter
+
+    async def close(self) -> None:
+        self._closed = True
+        self._wakeup.set()
+        async with self._space:
+            self._space.notify_all()
+        if self._task is not None:
+            await self._task
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            if self._closed and not self._rows:
+                return
+            if not self._closed:
+                timeout: float | None = None
+                if self._first_row_at is not None:
+                    timeout = max(0.0, self._first_row_at + self.flush_interval_seconds - time.monotonic())
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+
+            if not self._rows:
+                continue
+
+            if self._closed:
+                reason = "shutdown"
+            elif len(self._rows) >= self.flush_rows:
+                reason = "size"
+            elif time.monotonic() - (self._first_row_at or 0.0) >= self.flush_interval_seconds:
+                reason = "age"
+            else:
+                continue
+            await self._flush(reason)
+
+    async def _flush(self, reason: str) -> None:
+        rows, waiters = self._rows, self._waiters
+        self._rows, self._waiters, self._first_row_at = [], [], None
+
+        started = time.perf_counter()
+        try:
+            await get_async_clickhouse().insert_kpi_points(rows)
+        except Exception as exc:  # noqa: BLE001
+            logger.exception("kpi ingest buffer flush failed rows=%s", len(rows))
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_exception(exc)
+        else:
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_result(None)
+        finally:
+            kpi_ingest_flush_seconds.observe(time.perf_counter() - started)
+            kpi_ingest_flushes_total.labels(reason=reason).inc()
+            async with self._space:
+                self._pending -= len(rows)
+                kpi_ingest_buffer_rows.set(self._pending)
+                self._space.notify_all()
+
+
+def init_kpi_buffer() -> None:
+    global _buffer
+    settings = get_settings()
+    if _buffer or not settings.kpi_ingest_buffer_enabled:
+        return
+    _buffer = KpiIngestBuffer(
+        flush_rows=settings.kpi_ingest_flush_rows,
+        flush_interval_seconds=settings.kpi_ingest_flush_interval_ms / 1000,
+        max_pending_rows=settings.kpi_ingest_max_pending_rows,
+    )
+    _buffer.start()
+    logger.info("kpi ingest buffer started")
+
+
+async def close_kpi_buffer() -> None:
+    global _buffer
+    if _buffer:
+        await _buffer.close()
+        _buffer = None
+
+
+async def insert_kpi_points(rows: list[tuple[object, ...]]) -> None:
+    if _buffer is None:
+        await get_async_clickhouse().insert_kpi_points(rows)
+        return
+    await _buffer.submit(rows)
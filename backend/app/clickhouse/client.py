@@ -2,43 +2,105 @@ from __future__ import annotations
 
 import json
 import logging
+import queue
 import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
 from pathlib import Path
+from typing import Callable, Iterator
 from urllib.parse import urlparse
 
 import clickhouse_connect
+from clickhouse_connect.driver import httputil
 from clickhouse_connect.driver.client import Client
 from opentelemetry import trace
 
 from app.config import get_settings
 from app.clickhouse.queries import (
     ANOMALY_ANALYTICS_QUERY,
+    ANOMALY_COLUMNS,
     AUDIO_ANALYTICS_QUERY,
+    AUDIO_RENDER_COLUMNS,
+    KPI_POINT_COLUMNS,
     KPI_ROLLUP_QUERY,
+    METRIC_NAMES_QUERY,
+    RECENT_POINTS_QUERY,
+    RECENT_SERIES_QUERY,
     SEVERITY_ANALYTICS_QUERY,
+    anomaly_analytics_rows,
+    audio_analytics_rows,
+    kpi_rollup_rows,
+    recent_series_rows,
 )
+from app.metrics import clickhouse_pool_acquire_seconds, clickhouse_pool_in_use
 
 logger = logging.getLogger(__name__)
 
 _ch: "ClickHouseService | None" = None
 
 
+# Bounded, lazily filled pool of clickhouse_connect clients for one workload.
+class ClientLane:
+    def __init__(self, name: str, size: int, acquire_timeout: float, factory: Callable[[], Client]) -> None:
+        self.name = name
+        self.size = size
+        self.acquire_timeout = acquire_timeout
+        self._factory = factory
+        self._idle: queue.LifoQueue[Client] = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    @contextmanager
+    def acquire(self) -> Iterator[Client]:
+        started = time.perf_counter()
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            raise TimeoutError(f"clickhouse {self.name} pool exhausted after {self.acquire_timeout:.1f}s")
+        clickhouse_pool_acquire_seconds.labels(lane=self.name).observe(time.perf_counter() - started)
+        try:
+            try:
+                client = self._idle.get_nowait()
+            except queue.Empty:
+                client = self._factory()
+            clickhouse_pool_in_use.labels(lane=self.name).inc()
+            try:
+                yield client
+            finally:
+                clickhouse_pool_in_use.labels(lane=self.name).dec()
+                self._idle.put(client)
+        finally:
+            self._slots.release()
+
+
 class ClickHouseService:
     def __init__(self) -> None:
         settings = get_settings()
         parsed = urlparse(settings.clickhouse_url)
-        host = parsed.hostname or "clickhouse"
-        port = parsed.port or 8123
-        self._lock = threading.Lock()
-        self.client: Client = clickhouse_connect.get_client(
-            host=host,
-            port=port,
-            username=settings.clickhouse_user,
-            password=settings.clickhouse_password,
-            # Dashboard loads analytics in parallel; disable sessions so queries do not
-            # contend on a single generated session id in clickhouse_connect.
-            autogenerate_session_id=False,
-        )
+        self._host = parsed.hostname or "clickhouse"
+        self._port = parsed.port or 8123
+        self._username = settings.clickhouse_user
+        self._password = settings.clickhouse_password
+        # Reads and writes use separate lanes so a large ingest insert never holds
+        # the clients that dashboard analytics queries need.
+        timeout = settings.clickhouse_pool_acquire_timeout_seconds
+        self.read_lane = self._lane("read", settings.clickhouse_read_pool_size, timeout)
+        self.write_lane = self._lane("write", settings.clickhouse_write_pool_size, timeout)
+
+    def _lane(self, name: str, size: int, acquire_timeout: float) -> ClientLane:
+        pool_mgr = httputil.get_pool_manager(maxsize=size)
+
+        def factory() -> Client:
+            return clickhouse_connect.get_client(
+                host=self._host,
+                port=self._port,
+                username=self._username,
+                password=self._password,
+                # Pooled clients run queries in parallel; disable sessions so they do not
+                # contend on a single generated session id in clickhouse_connect.
+                autogenerate_session_id=False,
+                pool_mgr=pool_mgr,
+            )
+
+        return ClientLane(name, size, acquire_timeout, factory)
 
     def init_schema(self) -> None:
         schema_path = Path(__file__).with_name("schema.sql")
@@ -47,8 +109,8 @@ class ClickHouseService:
             self._command(stmt)
 
     def _command(self, query: str, parameters: dict[str, object] | None = None) -> object:
-        with self._lock:
-            return self.client.command(query, parameters=parameters)
+        with self.write_lane.acquire() as client:
+            return client.command(query, parameters=parameters)
 
     def _query(self, query: str, parameters: dict[str, object] | None = None) -> object:
         tracer = trace.get_tracer("sonataops.clickhouse")
@@ -56,8 +118,8 @@ class ClickHouseService:
             span.set_attribute("db.system", "clickhouse")
             span.set_attribute("db.operation", "select")
             span.set_attribute("db.statement", query[:300])
-            with self._lock:
-                return self.client.query(query, parameters=parameters)
+            with self.read_lane.acquire() as client:
+                return client.query(query, parameters=parameters)
 
     def _insert(self, table: str, rows: list[tuple[object, ...]], column_names: list[str]) -> None:
         tracer = trace.get_tracer("sonataops.clickhouse")
@@ -66,72 +128,35 @@ class ClickHouseService:
             span.set_attribute("db.operation", "insert")
             span.set_attribute("db.table", table)
             span.set_attribute("db.rows", len(rows))
-            with self._lock:
-                self.client.insert(table, rows, column_names=column_names)
+            with self.write_lane.acquire() as client:
+                client.insert(table, rows, column_names=column_names)
 
     def insert_kpi_points(self, rows: list[tuple[object, ...]]) -> None:
         if not rows:
             return
-        self._insert(
-            "kpi_points_raw",
-            rows,
-            column_names=["workspace_id", "metric_name", "ts", "value", "tags"],
-        )
+        self._insert("kpi_points_raw", rows, column_names=KPI_POINT_COLUMNS)
 
     def insert_anomaly(self, row: tuple[object, ...]) -> None:
-        self._insert(
-            "anomalies_raw",
-            [row],
-            column_names=[
-                "workspace_id",
-                "anomaly_id",
-                "metric_name",
-                "window_start",
-                "window_end",
-                "severity",
-                "features",
-                "detected_at",
-            ],
-        )
+        self._insert("anomalies_raw", [row], column_names=ANOMALY_COLUMNS)
+
+    def insert_anomalies(self, rows: list[tuple[object, ...]]) -> None:
+        if not rows:
+            return
+        self._insert("anomalies_raw", rows, column_names=ANOMALY_COLUMNS)
 
     def insert_audio_render(self, row: tuple[object, ...]) -> None:
-        self._insert(
-            "audio_renders",
-            [row],
-            column_names=[
-                "workspace_id",
-                "artifact_id",
-                "anomaly_id",
-                "metric_name",
-                "preset",
-                "duration_seconds",
-                "render_ms",
-                "created_at",
-            ],
-        )
+        self._insert("audio_renders", [row], column_names=AUDIO_RENDER_COLUMNS)
 
     def metric_names(self, workspace_id: str, minutes: int = 180) -> list[str]:
         result = self._query(
-            """
-            SELECT DISTINCT metric_name
-            FROM kpi_points_raw
-            WHERE workspace_id = %(workspace_id)s
-              AND ts >= now() - toIntervalMinute(%(minutes)s)
-            """,
+            METRIC_NAMES_QUERY,
             parameters={"workspace_id": workspace_id, "minutes": minutes},
         )
         return [str(row[0]) for row in result.result_rows]
 
     def recent_points(self, workspace_id: str, metric_name: str, minutes: int = 120) -> list[tuple[str, float]]:
         result = self._query(
-            """
-            SELECT ts, value
-            FROM kpi_points_raw
-            WHERE workspace_id = %(workspace_id)s
-              AND metric_name = %(metric_name)s
-              AND ts >= now() - toIntervalMinute(%(minutes)s)
-            ORDER BY ts ASC
-            """,
+            RECENT_POINTS_QUERY,
             parameters={
                 "workspace_id": workspace_id,
                 "metric_name": metric_name,
@@ -140,6 +165,25 @@ class ClickHouseService:
         )
         return [(row[0], float(row[1])) for row in result.result_rows]
 
+    def recent_series(
+        self,
+        workspace_id: str,
+        minutes: int = 180,
+        since: datetime | None = None,
+        metrics: list[str] | None = None,
+    ) -> dict[str, list[tuple[object, float]]]:
+        result = self._query(
+            RECENT_SERIES_QUERY,
+            parameters={
+                "workspace_id": workspace_id,
+                "minutes": minutes,
+                "since_ms": int(since.timestamp() * 1000) if since else 0,
+                "filter_metrics": 1 if metrics is not None else 0,
+                "metrics": list(metrics or []),
+            },
+        )
+        return recent_series_rows(result.result_rows)
+
     def kpi_rollups(self, workspace_id: str, metric_name: str, minutes: int) -> list[dict[str, object]]:
         result = self._query(
             KPI_ROLLUP_QUERY,
@@ -149,18 +193,7 @@ class ClickHouseService:
                 "minutes": minutes,
             },
         )
-        rows: list[dict[str, object]] = []
-        for row in result.result_rows:
-            rows.append(
-                {
-                    "bucket": row[0].isoformat(),
-                    "avg": float(row[1]),
-                    "min": float(row[2]),
-                    "max": float(row[3]),
-                    "points": int(row[4]),
-                }
-            )
-        return rows
+        return kpi_rollup_rows(result.result_rows)
 
     def anomalies_analytics(self, workspace_id: str, minutes: int) -> dict[str, list[dict[str, object]]]:
         counts = self._query(
@@ -171,40 +204,14 @@ class ClickHouseService:
             SEVERITY_ANALYTICS_QUERY,
             parameters={"workspace_id": workspace_id, "minutes": minutes},
         )
-
-        return {
-            "counts": [
-                {
-                    "metric": row[0],
-                    "bucket": row[1].isoformat(),
-                    "count": int(row[2]),
-                }
-                for row in counts.result_rows
-            ],
-            "severity_p95": [
-                {
-                    "metric": row[0],
-                    "bucket": row[1].isoformat(),
-                    "p95": float(row[2]),
-                }
-                for row in p95.result_rows
-            ],
-        }
+        return anomaly_analytics_rows(counts.result_rows, p95.result_rows)
 
     def audio_analytics(self, workspace_id: str, minutes: int) -> list[dict[str, object]]:
         result = self._query(
             AUDIO_ANALYTICS_QUERY,
             parameters={"workspace_id": workspace_id, "minutes": minutes},
         )
-        return [
-            {
-                "metric": row[0],
-                "preset": row[1],
-                "renders": int(row[2]),
-                "avg_render_ms": float(row[3]),
-            }
-            for row in result.result_rows
-        ]
+        return audio_analytics_rows(result.result_rows)
 
     def dump(self) -> str:
         return json.dumps({"status": "ok"})
@@ -1,25 +1,94 @@
+from __future__ import annotations
+
+from typing import Any, Sequence
+
+KPI_POINT_COLUMNS = ["workspace_id", "metric_name", "ts", "value", "tags"]
+
+ANOMALY_COLUMNS = [
+    "workspace_id",
+    "anomaly_id",
+    "metric_name",
+    "window_start",
+    "window_end",
+    "severity",
+    "features",
+    "detected_at",
+]
+
+AUDIO_RENDER_COLUMNS = [
+    "workspace_id",
+    "artifact_id",
+    "anomaly_id",
+    "metric_name",
+    "preset",
+    "duration_seconds",
+    "render_ms",
+    "created_at",
+]
+
+METRIC_NAMES_QUERY = """
+SELECT DISTINCT metric_name
+FROM kpi_points_raw
+WHERE workspace_id = {workspace_id:String}
+  AND ts >= now() - toIntervalMinute({minutes:UInt32})
+"""
+
+ACTIVE_WORKSPACES_QUERY = """
+SELECT DISTINCT workspace_id
+FROM kpi_points_raw
+WHERE ts >= now() - toIntervalMinute({minutes:UInt32})
+"""
+
+RECENT_POINTS_QUERY = """
+SELECT ts, value
+FROM kpi_points_raw
+WHERE workspace_id = {workspace_id:String}
+  AND metric_name = {metric_name:String}
+  AND ts >= now() - toIntervalMinute({minutes:UInt32})
+ORDER BY ts ASC
+"""
+
+# One scan for every metric of a workspace; each row carries columnar ts/value
+# arrays sorted by ts, so the detection cycle needs a single round trip.
+RECENT_SERIES_QUERY = """
+SELECT
+  metric_name,
+  arrayMap(p -> p.1, points) AS ts,
+  arrayMap(p -> p.2, points) AS values
+FROM (
+  SELECT metric_name, arraySort(groupArray((ts, value))) AS points
+  FROM kpi_points_raw
+  WHERE workspace_id = {workspace_id:String}
+    AND ts >= now() - toIntervalMinute({minutes:UInt32})
+    AND ts > fromUnixTimestamp64Milli({since_ms:Int64})
+    AND (NOT {filter_metrics:UInt8} OR has({metrics:Array(String)}, metric_name))
+  GROUP BY metric_name
+)
+ORDER BY metric_name ASC
+"""
+
 KPI_ROLLUP_QUERY = """
 SELECT bucket, avg_value, min_value, max_value, points
 FROM kpi_1m_rollup
-WHERE workspace_id = %(workspace_id)s
-  AND metric_name = %(metric_name)s
-  AND bucket >= now() - toIntervalMinute(%(minutes)s)
+WHERE workspace_id = {workspace_id:String}
+  AND metric_name = {metric_name:String}
+  AND bucket >= now() - toIntervalMinute({minutes:UInt32})
 ORDER BY bucket ASC
 """
 
 ANOMALY_ANALYTICS_QUERY = """
 SELECT metric_name, bucket, anomaly_count
 FROM anomaly_counts_15m
-WHERE workspace_id = %(workspace_id)s
-  AND bucket >= now() - toIntervalMinute(%(minutes)s)
+WHERE workspace_id = {workspace_id:String}
+  AND bucket >= now() - toIntervalMinute({minutes:UInt32})
 ORDER BY bucket ASC
 """
 
 SEVERITY_ANALYTICS_QUERY = """
 SELECT metric_name, bucket, severity_p95
 FROM severity_p95_1h
-WHERE workspace_id = %(workspace_id)s
-  AND bucket >= now() - toIntervalMinute(%(minutes)s)
+WHERE workspace_id = {workspace_id:String}
+  AND bucket >= now() - toIntervalMinute({minutes:UInt32})
 ORDER BY bucket ASC
 """
 
@@ -30,8 +99,66 @@ SELECT
   count() AS renders,
   avg(render_ms) AS avg_render_ms
 FROM audio_renders
-WHERE workspace_id = %(workspace_id)s
-  AND created_at >= now() - toIntervalMinute(%(minutes)s)
+WHERE workspace_id = {workspace_id:String}
+  AND created_at >= now() - toIntervalMinute({minutes:UInt32})
 GROUP BY metric_name, preset_name
 ORDER BY renders DESC
 """
+
+# Result shaping shared by the sync and async services.
+
+
+def recent_series_rows(rows: Sequence[Sequence[Any]]) -> dict[str, list[tuple[Any, float]]]:
+    return {
+        str(row[0]): [(ts, float(value)) for ts, value in zip(row[1], row[2])]
+        for row in rows
+    }
+
+
+def kpi_rollup_rows(rows: Sequence[Sequence[Any]]) -> list[dict[str, object]]:
+    return [
+        {
+            "bucket": row[0].isoformat(),
+            "avg": float(row[1]),
+            "min": float(row[2]),
+            "max": float(row[3]),
+            "points": int(row[4]),
+        }
+        for row in rows
+    ]
+
+
+def anomaly_analytics_rows(
+    counts: Sequence[Sequence[Any]],
+    p95: Sequence[Sequence[Any]],
+) -> dict[str, list[dict[str, object]]]:
+    return {
+        "counts": [
+            {
+                "metric": row[0],
+                "bucket": row[1].isoformat(),
+                "count": int(row[2]),
+            }
+            for row in counts
+        ],
+        "severity_p95": [
+            {
+                "metric": row[0],
+                "bucket": row[1].isoformat(),
+                "p95": float(row[2]),
+            }
+            for row in p95
+        ],
+    }
+
+
+def audio_analytics_rows(rows: Sequence[Sequence[Any]]) -> list[dict[str, object]]:
+    return [
+        {
+            "metric": row[0],
+            "preset": row[1],
+            "renders": int(row[2]),
+            "avg_render_ms": float(row[3]),
+        }
+        for row in rows
+    ]
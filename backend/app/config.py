@@ -16,6 +16,10 @@ class Settings(BaseSettings):
     clickhouse_url: str = "http://clickhouse:8123"
     clickhouse_user: str = "sonata"
     clickhouse_password: str = "sonata"
+    clickhouse_read_pool_size: int = Field(default=8, ge=1, le=64)
+    clickhouse_write_pool_size: int = Field(default=2, ge=1, le=16)
+    clickhouse_pool_acquire_timeout_seconds: float = Field(default=30.0, gt=0, le=300)
+    clickhouse_async_timeout_seconds: float = Field(default=60.0, gt=0, le=600)
 
     minio_endpoint: str = "minio:9000"
     minio_access_key: str = "minioadmin"
@@ -23,6 +27,8 @@ class Settings(BaseSettings):
     minio_bucket: str = "audio"
     minio_secure: bool = False
     public_minio_url: str = "http://localhost:9000"
+    minio_part_size_bytes: int = Field(default=8 * 1024**2, ge=5 * 1024**2, le=512 * 1024**2)
+    minio_parallel_part_uploads: int = Field(default=3, ge=1, le=16)
     public_api_url: str = "http://localhost:8000"
 
     llm_provider: str = "groq"
@@ -35,14 +41,61 @@ class Settings(BaseSettings):
     n8n_webhook_incident: str = "http://n8n:5678/webhook/incident-narrator"
     n8n_webhook_exec_brief: str = "http://n8n:5678/webhook/exec-brief-generator"
     n8n_webhook_anomaly_correlator: str = "http://n8n:5678/webhook/anomaly-correlator"
+    n8n_timeout_seconds: float = Field(default=15.0, gt=0, le=300)
+    n8n_dispatch_concurrency: int = Field(default=4, ge=1, le=64)
+    n8n_outbox_batch_size: int = Field(default=50, ge=1, le=1000)
+    n8n_outbox_poll_seconds: float = Field(default=10.0, gt=0, le=600)
+    n8n_outbox_max_attempts: int = Field(default=8, ge=1, le=50)
+    n8n_outbox_retry_base_seconds: float = Field(default=5.0, gt=0, le=3600)
+    n8n_outbox_retention_hours: float = Field(default=72.0, gt=0, le=24 * 90)
 
     promptops_require_approval: bool = True
     promptops_auto_approve: bool = True
 
     default_workspace_id: str = "demo-workspace"
+    workspace_weights: dict[str, float] = Field(default_factory=dict)
+    anomaly_workspace_concurrency: int = Field(default=4, ge=1, le=64)
+    worker_member_ttl_seconds: float = Field(default=30.0, ge=5, le=600)
+    worker_shard_vnodes: int = Field(default=64, ge=1, le=1024)
+    worker_task_restart_backoff_seconds: float = Field(default=2.0, gt=0, le=300)
+
+    anomaly_interval_seconds: float = Field(default=30.0, ge=1, le=3600)
+    anomaly_detector_mode: str = Field(default="incremental", pattern="^(incremental|batch)$")
+    anomaly_window_minutes: int = Field(default=180, ge=30, le=1440)
+    anomaly_lateness_seconds: int = Field(default=120, ge=0, le=3600)
+    anomaly_resync_cycles: int = Field(default=20, ge=1, le=10_000)
+
+    audio_render_pool_size: int = Field(default=2, ge=1, le=64)
+    audio_render_sclang_concurrency: int = Field(default=2, ge=1, le=32)
+    audio_render_max_concurrent_jobs: int = Field(default=4, ge=1, le=256)
+    audio_render_timeout_seconds: float = Field(default=900.0, gt=0, le=3600)
+    audio_job_poll_interval_seconds: float = Field(default=30.0, gt=0, le=600)
+    audio_job_lease_seconds: float = Field(default=120.0, ge=10, le=3600)
+    audio_job_max_attempts: int = Field(default=3, ge=1, le=20)
+    pg_listener_reconnect_seconds: float = Field(default=5.0, gt=0, le=300)
+    realtime_keepalive_seconds: float = Field(default=15.0, gt=0, le=300)
+    realtime_queue_max_events: int = Field(default=256, ge=1, le=100_000)
+    realtime_overflow_policy: str = Field(default="drop_oldest", pattern="^(drop_oldest|coalesce|disconnect)$")
+    realtime_event_retention_days: int = Field(default=7, ge=1, le=365)
+    realtime_event_partition_premake_days: int = Field(default=3, ge=1, le=60)
+    audio_scratch_dir: str = ""
+    audio_scratch_max_bytes: int = Field(default=1024**3, ge=64 * 1024**2)
+    sclang_command: str = "sclang"
+    sclang_warm_pool_enabled: bool = True
+    sclang_boot_timeout_seconds: float = Field(default=60.0, gt=0, le=600)
+    sclang_health_check_interval_seconds: float = Field(default=30.0, gt=0, le=3600)
+    sclang_restart_backoff_seconds: float = Field(default=30.0, ge=0, le=3600)
 
     max_recent_operational_points: int = Field(default=500, ge=100, le=5000)
 
+    kpi_ingest_buffer_enabled: bool = True
+    kpi_ingest_flush_rows: int = Field(default=5000, ge=1, le=500_000)
+    kpi_ingest_flush_interval_ms: int = Field(default=250, ge=10, le=10_000)
+    kpi_ingest_max_pending_rows: int = Field(default=50_000, ge=1, le=5_000_000)
+    kpi_stream_enabled: bool = True
+    kpi_stream_interval_ms: int = Field(default=1000, ge=50, le=60_000)
+    kpi_stream_max_points: int = Field(default=100, ge=1, le=1000)
+
 
 @lru_cache(maxsize=1)
 def get_settings() -> Settings:
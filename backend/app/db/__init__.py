@@ -1,3 +1,3 @@
-from app.db.postgres import close_postgres, execute, fetch, fetchrow, init_postgres
+from app.db.postgres import close_postgres, connection, execute, fetch, fetchrow, init_postgres
 
-__all__ = ["init_postgres", "close_postgres", "execute", "fetch", "fetchrow"]
+__all__ = ["init_postgres", "close_postgres", "connection", "execute", "fetch", "fetchrow"]
@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+from collections.abc import Callable
+from typing import Any
+
+import asyncpg
+
+from app.config import get_settings
+from app.db.postgres import execute
+from app.metrics import pg_listener_connected, pg_listener_reconnects_total
+
+logger = logging.getLogger(__name__)
+
+AUDIO_JOBS_CHANNEL = "audio_jobs"
+WEBHOOK_OUTBOX_CHANNEL = "webhook_outbox"
+
+_KEEPALIVE_SECONDS = 30.0
+
+_listener: PgNotificationListener | None = None
+
+Callback = Callable[[str], None]
+
+
+def realtime_channel(workspace_id: str) -> str:
+    # Channel names are identifiers capped at 63 bytes; must match the
+    # 'realtime_' || md5(workspace_id) used when events are inserted.
+    return "realtime_" + hashlib.md5(workspace_id.encode("utf-8"), usedforsecurity=False).hexdigest()
+
+
+def kpi_channel(workspace_id: str) -> str:
+    return "kpi_" + hashlib.md5(workspace_id.encode("utf-8"), usedforsecurity=False).hexdigest()
+
+
+async def notify(channel: str, payload: str) -> None:
+    # Delivered to listeners when the surrounding transaction commits; outside a
+    # transaction that is immediately.
+    await execute("SELECT pg_notify($1, $2)", channel, payload)
+
+
+# One dedicated connection (outside the pool, since it is held forever) that
+# LISTENs on every registered channel and dispatches payloads to callbacks. The
+# connection is re-established with backoff; on_connect callbacks run after
+# every (re)connect so consumers can catch up on anything sent while it was down.
+class PgNotificationListener:
+    def __init__(self, dsn: str, reconnect_backoff_seconds: float) -> None:
+        self.dsn = dsn
+        self.reconnect_backoff_seconds = reconnect_backoff_seconds
+        self._callbacks: dict[str, list[Callback]] = {}
+        self._on_connect: list[Callable[[], None]] = []
+        self._conn: asyncpg.Connection | None = None
+        # asyncpg runs one operation per connection at a time.
+        self._conn_lock = asyncio.Lock()
+        self._task: asyncio.Task[None] | None = None
+
+    def listen(self, channel: str, callback: Callback) -> None:
+        first = channel not in self._callbacks
+        self._callbacks.setdefault(channel, []).append(callback)
+        if first and self._conn is not None and not self._conn.is_closed():
+            asyncio.create_task(self._add_listener(self._conn, channel))
+
+    async def attach(self, channel: str, callback: Callback) -> None:
+        # Like listen(), but returns once the LISTEN is in effect (when connected),
+        # so a caller can read the table afterwards without missing anything.
+        first = channel not in self._callbacks
+        self._callbacks.setdefault(channel, []).append(callback)
+        if first and self._conn is not None and not self._conn.is_closed():
+            await self._add_listener(self._conn, channel)
+
+    async def _add_listener(self, conn: asyncpg.Connection, channel: str) -> None:
+        try:
+            async with self._conn_lock:
+                await conn.add_listener(channel, self._dispatch)
+        except Exception:  # noqa: BLE001
+            # The reconnect loop LISTENs on every registered channel.
+            logger.warning("LISTEN %s failed", channel, exc_info=True)
+
+    async def detach(self, channel: str, callback: Callback) -> None:
+        callbacks = self._callbacks.get(channel)
+        if not callbacks or callback not in callbacks:
+            return
+        callbacks.remove(callback)
+        if callbacks:
+            return
+        del self._callbacks[channel]
+        conn = self._conn
+        if conn is not None and not conn.is_closed():
+            try:
+                async with self._conn_lock:
+                    await conn.remove_listener(channel, self._dispatch)
+            except Exception:  # noqa: BLE001
+                logger.warning("UNLISTEN %s failed", channel, exc_info=True)
+
+    def on_connect(self, callback: Callable[[], None]) -> None:
+        self._on_connect.append(callback)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def _dispatch(self, _conn: Any, _pid: int, channel: str, payload: str) -> None:
+        for callback in self._callbacks.get(channel, ()):
+            try:
+                callback(payload)
+            except Exception:  # noqa: BLE001
+                logger.exception("notification callback failed channel=%s", channel)
+
+    async def _run(self) -> None:
+        connected_once = False
+        while True:
+            lost = asyncio.Event()
+            try:
+                conn = await asyncpg.connect(self.dsn)
+                conn.add_termination_listener(lambda _conn: lost.set())
+                for channel in list(self._callbacks):
+                    await conn.add_listener(channel, self._dispatch)
+            except asyncio.CancelledError:
+                raise
+            except Exception:  # noqa: BLE001
+                logger.warning("postgres listener connect failed", exc_info=True)
+                await asyncio.sleep(self.reconnect_backoff_seconds)
+                continue
+
+            self._conn = conn
+            pg_listener_connected.set(1)
+            if connected_once:
+                pg_listener_reconnects_total.inc()
+            connected_once = True
+            for callback in self._on_connect:
+                callback()
+            try:
+                while not lost.is_set():
+                    try:
+                        await asyncio.wait_for(lost.wait(), timeout=_KEEPALIVE_SECONDS)
+                    except asyncio.TimeoutError:
+                        # A half-open TCP connection never reports termination.
+                        async with self._conn_lock:
+                            await conn.execute("SELECT 1", timeout=_KEEPALIVE_SECONDS)
+            except asyncio.CancelledError:
+                raise
+            except Exception:  # noqa: BLE001
+                logger.warning("postgres listener keepalive failed", exc_info=True)
+            finally:
+                self._conn = None
+                pg_listener_connected.set(0)
+                if not conn.is_closed():
+                    conn.terminate()
+            logger.warning("postgres listener connection lost, reconnecting")
+            await asyncio.sleep(self.reconnect_backoff_seconds)
+
+
+def init_notification_listener() -> PgNotificationListener:
+    global _listener
+    if _listener is None:
+        settings = get_settings()
+        _listener = PgNotificationListener(settings.postgres_url, settings.pg_listener_reconnect_seconds)
+        _listener.start()
+        logger.info("postgres notification listener started")
+    return _listener
+
+
+async def close_notification_listener() -> None:
+    global _listener
+    if _listener:
+        await _listener.close()
+        _listener = None
+
+
+def get_notification_listener() -> PgNotificationListener:
+    if _listener is None:
+        raise RuntimeError("notification listener is not initialized")
+    return _listener
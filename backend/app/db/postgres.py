@@ -1,8 +1,10 @@
 from __future__ import annotations
 
 import logging
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from typing import Any, Sequence
+from typing import Any, AsyncIterator, Sequence
 
 import asyncpg
 from opentelemetry import trace
@@ -35,12 +37,55 @@ async def init_postgres() -> None:
         await conn.execute("SELECT pg_advisory_lock($1)", lock_id)
         try:
             await conn.execute(schema_sql)
+            await _init_realtime_events(
+                conn,
+                settings.realtime_event_retention_days,
+                settings.realtime_event_partition_premake_days,
+            )
         finally:
             await conn.execute("SELECT pg_advisory_unlock($1)", lock_id)
 
     logger.info("postgres initialized")
 
 
+# Creates the realtime_events partitions the first inserts need and finishes
+# the move off a pre-partitioning table that schema.sql set aside: its rows
+# within retention are copied over and its id sequence carried on, so client
+# cursors (last_event_id) stay valid.
+async def _init_realtime_events(conn: asyncpg.Connection, retention_days: int, premake_days: int) -> None:
+    today = datetime.now(timezone.utc).date()
+    async with conn.transaction():
+        await conn.execute(
+            "SELECT realtime_events_ensure_partitions($1, $2)",
+            today,
+            today + timedelta(days=premake_days),
+        )
+        if await conn.fetchval("SELECT to_regclass('realtime_events_unpartitioned')") is None:
+            return
+        first_day = today - timedelta(days=retention_days)
+        await conn.execute("SELECT realtime_events_ensure_partitions($1, $2)", first_day, today)
+        copied = await conn.execute(
+            """
+            INSERT INTO realtime_events (id, workspace_id, event_type, payload, created_at)
+            SELECT id, workspace_id, event_type, payload, created_at
+            FROM realtime_events_unpartitioned
+            WHERE created_at >= $1::date::timestamp AT TIME ZONE 'UTC'
+              AND created_at < $2::date::timestamp AT TIME ZONE 'UTC'
+            """,
+            first_day,
+            today + timedelta(days=premake_days + 1),
+        )
+        await conn.execute(
+            """
+            SELECT setval(pg_get_serial_sequence('realtime_events', 'id'), last_id)
+            FROM (SELECT MAX(id) AS last_id FROM realtime_events_unpartitioned) AS legacy
+            WHERE last_id IS NOT NULL
+            """
+        )
+        await conn.execute("DROP TABLE realtime_events_unpartitioned")
+    logger.info("realtime_events migrated to day partitions: %s", copied)
+
+
 async def close_postgres() -> None:
     global _pool
     if _pool:
@@ -99,3 +144,10 @@ async def transaction(query: str, rows: list[tuple[Any, ...]]) -> None:
     async with pool.acquire() as conn:
         async with conn.transaction():
             await conn.executemany(query, rows)
+
+
+@asynccontextmanager
+async def connection() -> AsyncIterator[asyncpg.Connection]:
+    pool = _require_pool()
+    async with pool.acquire() as conn:
+        yield conn
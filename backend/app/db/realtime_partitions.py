@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import logging
+from datetime import datetime, timedelta, timezone
+
+from app.db.postgres import connection
+from app.metrics import realtime_event_partitions, realtime_event_partitions_dropped_total
+from app.utils.time import utcnow
+
+logger = logging.getLogger(__name__)
+
+PARTITION_PREFIX = "realtime_events_p"
+
+
+def partition_day(name: str) -> datetime | None:
+    # Start (UTC midnight) of the day a realtime_events_pYYYYMMDD partition holds.
+    if not name.startswith(PARTITION_PREFIX):
+        return None
+    try:
+        return datetime.strptime(name[len(PARTITION_PREFIX) :], "%Y%m%d").replace(tzinfo=timezone.utc)
+    except ValueError:
+        return None
+
+
+# Keeps realtime_events O(retention): creates the partitions for today and the
+# next premake_days, and drops every day partition that lies wholly before the
+# retention cutoff. Dropping a partition is a catalog change, not a DELETE, so
+# no dead tuples or vacuum debt are left behind. Safe to run on every worker:
+# realtime_events_ensure_partitions holds an advisory lock for the transaction.
+async def maintain_realtime_event_partitions(retention_days: int, premake_days: int) -> None:
+    now = utcnow()
+    today = now.date()
+    cutoff = now - timedelta(days=retention_days)
+    async with connection() as conn:
+        async with conn.transaction():
+            # Dropping needs a brief exclusive lock on realtime_events; give up
+            # (and retry next cycle) rather than queue every insert behind a
+            # long-running reader.
+            await conn.execute("SET LOCAL lock_timeout = '5s'")
+            created = await conn.fetchval(
+                "SELECT realtime_events_ensure_partitions($1, $2)",
+                today,
+                today + timedelta(days=premake_days),
+            )
+            rows = await conn.fetch(
+                """
+                SELECT c.relname
+                FROM pg_inherits i
+                JOIN pg_class c ON c.oid = i.inhrelid
+                WHERE i.inhparent = 'realtime_events'::regclass
+                """
+            )
+            days = {str(row["relname"]): partition_day(str(row["relname"])) for row in rows}
+            expired = sorted(
+                name for name, day in days.items() if day is not None and day + timedelta(days=1) <= cutoff
+            )
+            for name in expired:
+                await conn.execute(f'DROP TABLE IF EXISTS "{name}"')
+
+    realtime_event_partitions.set(sum(day is not None for day in days.values()) - len(expired))
+    if expired:
+        realtime_event_partitions_dropped_total.inc(len(expired))
+    if created or expired:
+        logger.info("realtime_events partitions created=%s dropped=%s", created, expired)
@@ -71,6 +71,34 @@ ALTER TABLE audio_jobs
 ALTER TABLE audio_artifacts
     ADD COLUMN IF NOT EXISTS controls JSONB NOT NULL DEFAULT '{}'::jsonb;
 
+ALTER TABLE audio_artifacts
+    ADD COLUMN IF NOT EXISTS render_hash TEXT;
+
+ALTER TABLE audio_artifacts
+    ADD COLUMN IF NOT EXISTS cache_hit BOOLEAN NOT NULL DEFAULT FALSE;
+
+CREATE INDEX IF NOT EXISTS idx_audio_artifacts_render_hash
+    ON audio_artifacts (workspace_id, render_hash, created_at);
+
+ALTER TABLE audio_jobs
+    ADD COLUMN IF NOT EXISTS lease_owner TEXT;
+
+ALTER TABLE audio_jobs
+    ADD COLUMN IF NOT EXISTS lease_expires_at TIMESTAMPTZ;
+
+ALTER TABLE audio_jobs
+    ADD COLUMN IF NOT EXISTS attempts INT NOT NULL DEFAULT 0;
+
+CREATE INDEX IF NOT EXISTS idx_audio_jobs_lease
+    ON audio_jobs (workspace_id, lease_expires_at)
+    WHERE status = 'processing';
+
+CREATE TABLE IF NOT EXISTS worker_members (
+    member_id TEXT PRIMARY KEY,
+    started_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    heartbeat_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
 CREATE TABLE IF NOT EXISTS rag_documents (
     id UUID PRIMARY KEY,
     workspace_id TEXT NOT NULL,
@@ -155,12 +183,74 @@ CREATE TABLE IF NOT EXISTS audit_logs (
     created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
 );
 
+-- realtime_events is range-partitioned by UTC day (realtime_events_pYYYYMMDD);
+-- the worker creates upcoming days and drops those past retention. Deployments
+-- from before partitioning have a plain table: it is moved aside here, and
+-- init_postgres copies its retained days into the partitioned table.
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM pg_class WHERE oid = to_regclass('realtime_events') AND relkind = 'r'
+    ) THEN
+        ALTER TABLE realtime_events RENAME TO realtime_events_unpartitioned;
+        ALTER SEQUENCE realtime_events_id_seq RENAME TO realtime_events_unpartitioned_id_seq;
+        ALTER INDEX realtime_events_pkey RENAME TO realtime_events_unpartitioned_pkey;
+        ALTER INDEX idx_realtime_events_workspace_id RENAME TO idx_realtime_events_unpartitioned_workspace_id;
+    END IF;
+END
+$$;
+
 CREATE TABLE IF NOT EXISTS realtime_events (
-    id BIGSERIAL PRIMARY KEY,
+    id BIGSERIAL,
     workspace_id TEXT NOT NULL,
     event_type TEXT NOT NULL,
     payload JSONB NOT NULL,
-    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
-);
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
 CREATE INDEX IF NOT EXISTS idx_realtime_events_workspace_id
     ON realtime_events (workspace_id, id DESC);
+
+CREATE OR REPLACE FUNCTION realtime_events_ensure_partitions(first_day DATE, last_day DATE)
+RETURNS INT
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    d DATE := first_day;
+    partition_name TEXT;
+    created INT := 0;
+BEGIN
+    -- Schema init and every worker's maintenance call this concurrently.
+    PERFORM pg_advisory_xact_lock(hashtext('realtime_events_partitions'));
+    WHILE d <= last_day LOOP
+        partition_name := 'realtime_events_p' || to_char(d, 'YYYYMMDD');
+        IF to_regclass(partition_name) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF realtime_events FOR VALUES FROM (%L) TO (%L)',
+                partition_name,
+                d::timestamp AT TIME ZONE 'UTC',
+                (d + 1)::timestamp AT TIME ZONE 'UTC'
+            );
+            created := created + 1;
+        END IF;
+        d := d + 1;
+    END LOOP;
+    RETURN created;
+END
+$$;
+
+CREATE TABLE IF NOT EXISTS webhook_outbox (
+    outbox_id BIGSERIAL PRIMARY KEY,
+    workspace_id TEXT NOT NULL,
+    webhook TEXT NOT NULL,
+    payload JSONB NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INT NOT NULL DEFAULT 0,
+    next_attempt_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    last_error TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    delivered_at TIMESTAMPTZ
+);
+CREATE INDEX IF NOT EXISTS idx_webhook_outbox_due
+    ON webhook_outbox (next_attempt_at, outbox_id)
+    WHERE status = 'pending';
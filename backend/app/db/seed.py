@@ -1,13 +1,13 @@
 from __future__ import annotations
 
-import json
 import math
 import random
 from datetime import timedelta
 from typing import Any
 
-from app.clickhouse.client import get_clickhouse
+from app.clickhouse.async_client import get_async_clickhouse
 from app.clickhouse.ingest import clickhouse_rows_from_points
+from app.db.kpi_recent import write_recent_points
 from app.db.postgres import execute
 from app.utils.time import utcnow
 
@@ -49,23 +49,10 @@ async def seed_demo(workspace_id: str) -> dict[str, Any]:
                 }
             )
 
-    clickhouse = get_clickhouse()
-    clickhouse.insert_kpi_points(clickhouse_rows_from_points(points))
+    clickhouse = get_async_clickhouse()
+    await clickhouse.insert_kpi_points(clickhouse_rows_from_points(points))
 
-    await execute("DELETE FROM kpi_points_recent WHERE workspace_id = $1", workspace_id)
-    insert_sql = """
-    INSERT INTO kpi_points_recent (workspace_id, metric_name, ts, value, tags)
-    VALUES ($1, $2, $3, $4, $5::jsonb)
-    """
-    for point in points[-1200:]:
-        await execute(
-            insert_sql,
-            point["workspace_id"],
-            point["metric_name"],
-            point["timestamp"],
-            point["value"],
-            json.dumps(point["tags"]),
-        )
+    await write_recent_points(workspace_id, points[-1200:], replace=True)
 
     docs = [
         {
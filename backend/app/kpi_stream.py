@@ -0,0 +1,378 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+from collections.abc import AsyncIterator
+from dataclasses import dataclass, field
+from datetime import datetime
+from functools import partial
+from typing import Any
+
+import orjson
+
+from app.config import get_settings
+from app.db.notify import Callback, PgNotificationListener, get_notification_listener, kpi_channel
+from app.db.postgres import execute
+from app.metrics import (
+    kpi_stream_deltas_coalesced_total,
+    kpi_stream_deltas_published_total,
+    kpi_stream_points_dropped_total,
+    kpi_stream_subscribers,
+)
+from app.utils.time import ensure_utc
+
+logger = logging.getLogger(__name__)
+
+BUCKET_MS = 60_000
+# Postgres rejects NOTIFY payloads of 8000 bytes or more.
+_NOTIFY_LIMIT_BYTES = 8000
+_MAX_WIRE_BYTES = 7500
+
+_publisher: KpiDeltaPublisher | None = None
+_broker: KpiStreamBroker | None = None
+
+
+# New points for one metric plus their contribution to each 1-minute rollup
+# bucket they fall in. Buckets are increments, not totals: points and sum add,
+# min and max fold, so deltas from any number of ingest processes (or merged
+# by throttling) combine exactly and clients fold them into the rows they got
+# from /analytics/kpi (sum = avg * points). A delta spanning more buckets
+# than fit in a NOTIFY keeps only the newest and is flagged refetch: clients
+# reload the rows from /analytics/kpi instead of folding it.
+@dataclass(eq=False)
+class KpiDelta:
+    metric_name: str
+    points: list[tuple[int, float]]
+    rollup: dict[int, tuple[int, float, float, float]]
+    dropped: int = 0
+    refetch: bool = False
+    _wire: bytes | None = field(default=None, repr=False)
+
+    @classmethod
+    def from_points(cls, metric_name: str, points: list[tuple[datetime, float]], max_points: int) -> KpiDelta:
+        encoded = [(int(ensure_utc(ts).timestamp() * 1000), value) for ts, value in points]
+        rollup: dict[int, tuple[int, float, float, float]] = {}
+        for ts_ms, value in encoded:
+            bucket = ts_ms - ts_ms % BUCKET_MS
+            current = rollup.get(bucket)
+            if current is None:
+                rollup[bucket] = (1, value, value, value)
+            else:
+                rollup[bucket] = (current[0] + 1, current[1] + value, min(current[2], value), max(current[3], value))
+        return cls(metric_name, [], rollup).with_points(encoded, max_points)
+
+    @classmethod
+    def from_wire(cls, wire: bytes) -> KpiDelta:
+        data = orjson.loads(wire)
+        return cls(
+            str(data["metric"]),
+            [(int(ts_ms), float(value)) for ts_ms, value in data["points"]],
+            {
+                int(item["bucket"]): (int(item["points"]), float(item["sum"]), float(item["min"]), float(item["max"]))
+                for item in data["rollup"]
+            },
+            int(data.get("dropped", 0)),
+            bool(data.get("refetch", False)),
+            wire,
+        )
+
+    def with_points(self, points: list[tuple[int, float]], max_points: int) -> KpiDelta:
+        # Keeps the newest points; the rollup still covers the ones left out.
+        overflow = max(0, len(points) - max_points)
+        if overflow:
+            kpi_stream_points_dropped_total.inc(overflow)
+        return KpiDelta(self.metric_name, points[overflow:], self.rollup, self.dropped + overflow, self.refetch)
+
+    def with_buckets(self, max_buckets: int) -> KpiDelta:
+        # Keeps the newest rollup buckets (and the points inside them); the
+        # delta no longer folds exactly, so it asks clients to refetch.
+        buckets = sorted(self.rollup)[-max_buckets:] if max_buckets > 0 else []
+        first = buckets[0] if buckets else math.inf
+        points = [(ts_ms, value) for ts_ms, value in self.points if ts_ms >= first]
+        overflow = len(self.points) - len(points)
+        if overflow:
+            kpi_stream_points_dropped_total.inc(overflow)
+        rollup = {bucket: self.rollup[bucket] for bucket in buckets}
+        return KpiDelta(self.metric_name, points, rollup, self.dropped + overflow, True)
+
+    def merge(self, other: KpiDelta, max_points: int) -> KpiDelta:
+        rollup = dict(self.rollup)
+        for bucket, (count, total, low, high) in other.rollup.items():
+            current = rollup.get(bucket)
+            rollup[bucket] = (
+                (count, total, low, high)
+                if current is None
+                else (current[0] + count, current[1] + total, min(current[2], low), max(current[3], high))
+            )
+        merged = KpiDelta(self.metric_name, [], rollup, self.dropped + other.dropped, self.refetch or other.refetch)
+        return merged.with_points(self.points + other.points, max_points)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "metric": self.metric_name,
+            "points": [[ts_ms, value] for ts_ms, value in self.points],
+            "rollup": [
+                {"bucket": bucket, "points": count, "sum": total, "min": low, "max": high}
+                for bucket, (count, total, low, high) in sorted(self.rollup.items())
+            ],
+            "dropped": self.dropped,
+            "refetch": self.refetch,
+        }
+
+    def wire(self) -> bytes:
+        # Encoded once and reused for NOTIFY and for every subscriber. If the
+        # delta would not fit in a NOTIFY, points are shed (oldest first), then
+        # rollup buckets.
+        if self._wire is None:
+            delta = self
+            wire = orjson.dumps(delta.to_dict())
+            while len(wire) >= _MAX_WIRE_BYTES and delta.points:
+                delta = delta.with_points(delta.points, len(delta.points) // 2)
+                wire = orjson.dumps(delta.to_dict())
+            while len(wire) >= _MAX_WIRE_BYTES and delta.rollup:
+                delta = delta.with_buckets(len(delta.rollup) // 2)
+                wire = orjson.dumps(delta.to_dict())
+            self.points, self.rollup, self._wire = delta.points, delta.rollup, wire
+            self.dropped, self.refetch = delta.dropped, delta.refetch
+        return self._wire
+
+
+def wire_batch(deltas: list[KpiDelta]) -> bytes:
+    return b"[" + b",".join(delta.wire() for delta in deltas) + b"]"
+
+
+# Turns ingested points into per-metric deltas, throttled to at most one per
+# metric per interval: points arriving inside the window are merged into the
+# pending delta. Due deltas go out in one pg_notify statement per flush, so
+# every API process (this one included) fans them out to its subscribers.
+class KpiDeltaPublisher:
+    def __init__(self, interval_seconds: float, max_points: int) -> None:
+        self.interval_seconds = interval_seconds
+        self.max_points = max_points
+        self._pending: dict[tuple[str, str], KpiDelta] = {}
+        self._sent_at: dict[tuple[str, str], float] = {}
+        self._wakeup = asyncio.Event()
+        self._closed = False
+        self._task: asyncio.Task[None] | None = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="kpi-delta-publisher")
+
+    def add(self, workspace_id: str, points: list[dict[str, Any]]) -> None:
+        by_metric: dict[str, list[tuple[datetime, float]]] = {}
+        for point in points:
+            value = float(point["value"])
+            if math.isfinite(value):
+                by_metric.setdefault(str(point["metric_name"]), []).append((point["timestamp"], value))
+        for metric_name, metric_points in by_metric.items():
+            key = (workspace_id, metric_name)
+            delta = KpiDelta.from_points(metric_name, metric_points, self.max_points)
+            pending = self._pending.get(key)
+            if pending is not None:
+                kpi_stream_deltas_coalesced_total.labels(stage="publish").inc()
+                delta = pending.merge(delta, self.max_points)
+            self._pending[key] = delta
+        if by_metric:
+            self._wakeup.set()
+
+    async def close(self) -> None:
+        self._closed = True
+        self._wakeup.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            timeout: float | None = None
+            if self._pending:
+                next_due = min(self._sent_at.get(key, -math.inf) for key in self._pending) + self.interval_seconds
+                timeout = max(0.0, next_due - loop.time())
+            if not self._closed:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+
+            now = loop.time()
+            due = [
+                key
+                for key in self._pending
+                if self._closed or self._sent_at.get(key, -math.inf) + self.interval_seconds <= now
+            ]
+            if due:
+                await self._send([(key[0], self._pending.pop(key)) for key in due])
+                for key in due:
+                    self._sent_at[key] = now
+            for key in [key for key, sent in self._sent_at.items() if sent + self.interval_seconds <= now]:
+                if key not in self._pending:
+                    del self._sent_at[key]
+            if self._closed and not self._pending:
+                return
+
+    async def _send(self, deltas: list[tuple[str, KpiDelta]]) -> None:
+        # A delta still over the NOTIFY limit (only possible with an absurdly
+        # long metric name) is left out so it cannot fail the whole statement.
+        sendable = []
+        for workspace_id, delta in deltas:
+            if len(delta.wire()) < _NOTIFY_LIMIT_BYTES:
+                sendable.append((workspace_id, delta))
+            else:
+                logger.warning(
+                    "kpi delta too large to notify metric=%.80s bytes=%s", delta.metric_name, len(delta.wire())
+                )
+        if not sendable:
+            return
+        deltas = sendable
+        try:
+            await execute(
+                "SELECT pg_notify(channel, payload) FROM unnest($1::text[], $2::text[]) AS t(channel, payload)",
+                [kpi_channel(workspace_id) for workspace_id, _ in deltas],
+                [delta.wire().decode() for _, delta in deltas],
+            )
+        except Exception:  # noqa: BLE001
+            # Deltas are best-effort; dashboards re-read on reconnect.
+            logger.warning("kpi delta notify failed deltas=%s", len(deltas), exc_info=True)
+            return
+        kpi_stream_deltas_published_total.inc(len(deltas))
+
+
+# Pending deltas of one connection, at most one per metric: while a slow client
+# is still writing, newer deltas for a metric merge into the queued one instead
+# of piling up.
+class KpiSubscription:
+    def __init__(self, workspace_id: str, connection: str, metrics: frozenset[str], max_points: int) -> None:
+        self.workspace_id = workspace_id
+        self.connection = connection
+        self.metrics = metrics
+        self.max_points = max_points
+        self._pending: dict[str, KpiDelta] = {}
+        self._ready = asyncio.Event()
+
+    def push(self, delta: KpiDelta) -> None:
+        if self.metrics and delta.metric_name not in self.metrics:
+            return
+        pending = self._pending.get(delta.metric_name)
+        if pending is not None:
+            kpi_stream_deltas_coalesced_total.labels(stage="subscriber").inc()
+            delta = pending.merge(delta, self.max_points)
+        self._pending[delta.metric_name] = delta
+        self._ready.set()
+
+    async def wait(self, timeout: float) -> bool:
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    def drain(self) -> list[KpiDelta]:
+        deltas = list(self._pending.values())
+        self._pending.clear()
+        self._ready.clear()
+        return deltas
+
+
+# Fans KPI deltas from the workspace's NOTIFY channel out to this process's
+# subscribers; LISTENs only while a workspace has subscribers. Nothing is
+# stored, so there is no catch-up: clients load history over REST and then
+# apply deltas.
+class KpiStreamBroker:
+    def __init__(self, listener: PgNotificationListener) -> None:
+        self._listener = listener
+        self._subscriptions: dict[str, set[KpiSubscription]] = {}
+        self._callbacks: dict[str, Callback] = {}
+        self._attached: dict[str, asyncio.Future[None]] = {}
+
+    def subscribe(self, workspace_id: str, connection: str, metrics: frozenset[str]) -> KpiSubscription:
+        subscription = KpiSubscription(workspace_id, connection, metrics, get_settings().kpi_stream_max_points)
+        self._subscriptions.setdefault(workspace_id, set()).add(subscription)
+        kpi_stream_subscribers.labels(connection=connection).inc()
+        if workspace_id not in self._attached:
+            callback = partial(self._on_notify, workspace_id)
+            self._callbacks[workspace_id] = callback
+            self._attached[workspace_id] = asyncio.ensure_future(
+                self._listener.attach(kpi_channel(workspace_id), callback)
+            )
+        return subscription
+
+    async def attached(self, workspace_id: str) -> None:
+        future = self._attached.get(workspace_id)
+        if future is not None:
+            await asyncio.shield(future)
+
+    async def unsubscribe(self, subscription: KpiSubscription) -> None:
+        workspace_id = subscription.workspace_id
+        subscriptions = self._subscriptions.get(workspace_id)
+        if not subscriptions or subscription not in subscriptions:
+            return
+        subscriptions.discard(subscription)
+        kpi_stream_subscribers.labels(connection=subscription.connection).dec()
+        if subscriptions:
+            return
+        del self._subscriptions[workspace_id]
+        self._attached.pop(workspace_id, None)
+        callback = self._callbacks.pop(workspace_id)
+        await self._listener.detach(kpi_channel(workspace_id), callback)
+
+    def _on_notify(self, workspace_id: str, payload: str) -> None:
+        delta = KpiDelta.from_wire(payload.encode())
+        for subscription in self._subscriptions.get(workspace_id, ()):
+            subscription.push(delta)
+
+
+async def kpi_delta_stream(
+    workspace_id: str,
+    connection: str,
+    metrics: frozenset[str] = frozenset(),
+) -> AsyncIterator[list[KpiDelta] | None]:
+    # Yields batches of deltas (one per metric), or None after a quiet
+    # keepalive interval.
+    settings = get_settings()
+    broker = get_kpi_stream_broker()
+    subscription = broker.subscribe(workspace_id, connection, metrics)
+    try:
+        await broker.attached(workspace_id)
+        while True:
+            if not await subscription.wait(settings.realtime_keepalive_seconds):
+                yield None
+                continue
+            deltas = subscription.drain()
+            if deltas:
+                yield deltas
+    finally:
+        await broker.unsubscribe(subscription)
+
+
+def init_kpi_stream() -> None:
+    global _publisher, _broker
+    settings = get_settings()
+    if _publisher or not settings.kpi_stream_enabled:
+        return
+    _publisher = KpiDeltaPublisher(settings.kpi_stream_interval_ms / 1000, settings.kpi_stream_max_points)
+    _publisher.start()
+    _broker = KpiStreamBroker(get_notification_listener())
+    logger.info("kpi delta stream started")
+
+
+async def close_kpi_stream() -> None:
+    global _publisher, _broker
+    if _publisher:
+        await _publisher.close()
+        _publisher = None
+    _broker = None
+
+
+def get_kpi_stream_broker() -> KpiStreamBroker:
+    if _broker is None:
+        raise RuntimeError("kpi delta stream is not enabled")
+    return _broker
+
+
+def publish_kpi_points(workspace_id: str, points: list[dict[str, Any]]) -> None:
+    if _publisher is not None:
+        _publisher.add(workspace_id, points)
@@ -10,12 +10,19 @@ from fastapi.middleware.cors import CORSMiddleware
 from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 
 from app.agents.events import worker_loop
+from app.agents.n8n_client import close_n8n_client
 from app.api import api_router
+from app.clickhouse.async_client import close_async_clickhouse, init_async_clickhouse
+from app.clickhouse.buffer import close_kpi_buffer, init_kpi_buffer
 from app.clickhouse.client import init_clickhouse
 from app.config import get_settings
+from app.db.notify import close_notification_listener, init_notification_listener
 from app.db.postgres import close_postgres, init_postgres
+from app.kpi_stream import close_kpi_stream, init_kpi_stream
 from app.logging import configure_logging
 from app.metrics import http_request_duration_seconds
+from app.realtime import close_realtime_broker, init_realtime_broker
+from app.sonification.executor import close_render_executor, init_render_executor
 from app.storage.minio_client import init_minio
 from app.tracing import init_tracing
 from app.websocket import router as events_router
@@ -36,11 +43,22 @@ async def startup_event() -> None:
     init_tracing(app, settings.app_name, settings.otel_exporter_otlp_endpoint)
     await init_postgres()
     init_clickhouse()
+    init_async_clickhouse()
+    init_kpi_buffer()
     init_minio()
+    init_notification_listener()
+    init_realtime_broker()
+    init_kpi_stream()
 
 
 @app.on_event("shutdown")
 async def shutdown_event() -> None:
+    await close_kpi_stream()
+    await close_realtime_broker()
+    await close_notification_listener()
+    await close_kpi_buffer()
+    await close_n8n_client()
+    await close_async_clickhouse()
     await close_postgres()
 
 
@@ -86,8 +104,17 @@ async def run_worker() -> None:
     init_tracing(worker_app, f"{settings.app_name}-worker", settings.otel_exporter_otlp_endpoint)
     await init_postgres()
     init_clickhouse()
+    init_async_clickhouse()
     init_minio()
-    await worker_loop()
+    init_render_executor()
+    init_notification_listener()
+    try:
+        await worker_loop()
+    finally:
+        await close_notification_listener()
+        await close_n8n_client()
+        await close_render_executor()
+        await close_async_clickhouse()
 
 
 def main() -> None:
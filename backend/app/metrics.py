@@ -17,6 +17,258 @@ clickhouse_ingest_rows_total = Counter(
     "clickhouse_ingest_rows_total",
     "Rows ingested into ClickHouse",
 )
+clickhouse_pool_acquire_seconds = Histogram(
+    "clickhouse_pool_acquire_seconds",
+    "Wait time to acquire a pooled ClickHouse client",
+    labelnames=("lane",),
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5),
+)
+clickhouse_pool_in_use = Gauge(
+    "clickhouse_pool_in_use",
+    "Pooled ClickHouse clients currently checked out",
+    labelnames=("lane",),
+)
+kpi_ingest_buffer_rows = Gauge(
+    "kpi_ingest_buffer_rows",
+    "KPI rows buffered or in flight to ClickHouse",
+)
+kpi_ingest_flush_seconds = Histogram(
+    "kpi_ingest_flush_seconds",
+    "ClickHouse KPI buffer flush latency",
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2, 5),
+)
+kpi_ingest_flushes_total = Counter(
+    "kpi_ingest_flushes_total",
+    "ClickHouse KPI buffer flushes",
+    labelnames=("reason",),
+)
+audio_render_pool_slots = Gauge(
+    "audio_render_pool_slots",
+    "Concurrent render slots per engine",
+    labelnames=("engine",),
+)
+audio_render_pool_in_use = Gauge(
+    "audio_render_pool_in_use",
+    "Render slots currently busy per engine",
+    labelnames=("engine",),
+)
+audio_render_queue_wait_seconds = Histogram(
+    "audio_render_queue_wait_seconds",
+    "Wait time for a free render slot",
+    labelnames=("engine",),
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 2, 5, 10, 30, 60, 120, 300),
+)
+audio_job_queue_wait_seconds = Histogram(
+    "audio_job_queue_wait_seconds",
+    "Time from audio job creation until a worker claims it",
+    buckets=(0.5, 1, 2, 5, 10, 30, 60, 120, 300, 600, 1800),
+)
+audio_render_seconds = Histogram(
+    "audio_render_seconds",
+    "Audio render latency",
+    labelnames=("engine",),
+    buckets=(0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300, 600),
+)
+audio_render_aborted_total = Counter(
+    "audio_render_aborted_total",
+    "Audio renders stopped before completion",
+    labelnames=("reason",),
+)
+audio_render_cache_total = Counter(
+    "audio_render_cache_total",
+    "Audio render cache lookups",
+    labelnames=("result",),
+)
+sclang_pool_workers = Gauge(
+    "sclang_pool_workers",
+    "Warm sclang processes currently running",
+)
+sclang_pool_restarts_total = Counter(
+    "sclang_pool_restarts_total",
+    "Warm sclang processes killed for restart",
+    labelnames=("reason",),
+)
+audio_jobs_reclaimed_total = Counter(
+    "audio_jobs_reclaimed_total",
+    "Audio jobs re-claimed after their lease expired",
+)
+audio_jobs_dead_lettered_total = Counter(
+    "audio_jobs_dead_lettered_total",
+    "Audio jobs parked after exhausting their attempts",
+)
+audio_jobs_stuck = Gauge(
+    "audio_jobs_stuck",
+    "Processing audio jobs whose lease has expired",
+)
+audio_job_leases_lost_total = Counter(
+    "audio_job_leases_lost_total",
+    "Leases a worker lost on jobs it was still running",
+)
+audio_job_wakeups_total = Counter(
+    "audio_job_wakeups_total",
+    "Audio worker claim passes by what woke the worker",
+    labelnames=("reason",),
+)
+pg_listener_connected = Gauge(
+    "pg_listener_connected",
+    "Whether the Postgres LISTEN connection is up",
+)
+pg_listener_reconnects_total = Counter(
+    "pg_listener_reconnects_total",
+    "Postgres LISTEN connection re-establishments",
+)
+worker_workspace_queue_depth = Gauge(
+    "worker_workspace_queue_depth",
+    "Queued audio jobs per workspace",
+    labelnames=("workspace",),
+)
+worker_workspace_queue_lag_seconds = Gauge(
+    "worker_workspace_queue_lag_seconds",
+    "Age of the oldest queued audio job per workspace",
+    labelnames=("workspace",),
+)
+worker_workspace_detection_lag_seconds = Gauge(
+    "worker_workspace_detection_lag_seconds",
+    "Seconds since the last anomaly detection pass per workspace",
+    labelnames=("workspace",),
+)
+worker_shard_members = Gauge(
+    "worker_shard_members",
+    "Live worker replicas in the detection hash ring",
+)
+worker_shard_rebalances_total = Counter(
+    "worker_shard_rebalances_total",
+    "Detection ring membership changes seen by this replica",
+)
+worker_shard_owned_metrics = Gauge(
+    "worker_shard_owned_metrics",
+    "Metrics this replica runs detection for, per workspace",
+    labelnames=("workspace",),
+)
+anomaly_dedup_index_size = Gauge(
+    "anomaly_dedup_index_size",
+    "Metrics with an anomaly inside the dedup horizon held in the worker index",
+)
+anomaly_dedup_suppressed_total = Counter(
+    "anomaly_dedup_suppressed_total",
+    "Anomaly candidates dropped as duplicates, by where the check ran (index, postgres)",
+    labelnames=("source",),
+)
+realtime_subscribers = Gauge(
+    "realtime_subscribers",
+    "Open realtime event subscriptions in this process",
+    labelnames=("connection",),
+)
+realtime_subscriber_queue_depth = Histogram(
+    "realtime_subscriber_queue_depth",
+    "Events waiting in a subscriber queue when its stream drains it",
+    labelnames=("connection",),
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024),
+)
+realtime_events_dropped_total = Counter(
+    "realtime_events_dropped_total",
+    "Events dropped or streams ended because a subscriber queue was full",
+    labelnames=("connection", "policy"),
+)
+realtime_send_seconds = Histogram(
+    "realtime_send_seconds",
+    "Time to write one batch of realtime events to a client",
+    labelnames=("connection",),
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5),
+)
+realtime_sent_bytes_total = Counter(
+    "realtime_sent_bytes_total",
+    "Bytes of realtime event frames written to clients, before transport compression",
+    labelnames=("connection", "encoding"),
+)
+realtime_events_published_total = Counter(
+    "realtime_events_published_total",
+    "Realtime events fanned out from Postgres notifications",
+)
+realtime_catchup_reads_total = Counter(
+    "realtime_catchup_reads_total",
+    "realtime_events table reads for connect or gap catch-up",
+)
+kpi_stream_deltas_published_total = Counter(
+    "kpi_stream_deltas_published_total",
+    "Per-metric KPI deltas sent from this process after throttling",
+)
+kpi_stream_deltas_coalesced_total = Counter(
+    "kpi_stream_deltas_coalesced_total",
+    "KPI deltas merged into a pending delta for the same metric, by stage (publish, subscriber)",
+    labelnames=("stage",),
+)
+kpi_stream_points_dropped_total = Counter(
+    "kpi_stream_points_dropped_total",
+    "KPI points left out of a delta over the per-delta cap (rollup buckets still count them)",
+)
+kpi_stream_subscribers = Gauge(
+    "kpi_stream_subscribers",
+    "Open KPI delta stream subscriptions in this process",
+    labelnames=("connection",),
+)
+realtime_resume_expired_total = Counter(
+    "realtime_resume_expired_total",
+    "Stream resumes whose last_event_id was older than realtime_events retention",
+)
+realtime_event_partitions = Gauge(
+    "realtime_event_partitions",
+    "Day partitions of realtime_events, including the pre-created future days",
+)
+realtime_event_partitions_dropped_total = Counter(
+    "realtime_event_partitions_dropped_total",
+    "realtime_events day partitions dropped after retention",
+)
+worker_task_cycle_seconds = Histogram(
+    "worker_task_cycle_seconds",
+    "Duration of one cycle of a supervised worker task",
+    labelnames=("task",),
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60, 120),
+)
+worker_task_overruns_total = Counter(
+    "worker_task_overruns_total",
+    "Worker task cycles that took longer than their interval",
+    labelnames=("task",),
+)
+worker_task_failures_total = Counter(
+    "worker_task_failures_total",
+    "Worker task cycles that raised",
+    labelnames=("task",),
+)
+worker_task_running = Gauge(
+    "worker_task_running",
+    "Worker task cycles currently executing",
+    labelnames=("task",),
+)
+n8n_outbox_pending = Gauge(
+    "n8n_outbox_pending",
+    "Webhook outbox rows not yet delivered",
+)
+n8n_outbox_oldest_pending_seconds = Gauge(
+    "n8n_outbox_oldest_pending_seconds",
+    "Age of the oldest undelivered webhook outbox row",
+)
+n8n_outbox_dispatch_lag_seconds = Histogram(
+    "n8n_outbox_dispatch_lag_seconds",
+    "Time from outbox insert to successful webhook delivery",
+    labelnames=("webhook",),
+    buckets=(0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60, 300, 900, 3600),
+)
+n8n_webhook_deliveries_total = Counter(
+    "n8n_webhook_deliveries_total",
+    "Webhook delivery attempts by outcome (delivered, retry, failed)",
+    labelnames=("webhook", "outcome"),
+)
+audio_scratch_bytes_reserved = Gauge(
+    "audio_scratch_bytes_reserved",
+    "Scratch disk bytes reserved by in-flight renders",
+)
+audio_upload_seconds = Histogram(
+    "audio_upload_seconds",
+    "Streaming upload duration per audio object",
+    labelnames=("kind",),
+    buckets=(0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300),
+)
 http_request_duration_seconds = Histogram(
     "http_request_duration_seconds",
     "HTTP request duration",
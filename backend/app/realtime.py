@@ -0,0 +1,464 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from collections import deque
+from collections.abc import AsyncIterator
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from functools import partial
+from typing import Any
+
+import orjson
+
+from app.config import get_settings
+from app.db.notify import Callback, PgNotificationListener, get_notification_listener, realtime_channel
+from app.db.postgres import fetch, fetchrow
+from app.metrics import (
+    realtime_catchup_reads_total,
+    realtime_events_dropped_total,
+    realtime_events_published_total,
+    realtime_resume_expired_total,
+    realtime_subscriber_queue_depth,
+    realtime_subscribers,
+)
+from app.utils.time import utcnow
+
+logger = logging.getLogger(__name__)
+
+CATCHUP_PAGE = 100
+
+# realtime_events is partitioned by created_at, so reads carry a created_at
+# lower bound to skip older partitions. created_at is the inserting
+# transaction's start, so a later id can carry an earlier timestamp by up to
+# that transaction's duration; the bound is pulled back by this much.
+READ_SLACK = timedelta(minutes=5)
+_UNBOUNDED = datetime.min.replace(tzinfo=timezone.utc)
+
+# Sent in place of a replay when last_event_id is older than retention.
+RESET_EVENT_TYPE = "stream.reset"
+
+_broker: RealtimeBroker | None = None
+
+
+# Bulky fields left out of the compact encoding; clients fetch them over REST.
+COMPACT_OMIT_FIELDS = frozenset({"controls", "features"})
+
+
+# One realtime event as fanned out to subscribers. It is parsed and encoded at
+# most once per process however many connections receive it.
+@dataclass(eq=False)
+class StreamEvent:
+    id: int
+    type: str
+    payload: str
+    created_at: datetime
+    _data: dict[str, Any] | None = field(default=None, repr=False)
+    _sse: str | None = field(default=None, repr=False)
+    _ws: str | None = field(default=None, repr=False)
+    _compact: bytes | None = field(default=None, repr=False)
+
+    @classmethod
+    def from_row(cls, row: Any) -> StreamEvent:
+        return cls(int(row["id"]), str(row["event_type"]), str(row["payload"]), row["created_at"])
+
+    @property
+    def data(self) -> dict[str, Any]:
+        if self._data is None:
+            parsed = orjson.loads(self.payload)
+            self._data = parsed if isinstance(parsed, dict) else {}
+        return self._data
+
+    def legacy(self) -> dict[str, object]:
+        return {
+            "id": self.id,
+            "type": self.type,
+            "payload": self.payload,
+            "created_at": self.created_at.isoformat(),
+        }
+
+    def sse_chunk(self) -> str:
+        if self._sse is None:
+            self._sse = f"id: {self.id}\nevent: {self.type}\ndata: {json.dumps(self.legacy())}\n\n"
+        return self._sse
+
+    def ws_text(self) -> str:
+        if self._ws is None:
+            self._ws = json.dumps(self.legacy(), separators=(",", ":"), ensure_ascii=False)
+        return self._ws
+
+    def compact(self) -> bytes:
+        # Short keys, epoch-millisecond timestamp and the payload as an object
+        # rather than a JSON string inside JSON.
+        if self._compact is None:
+            payload = {key: value for key, value in self.data.items() if key not in COMPACT_OMIT_FIELDS}
+            self._compact = orjson.dumps(
+                {"i": self.id, "t": self.type, "c": int(self.created_at.timestamp() * 1000), "p": payload}
+            )
+        return self._compact
+
+
+def compact_batch(events: list[StreamEvent]) -> bytes:
+    return b"[" + b",".join(event.compact() for event in events) + b"]"
+
+
+def _split(value: str | None) -> frozenset[str]:
+    return frozenset(part.strip() for part in (value or "").split(",") if part.strip())
+
+
+# Server-side subscription filter, applied before an event is queued. Types
+# match exactly or by prefix ("audio.*"); the metric and severity conditions
+# only apply to events whose payload carries metric_name / severity.
+@dataclass(frozen=True)
+class EventFilter:
+    types: frozenset[str] = frozenset()
+    metrics: frozenset[str] = frozenset()
+    min_severity: int | None = None
+
+    @classmethod
+    def from_params(cls, types: str | None, metrics: str | None, min_severity: int | None) -> EventFilter:
+        return cls(_split(types), _split(metrics), min_severity)
+
+    def matches(self, event: StreamEvent) -> bool:
+        if self.types and not any(
+            event.type.startswith(pattern[:-1]) if pattern.endswith("*") else event.type == pattern
+            for pattern in self.types
+        ):
+            return False
+        if self.metrics or self.min_severity is not None:
+            data = event.data
+            metric = data.get("metric_name")
+            if self.metrics and metric is not None and metric not in self.metrics:
+                return False
+            severity = data.get("severity")
+            if self.min_severity is not None and isinstance(severity, (int, float)) and severity < self.min_severity:
+                return False
+        return True
+
+
+async def read_events(
+    workspace_id: str,
+    after_id: int,
+    since: datetime | None = None,
+    limit: int = CATCHUP_PAGE,
+) -> list[StreamEvent]:
+    realtime_catchup_reads_total.inc()
+    rows = await fetch(
+        """
+        SELECT id, event_type, payload, created_at
+        FROM realtime_events
+        WHERE workspace_id = $1 AND id > $2 AND created_at >= $3
+        ORDER BY id ASC
+        LIMIT $4
+        """,
+        workspace_id,
+        after_id,
+        since or _UNBOUNDED,
+        limit,
+    )
+    return [StreamEvent.from_row(row) for row in rows]
+
+
+# Where a resumed stream starts reading: the cursor event's created_at bounds
+# the catch-up to the partitions from there on. A cursor older than the oldest
+# retained event cannot be replayed, so instead of paging through the whole
+# retention window the stream restarts at the newest event and leads with a
+# stream.reset event telling the client to refetch its state.
+async def resume_point(workspace_id: str, after_id: int) -> tuple[int, datetime | None, StreamEvent | None]:
+    if after_id <= 0:
+        return after_id, None, None
+    row = await fetchrow(
+        """
+        SELECT
+            (SELECT created_at FROM realtime_events WHERE id = $1 LIMIT 1) AS cursor_at,
+            (SELECT MIN(id) FROM realtime_events) AS oldest_id,
+            (SELECT MAX(id) FROM realtime_events) AS newest_id,
+            NOW() AS now
+        """,
+        after_id,
+    )
+    if row is None or row["oldest_id"] is None:
+        return after_id, None, None
+    if row["cursor_at"] is not None:
+        return after_id, row["cursor_at"] - READ_SLACK, None
+    if after_id >= int(row["oldest_id"]):
+        return after_id, None, None
+
+    realtime_resume_expired_total.inc()
+    newest_id = int(row["newest_id"])
+    reset = StreamEvent(
+        newest_id,
+        RESET_EVENT_TYPE,
+        json.dumps(
+            {
+                "workspace_id": workspace_id,
+                "requested_event_id": after_id,
+                "oldest_event_id": int(row["oldest_id"]),
+                "retention_days": get_settings().realtime_event_retention_days,
+            }
+        ),
+        row["now"],
+    )
+    return newest_id, row["now"] - READ_SLACK, reset
+
+
+OVERFLOW_POLICIES = ("drop_oldest", "coalesce", "disconnect")
+
+
+class StreamOverflow(RuntimeError):
+    def __init__(self, last_event_id: int) -> None:
+        super().__init__(f"subscriber fell behind; resume from last_event_id={last_event_id}")
+        self.last_event_id = last_event_id
+
+
+# Bounded buffer between the broker and one connection. When a slow client lets
+# it fill up, the policy decides: drop_oldest discards the oldest event,
+# coalesce replaces the latest queued event of the same type (else drops the
+# oldest), disconnect ends the stream with a resume id. A gap empties the buffer,
+# since the catch-up read returns everything that was in it.
+class Subscription:
+    def __init__(
+        self,
+        workspace_id: str,
+        connection: str,
+        max_events: int,
+        policy: str,
+        event_filter: EventFilter | None = None,
+    ) -> None:
+        self.workspace_id = workspace_id
+        self.connection = connection
+        self.filter = event_filter or EventFilter()
+        self.max_events = max_events
+        self.policy = policy
+        self.gap = False
+        self.overflowed = False
+        self._events: deque[StreamEvent] = deque()
+        self._ready = asyncio.Event()
+
+    def push(self, event: StreamEvent) -> None:
+        if self.gap or self.overflowed or not self.filter.matches(event):
+            return
+        if len(self._events) >= self.max_events:
+            realtime_events_dropped_total.labels(connection=self.connection, policy=self.policy).inc()
+            if self.policy == "disconnect":
+                self.overflowed = True
+                self._events.clear()
+                self._ready.set()
+                return
+            if self.policy == "coalesce":
+                for idx in range(len(self._events) - 1, -1, -1):
+                    if self._events[idx].type == event.type:
+                        del self._events[idx]
+                        break
+                else:
+                    self._events.popleft()
+            else:
+                self._events.popleft()
+        self._events.append(event)
+        self._ready.set()
+
+    def mark_gap(self) -> None:
+        self.gap = True
+        self._events.clear()
+        self._ready.set()
+
+    async def wait(self, timeout: float) -> bool:
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    def drain(self) -> list[StreamEvent]:
+        events = list(self._events)
+        self._events.clear()
+        self._ready.clear()
+        return events
+
+
+# Fans realtime events out to every SSE/WebSocket subscriber of this process.
+# One LISTEN per workspace with subscribers rides the shared notification
+# connection; each notification is parsed once and queued to all subscribers.
+class RealtimeBroker:
+    def __init__(self, listener: PgNotificationListener) -> None:
+        self._listener = listener
+        self._subscriptions: dict[str, set[Subscription]] = {}
+        self._callbacks: dict[str, Callback] = {}
+        self._attached: dict[str, asyncio.Future[None]] = {}
+        self._pending: set[asyncio.Task[None]] = set()
+        listener.on_connect(self._on_reconnect)
+
+    def subscribe(
+        self,
+        workspace_id: str,
+        connection: str,
+        max_events: int,
+        policy: str,
+        event_filter: EventFilter | None = None,
+    ) -> Subscription:
+        subscription = Subscription(workspace_id, connection, max_events, policy, event_filter)
+        self._subscriptions.setdefault(workspace_id, set()).add(subscription)
+        realtime_subscribers.labels(connection=connection).inc()
+        if workspace_id not in self._attached:
+            callback = partial(self._on_notify, workspace_id)
+            self._callbacks[workspace_id] = callback
+            self._attached[workspace_id] = asyncio.ensure_future(
+                self._listener.attach(realtime_channel(workspace_id), callback)
+            )
+        return subscription
+
+    async def attached(self, workspace_id: str) -> None:
+        # Subscribers wait for the LISTEN so their catch-up read cannot miss events.
+        future = self._attached.get(workspace_id)
+        if future is not None:
+            await asyncio.shield(future)
+
+    async def unsubscribe(self, subscription: Subscription) -> None:
+        workspace_id = subscription.workspace_id
+        subscriptions = self._subscriptions.get(workspace_id)
+        if not subscriptions or subscription not in subscriptions:
+            return
+        subscriptions.discard(subscription)
+        realtime_subscribers.labels(connection=subscription.connection).dec()
+        if subscriptions:
+            return
+        del self._subscriptions[workspace_id]
+        self._attached.pop(workspace_id, None)
+        callback = self._callbacks.pop(workspace_id)
+        await self._listener.detach(realtime_channel(workspace_id), callback)
+
+    def publish(self, workspace_id: str, event: StreamEvent) -> None:
+        realtime_events_published_total.inc()
+        for subscription in self._subscriptions.get(workspace_id, ()):
+            subscription.push(event)
+
+    def _on_notify(self, workspace_id: str, payload: str) -> None:
+        data = json.loads(payload)
+        if "payload" not in data:
+            # Body too large for NOTIFY; read the row once for all subscribers.
+            task = asyncio.create_task(self._publish_row(workspace_id, int(data["id"])))
+            self._pending.add(task)
+            task.add_done_callback(self._pending.discard)
+            return
+        self.publish(
+            workspace_id,
+            StreamEvent(
+                int(data["id"]),
+                str(data["type"]),
+                str(data["payload"]),
+                datetime.fromisoformat(data["created_at"]).astimezone(timezone.utc),
+            ),
+        )
+
+    async def _publish_row(self, workspace_id: str, event_id: int) -> None:
+        try:
+            events = await read_events(workspace_id, event_id - 1, utcnow() - READ_SLACK, limit=1)
+        except Exception:  # noqa: BLE001
+            logger.warning("realtime event read failed id=%s", event_id, exc_info=True)
+            events = []
+        if events and events[0].id == event_id:
+            self.publish(workspace_id, events[0])
+            return
+        for subscription in self._subscriptions.get(workspace_id, ()):
+            subscription.mark_gap()
+
+    def _on_reconnect(self) -> None:
+        for subscriptions in self._subscriptions.values():
+            for subscription in subscriptions:
+                subscription.mark_gap()
+
+    async def close(self) -> None:
+        for task in list(self._pending):
+            task.cancel()
+        await asyncio.gather(*self._pending, return_exceptions=True)
+
+
+async def event_stream(
+    workspace_id: str,
+    last_id: int,
+    connection: str,
+    policy: str | None = None,
+    event_filter: EventFilter | None = None,
+) -> AsyncIterator[list[StreamEvent] | None]:
+    # Yields batches of matching events after last_id, or None when nothing
+    # arrived for the keepalive interval; raises StreamOverflow under the
+    # disconnect policy. The table is read on connect and after a gap only,
+    # bounded to the partitions since the cursor; everything else arrives
+    # through the broker.
+    settings = get_settings()
+    broker = get_realtime_broker()
+    event_filter = event_filter or EventFilter()
+    subscription = broker.subscribe(
+        workspace_id,
+        connection,
+        settings.realtime_queue_max_events,
+        policy if policy in OVERFLOW_POLICIES else settings.realtime_overflow_policy,
+        event_filter,
+    )
+    try:
+        await broker.attached(workspace_id)
+        last_id, since, reset = await resume_point(workspace_id, last_id)
+        if reset is not None:
+            yield [reset]
+        catch_up = True
+        caught_up: set[int] = set()
+        while True:
+            if catch_up:
+                catch_up = False
+                caught_up = set()
+                while True:
+                    events = await read_events(workspace_id, last_id, since)
+                    if events:
+                        caught_up.update(event.id for event in events)
+                        last_id = max(last_id, events[-1].id)
+                        since = events[-1].created_at - READ_SLACK
+                        matching = [event for event in events if event_filter.matches(event)]
+                        if matching:
+                            yield matching
+                    if len(events) < CATCHUP_PAGE:
+                        break
+
+            if not await subscription.wait(settings.realtime_keepalive_seconds):
+                yield None
+                continue
+            if subscription.overflowed:
+                raise StreamOverflow(last_id)
+            if subscription.gap:
+                subscription.gap = False
+                subscription.drain()
+                catch_up = True
+                continue
+
+            events = subscription.drain()
+            realtime_subscriber_queue_depth.labels(connection=connection).observe(len(events))
+            batch = [event for event in events if event.id not in caught_up]
+            if batch:
+                newest = max(batch, key=lambda event: event.id)
+                if newest.id > last_id:
+                    last_id = newest.id
+                    since = newest.created_at - READ_SLACK
+                yield batch
+    finally:
+        await broker.unsubscribe(subscription)
+
+
+def init_realtime_broker() -> RealtimeBroker:
+    global _broker
+    if _broker is None:
+        _broker = RealtimeBroker(get_notification_listener())
+        logger.info("realtime broker initialized")
+    return _broker
+
+
+async def close_realtime_broker() -> None:
+    global _broker
+    if _broker:
+        await _broker.close()
+        _broker = None
+
+
+def get_realtime_broker() -> RealtimeBroker:
+    if _broker is None:
+        raise RuntimeError("realtime broker is not initialized")
+    return _broker
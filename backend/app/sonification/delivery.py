@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections.abc import AsyncIterator
+from pathlib import Path
+
+from opentelemetry import trace
+
+from app.metrics import audio_upload_seconds
+from app.sonification.sc_engine import PreviewEncodeError, stream_mp3_preview
+from app.storage.minio_client import MinioService
+
+logger = logging.getLogger(__name__)
+tracer = trace.get_tracer("sonataops.sonification")
+
+_TEE_QUEUE_CHUNKS = 8
+_END = object()
+
+
+# Splits one byte stream into independent branches with bounded buffers, so the
+# slowest consumer paces the source instead of the stream piling up in memory.
+class _ChunkTee:
+    def __init__(self, source: AsyncIterator[bytes], branches: int) -> None:
+        self._source = source
+        self._queues: list[asyncio.Queue[object]] = [asyncio.Queue(_TEE_QUEUE_CHUNKS) for _ in range(branches)]
+
+    def branch(self, index: int) -> AsyncIterator[bytes]:
+        return self._drain(self._queues[index])
+
+    async def pump(self) -> None:
+        try:
+            async for chunk in self._source:
+                for queue in self._queues:
+                    await queue.put(chunk)
+        except Exception as exc:
+            for queue in self._queues:
+                await queue.put(exc)
+            raise
+        for queue in self._queues:
+            await queue.put(_END)
+
+    async def _drain(self, queue: asyncio.Queue[object]) -> AsyncIterator[bytes]:
+        while True:
+            item = await queue.get()
+            if item is _END:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item  # type: ignore[misc]
+
+
+async def _timed_upload(
+    minio: MinioService,
+    kind: str,
+    object_key: str,
+    chunks: AsyncIterator[bytes],
+    content_type: str,
+) -> None:
+    started = time.perf_counter()
+    await minio.upload_stream(object_key, chunks, content_type)
+    audio_upload_seconds.labels(kind=kind).observe(time.perf_counter() - started)
+
+
+async def _upload_preview(minio: MinioService, key_mp3: str, wav_chunks: AsyncIterator[bytes], wav_path: Path) -> None:
+    try:
+        await _timed_upload(minio, "mp3", key_mp3, stream_mp3_preview(wav_chunks), "audio/mpeg")
+    except PreviewEncodeError as exc:
+        # The encoder drains its input even when it fails, so the WAV is complete
+        # by now; store it as the preview, as the file-based pipeline did.
+        logger.warning("mp3 preview encode failed, storing wav instead: %s", exc)
+        await asyncio.to_thread(minio.upload_file, key_mp3, wav_path, "audio/mpeg")
+
+
+# Uploads the WAV and its MP3 preview while the render is still producing bytes:
+# one branch streams the WAV to MinIO, the other feeds ffmpeg whose output is
+# streamed to the preview key.
+async def deliver_render(
+    minio: MinioService,
+    key_wav: str,
+    key_mp3: str,
+    chunks: AsyncIterator[bytes],
+    wav_path: Path,
+) -> None:
+    tee = _ChunkTee(chunks, 2)
+    with tracer.start_as_current_span("audio.deliver") as span:
+        span.set_attribute("storage.key_wav", key_wav)
+        span.set_attribute("storage.key_mp3", key_mp3)
+        try:
+            async with asyncio.TaskGroup() as group:
+                group.create_task(tee.pump())
+                group.create_task(_timed_upload(minio, "wav", key_wav, tee.branch(0), "audio/wav"))
+                group.create_task(_upload_preview(minio, key_mp3, tee.branch(1), wav_path))
+        except ExceptionGroup as errors:
+            # Callers record a single error message on the job.
+            raise errors.exceptions[0] from None
@@ -0,0 +1,336 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import multiprocessing
+import shlex
+import shutil
+import tempfile
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any
+
+from opentelemetry import trace
+
+from app.config import get_settings
+from app.metrics import (
+    audio_render_aborted_total,
+    audio_render_pool_in_use,
+    audio_render_pool_slots,
+    audio_render_queue_wait_seconds,
+    audio_render_seconds,
+)
+from app.sonification.sc_engine import (
+    FALLBACK_SAMPLE_RATE,
+    STREAM_CHUNK_BYTES,
+    _python_fallback_wav,
+    _strategy_for_controls,
+    _supercollider_script,
+)
+from app.sonification.sc_pool import SclangPool
+from app.sonification.scratch import ScratchSpace
+
+logger = logging.getLogger(__name__)
+tracer = trace.get_tracer("sonataops.sonification")
+
+_executor: RenderExecutor | None = None
+
+_FOLLOW_POLL_SECONDS = 0.05
+
+# Receives the rendered WAV as a byte stream, plus its scratch path for re-reads
+# once the stream has been fully consumed.
+Deliver = Callable[[AsyncIterator[bytes], Path], Awaitable[None]]
+
+
+def _wav_bytes(duration: int) -> int:
+    # 16-bit stereo at the render sample rate, plus the header.
+    return 44 + int(duration) * FALLBACK_SAMPLE_RATE * 4
+
+
+async def _follow_chunks(path: Path, writer: asyncio.Future[Any]) -> AsyncIterator[bytes]:
+    # Yields the file's bytes as the writer appends them. A failed writer is
+    # re-raised at the end so consumers abort instead of keeping a short file.
+    handle = None
+    try:
+        while True:
+            finished = writer.done()
+            if handle is None and path.exists():
+                handle = path.open("rb")
+            chunk = handle.read(STREAM_CHUNK_BYTES) if handle is not None else b""
+            if chunk:
+                yield chunk
+                continue
+            if finished:
+                writer.result()
+                if handle is None:
+                    raise RuntimeError("render produced no output")
+                return
+            await asyncio.wait({writer}, timeout=_FOLLOW_POLL_SECONDS)
+    finally:
+        if handle is not None:
+            handle.close()
+
+
+def _sclang_timeout(duration: int) -> int:
+    return max(120, min(600, int(duration * 8)))
+
+
+@asynccontextmanager
+async def _render_slot(slots: asyncio.Semaphore, engine: str) -> AsyncIterator[None]:
+    started = time.perf_counter()
+    async with slots:
+        audio_render_queue_wait_seconds.labels(engine=engine).observe(time.perf_counter() - started)
+        audio_render_pool_in_use.labels(engine=engine).inc()
+        try:
+            yield
+        finally:
+            audio_render_pool_in_use.labels(engine=engine).dec()
+
+
+# Runs renders off the event loop: sclang subprocesses behind a concurrency cap and
+# the NumPy fallback in a process pool, each job bounded by a timeout. The WAV is
+# handed to a deliver callback as a byte stream (while it is still being written,
+# for the fallback) and its scratch directory is always removed afterwards.
+class RenderExecutor:
+    def __init__(
+        self,
+        pool_size: int,
+        sclang_concurrency: int,
+        sclang_command: list[str],
+        scratch: ScratchSpace,
+        sclang_pool: SclangPool | None = None,
+    ) -> None:
+        self.pool_size = pool_size
+        self.sclang_concurrency = sclang_concurrency
+        self._pool = ProcessPoolExecutor(
+            max_workers=pool_size,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+        self._pool_slots = asyncio.Semaphore(pool_size)
+        self._sclang_slots = asyncio.Semaphore(sclang_concurrency)
+        self._sclang_command = sclang_command
+        self._scratch = scratch
+        self._sclang_available = bool(sclang_command) and shutil.which(sclang_command[0]) is not None
+        self._sclang_pool = sclang_pool if self._sclang_available else None
+        audio_render_pool_slots.labels(engine="python_fallback").set(pool_size)
+        audio_render_pool_slots.labels(engine="supercollider").set(sclang_concurrency if self._sclang_available else 0)
+
+    def start(self) -> None:
+        if self._sclang_pool is not None:
+            self._sclang_pool.start()
+
+    async def render(
+        self,
+        controls: dict[str, Any],
+        duration: int,
+        correlation_seed: int,
+        timeout_seconds: float,
+        deliver: Deliver,
+    ) -> tuple[int, str]:
+        async with self._scratch.reserve(_wav_bytes(duration)) as scratch_dir:
+            try:
+                return await asyncio.wait_for(
+                    self._render(scratch_dir, controls, duration, correlation_seed, deliver),
+                    timeout=timeout_seconds,
+                )
+            except asyncio.TimeoutError:
+                audio_render_aborted_total.labels(reason="timeout").inc()
+                raise RuntimeError(f"render timed out after {timeout_seconds:g}s") from None
+            except asyncio.CancelledError:
+                audio_render_aborted_total.labels(reason="cancelled").inc()
+                raise
+
+    async def _render(
+        self,
+        scratch_dir: Path,
+        controls: dict[str, Any],
+        duration: int,
+        correlation_seed: int,
+        deliver: Deliver,
+    ) -> tuple[int, str]:
+        wav_path = scratch_dir / "render.wav"
+        strategy = _strategy_for_controls(controls)
+
+        started = time.perf_counter()
+        engine = "supercollider"
+        rendered = False
+
+        with tracer.start_as_current_span("audio.render.supercollider") as span:
+            span.set_attribute("audio.duration_seconds", duration)
+            span.set_attribute("audio.tempo_bpm", controls["tempo_bpm"])
+            span.set_attribute("audio.glitch_density", controls.get("glitch_density", 0.0))
+            span.set_attribute("audio.harmonizer_mix", controls.get("harmonizer_mix", 0.0))
+            span.set_attribute("audio.pad_depth", controls.get("pad_depth", 0.0))
+            span.set_attribute("audio.rhythm_density", controls.get("rhythm_density", 1.0))
+            span.set_attribute("audio.anomaly_mode", str(controls.get("anomaly_mode", "watch")))
+            span.set_attribute("audio.strategy", strategy)
+            span.set_attribute("audio.sclang.warm", self._sclang_pool is not None)
+
+            try:
+                if not self._sclang_available:
+                    raise RuntimeError("sclang not found")
+                async with _render_slot(self._sclang_slots, "supercollider"):
+                    if self._sclang_pool is not None:
+                        await self._sclang_pool.render(
+                            wav_path,
+                            duration,
+                            correlation_seed,
+                            controls,
+                            timeout=_sclang_timeout(duration),
+                        )
+                        return_code, stdout, stderr = 0, b"", b""
+                    else:
+                        return_code, stdout, stderr = await self._run_sclang(
+                            scratch_dir, wav_path, duration, correlation_seed, controls
+                        )
+                span.set_attribute("audio.sclang.return_code", return_code)
+                if return_code != 0 or not wav_path.exists():
+                    span.set_attribute("audio.sclang.stderr", stderr.decode("utf-8", errors="ignore")[:300])
+                else:
+                    span.set_attribute("audio.sclang.stdout", stdout.decode("utf-8", errors="ignore")[:200])
+                    rendered = True
+            except Exception as exc:  # noqa: BLE001
+                span.record_exception(exc)
+
+            if rendered:
+                # sclang patches the WAV header when it finishes, so its file is only
+                # streamed once complete.
+                elapsed = time.perf_counter() - started
+                finished = asyncio.get_running_loop().create_future()
+                finished.set_result(None)
+                await deliver(_follow_chunks(wav_path, finished), wav_path)
+            else:
+                span.set_attribute("audio.fallback", True)
+                engine = "python_fallback"
+                wav_path.unlink(missing_ok=True)
+                elapsed = await self._stream_fallback(started, wav_path, duration, controls, correlation_seed, deliver)
+
+        audio_render_seconds.labels(engine=engine).observe(elapsed)
+        return int(elapsed * 1000), engine
+
+    async def _stream_fallback(
+        self,
+        started: float,
+        wav_path: Path,
+        duration: int,
+        controls: dict[str, Any],
+        correlation_seed: int,
+        deliver: Deliver,
+    ) -> float:
+        async def run() -> float:
+            await self._run_fallback(wav_path, duration, controls, correlation_seed)
+            return time.perf_counter() - started
+
+        render = asyncio.create_task(run())
+        try:
+            await deliver(_follow_chunks(wav_path, render), wav_path)
+            return await render
+        finally:
+            if not render.done():
+                render.cancel()
+                await asyncio.gather(render, return_exceptions=True)
+
+    async def _run_sclang(
+        self,
+        scratch_dir: Path,
+        wav_path: Path,
+        duration: int,
+        correlation_seed: int,
+        controls: dict[str, Any],
+    ) -> tuple[int | None, bytes, bytes]:
+        scd_path = scratch_dir / "render.scd"
+        script, _ = _supercollider_script(wav_path, duration, correlation_seed, controls)
+        scd_path.write_text(script, encoding="utf-8")
+
+        proc = await asyncio.create_subprocess_exec(
+            *self._sclang_command,
+            str(scd_path),
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        try:
+            stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout=_sclang_timeout(duration))
+        except BaseException:
+            if proc.returncode is None:
+                proc.kill()
+                await proc.wait()
+            raise
+        return proc.returncode, stdout, stderr
+
+    async def _run_fallback(
+        self,
+        wav_path: Path,
+        duration: int,
+        controls: dict[str, Any],
+        correlation_seed: int,
+    ) -> None:
+        async with _render_slot(self._pool_slots, "python_fallback"):
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(
+                self._pool,
+                _python_fallback_wav,
+                wav_path,
+                duration,
+                controls,
+                correlation_seed,
+            )
+
+    async def close(self) -> None:
+        if self._sclang_pool is not None:
+            await self._sclang_pool.close()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+def init_render_executor() -> None:
+    global _executor
+    if _executor:
+        return
+    settings = get_settings()
+    sclang_command = shlex.split(settings.sclang_command)
+    scratch = ScratchSpace(
+        Path(settings.audio_scratch_dir or Path(tempfile.gettempdir()) / "sonataops-audio"),
+        settings.audio_scratch_max_bytes,
+    )
+    purged = scratch.purge_stale(older_than_seconds=settings.audio_render_timeout_seconds * 2)
+    if purged:
+        logger.info("removed %s stale render scratch directories", purged)
+    sclang_pool = None
+    if settings.sclang_warm_pool_enabled:
+        sclang_pool = SclangPool(
+            command=sclang_command,
+            size=settings.audio_render_sclang_concurrency,
+            boot_timeout_seconds=settings.sclang_boot_timeout_seconds,
+            health_check_interval_seconds=settings.sclang_health_check_interval_seconds,
+            restart_backoff_seconds=settings.sclang_restart_backoff_seconds,
+        )
+    _executor = RenderExecutor(
+        pool_size=settings.audio_render_pool_size,
+        sclang_concurrency=settings.audio_render_sclang_concurrency,
+        sclang_command=sclang_command,
+        scratch=scratch,
+        sclang_pool=sclang_pool,
+    )
+    _executor.start()
+    logger.info(
+        "render executor initialized pool=%s sclang=%s warm=%s",
+        settings.audio_render_pool_size,
+        settings.audio_render_sclang_concurrency,
+        settings.sclang_warm_pool_enabled,
+    )
+
+
+async def close_render_executor() -> None:
+    global _executor
+    if _executor:
+        await _executor.close()
+        _executor = None
+
+
+def get_render_executor() -> RenderExecutor:
+    if _executor is None:
+        raise RuntimeError("render executor is not initialized")
+    return _executor
@@ -1,14 +1,13 @@
 from __future__ import annotations
 
-import math
-from statistics import mean, median, pstdev
-from typing import Any
+from statistics import mean, pstdev
+from typing import Any, Sequence
 
+import numpy as np
 
-def _rolling_mean(values: list[float], index: int, window: int = 10) -> float:
-    start = max(0, index - window + 1)
-    sample = values[start : index + 1]
-    return sum(sample) / len(sample)
+_ROLLING_WINDOW = 12
+_RECENT = 20
+_TREND = 30
 
 
 def _linear_slope(values: list[float]) -> float:
@@ -22,39 +21,148 @@ def _linear_slope(values: list[float]) -> float:
     return numerator / denominator
 
 
+def pack_series(series: Sequence[Sequence[float]]) -> tuple[np.ndarray, np.ndarray]:
+    # Right-align ragged series (NaN padding on the left) so "last value" and the
+    # 20/30-point tails are fixed columns for every row.
+    lengths = np.array([len(values) for values in series], dtype=np.int64)
+    width = int(lengths.max()) if len(series) else 0
+    matrix = np.full((len(series), max(width, 1)), np.nan, dtype=np.float64)
+    for row, values in enumerate(series):
+        if len(values):
+            matrix[row, matrix.shape[1] - len(values) :] = np.asarray(values, dtype=np.float64)
+    return matrix, lengths
+
+
+def _masked_median(data: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    # np.sort puts the NaN padding last, so each row's median sits at fixed indices.
+    ordered = np.sort(data, axis=1)
+    safe = np.maximum(lengths, 1)
+    rows = np.arange(data.shape[0])
+    lower = ordered[rows, (safe - 1) // 2]
+    upper = ordered[rows, safe // 2]
+    return np.where(safe % 2 == 1, upper, (lower + upper) / 2)
+
+
+def _masked_mean_std(data: np.ndarray, mask: np.ndarray, counts: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    safe = np.maximum(counts, 1)
+    mu = np.where(mask, data, 0.0).sum(axis=1) / safe
+    centered = np.where(mask, data - mu[:, None], 0.0)
+    sigma = np.sqrt((centered * centered).sum(axis=1) / safe)
+    return mu, sigma
+
+
+# Features for many series in a few vectorized passes. ``matrix`` is metrics x
+# samples, right-aligned as produced by pack_series; ``lengths`` is the number of
+# valid trailing samples per row. Rows shorter than 8 samples get the defaults.
+def compute_anomaly_feature_batch(matrix: np.ndarray, lengths: np.ndarray) -> dict[str, np.ndarray]:
+    rows, width = matrix.shape
+    columns = np.arange(width)
+    start = width - lengths
+    mask = columns[None, :] >= start[:, None]
+    data = np.where(mask, matrix, np.nan)
+    last = data[:, -1]
+
+    med = _masked_median(data, lengths)
+    mad = _masked_median(np.abs(data - med[:, None]), lengths)
+    mad = np.where(mad == 0, 1e-6, mad)
+    robust_z = np.abs((last - med) / (1.4826 * mad + 1e-6))
+
+    # Trailing 12-point mean that shrinks at the start of each series. Residuals do
+    # not depend on the level, so centre on the median first to keep precision.
+    centered = np.where(mask, data - med[:, None], 0.0)
+    padded = np.concatenate([np.zeros((rows, _ROLLING_WINDOW - 1)), centered], axis=1)
+    window_sums = np.lib.stride_tricks.sliding_window_view(padded, _ROLLING_WINDOW, axis=1).sum(axis=2)
+    window_counts = np.clip(columns[None, :] - start[:, None] + 1, 1, _ROLLING_WINDOW)
+    residuals = np.where(mask, centered - window_sums / window_counts, np.nan)
+    residual_mu, residual_sigma = _masked_mean_std(residuals, mask, lengths)
+    residual_sigma = np.where(residual_sigma == 0, 1e-6, residual_sigma)
+    residual_z = np.abs((residuals[:, -1] - residual_mu) / residual_sigma)
+
+    recent_width = min(_RECENT, width)
+    recent_counts = np.minimum(lengths, _RECENT)
+    recent_mu, recent_sigma = _masked_mean_std(data[:, -recent_width:], mask[:, -recent_width:], recent_counts)
+    level = np.abs(recent_mu) + 1e-6
+    volatility = recent_sigma / level
+
+    trend_width = min(_TREND, width)
+    trend_counts = np.minimum(lengths, _TREND)
+    trend_mask = mask[:, -trend_width:]
+    x = np.arange(trend_width)[None, :] - (trend_width - trend_counts)[:, None]
+    x_mean = (trend_counts - 1) / 2
+    y_mean, _ = _masked_mean_std(data[:, -trend_width:], trend_mask, trend_counts)
+    dx = np.where(trend_mask, x - x_mean[:, None], 0.0)
+    dy = np.where(trend_mask, data[:, -trend_width:] - y_mean[:, None], 0.0)
+    denominator = (dx * dx).sum(axis=1)
+    trend = (dx * dy).sum(axis=1) / np.where(denominator == 0, 1.0, denominator)
+    trend_norm = np.clip(trend / (level / 12 + 1e-6), -1.0, 1.0)
+
+    previous = data[:, -2] if width >= 2 else last
+    change_point = np.abs(last - previous) / (np.where(recent_sigma == 0, 1.0, recent_sigma) + 1e-6)
+    confidence = np.clip(1.0 - np.minimum(volatility, 1.0) * 0.7, 0.05, 1.0)
+    severity = np.clip(
+        (robust_z * 24) + (residual_z * 20) + (change_point * 14) + (volatility * 45),
+        0.0,
+        100.0,
+    )
+
+    short = lengths < 8
+    return {
+        "trend": np.where(short, 0.0, trend_norm),
+        "volatility": np.where(short, 0.0, volatility),
+        "residual": np.where(short, 0.0, residual_z),
+        "robust_z": np.where(short, 0.0, robust_z),
+        "change_point": np.where(short, 0.0, change_point),
+        "confidence": np.where(short, 0.5, confidence),
+        "severity": np.where(short, 0, np.nan_to_num(severity)).astype(np.int64),
+    }
+
+
+def compute_anomaly_features_many(series: Sequence[Sequence[float]]) -> list[dict[str, Any]]:
+    if not series:
+        return []
+    matrix, lengths = pack_series(series)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        batch = compute_anomaly_feature_batch(matrix, lengths)
+    return [
+        {
+            "trend": float(batch["trend"][row]),
+            "volatility": float(batch["volatility"][row]),
+            "residual": float(batch["residual"][row]),
+            "robust_z": float(batch["robust_z"][row]),
+            "change_point": float(batch["change_point"][row]),
+            "confidence": float(batch["confidence"][row]),
+            "severity": int(batch["severity"][row]),
+        }
+        for row in range(len(series))
+    ]
+
+
 def compute_anomaly_features(
     values: list[float],
     severity_hint: int | None = None,
 ) -> dict[str, Any]:
-    if len(values) < 8:
-        return {
-            "trend": 0.0,
-            "volatility": 0.0,
-            "residual": 0.0,
-            "robust_z": 0.0,
-            "change_point": 0.0,
-            "confidence": 0.5,
-            "severity": severity_hint or 0,
-        }
-
-    med = median(values)
-    deviations = [abs(v - med) for v in values]
-    mad = median(deviations) or 1e-6
-    robust_z = abs((values[-1] - med) / (1.4826 * mad + 1e-6))
+    features = compute_anomaly_features_many([values])[0]
+    if severity_hint is not None:
+        features["severity"] = int(severity_hint)
+    return features
 
-    residuals = [v - _rolling_mean(values, idx, window=12) for idx, v in enumerate(values)]
-    residual_mu = mean(residuals)
-    residual_sigma = pstdev(residuals) or 1e-6
-    residual_z = abs((residuals[-1] - residual_mu) / residual_sigma)
 
-    recent = values[-20:] if len(values) >= 20 else values
+def finalize_features(
+    tail: list[float],
+    robust_z: float,
+    residual_z: float,
+    severity_hint: int | None = None,
+) -> dict[str, Any]:
+    # Scalar version of the tail half of compute_anomaly_feature_batch for the
+    # rolling windows; everything past robust_z/residual_z looks at <= 30 values.
+    recent = tail[-20:] if len(tail) >= 20 else tail
     level = abs(mean(recent)) + 1e-6
     volatility = (pstdev(recent) or 0.0) / level
 
-    trend = _linear_slope(values[-30:] if len(values) >= 30 else values)
+    trend = _linear_slope(tail)
     trend_norm = max(-1.0, min(1.0, trend / (level / 12 + 1e-6)))
 
-    change_point = abs(values[-1] - values[-2]) / ((pstdev(recent) or 1.0) + 1e-6)
+    change_point = abs(tail[-1] - tail[-2]) / ((pstdev(recent) or 1.0) + 1e-6)
     confidence = max(0.05, min(1.0, 1.0 - min(volatility, 1.0) * 0.7))
 
     severity = severity_hint
@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import math
+import sys
+from bisect import bisect_left, insort
+from collections import deque
+from datetime import datetime
+from fractions import Fraction
+from typing import Any
+
+from app.sonification.features import compute_anomaly_features, finalize_features
+
+# Exact fixed-point scales for float sums (2**-1074 is the smallest subnormal),
+# so running sums never drift and mean/pstdev match statistics bit for bit.
+_SCALE_BITS = 1074
+_SQRT_BIT_WIDTH = 2 * sys.float_info.mant_dig + 3
+_ROLLING_WINDOW = 12
+
+
+def _exact(value: float) -> tuple[int, int]:
+    numerator, denominator = value.as_integer_ratio()
+    shift = _SCALE_BITS - (denominator.bit_length() - 1)
+    return numerator << shift, (numerator * numerator) << (2 * shift)
+
+
+def _sqrt_of_frac(n: int, m: int) -> float:
+    # Correctly rounded sqrt(n / m), the same rounding statistics.pstdev uses.
+    q = (n.bit_length() - m.bit_length() - _SQRT_BIT_WIDTH) // 2
+    if q >= 0:
+        a = math.isqrt(n // (m << 2 * q))
+        numerator = (a | (a * a * (m << 2 * q) != n)) << q
+        return numerator / 1
+    shifted = n << -2 * q
+    a = math.isqrt(shifted // m)
+    return (a | (a * a * m != shifted)) / (1 << -q)
+
+
+# Sliding time window of one metric that yields compute_anomaly_features output.
+# Appends/evictions keep a sorted copy for median/MAD and exact running residual
+# sums; the tail statistics only ever look at the last 30 points.
+class RollingFeatureWindow:
+    def __init__(self) -> None:
+        self.timestamps: deque[datetime] = deque()
+        self.values: deque[float] = deque()
+        self._full_residuals: deque[float] = deque()
+        self._sorted: list[float] = []
+        self._res_sum = 0
+        self._res_sumsq = 0
+        self._non_finite = 0
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    @property
+    def last_ts(self) -> datetime | None:
+        return self.timestamps[-1] if self.timestamps else None
+
+    def append(self, ts: datetime, value: float) -> None:
+        value = float(value)
+        # Residual against the trailing 12-point mean (shrinking at the series start).
+        history = len(self.values)
+        sample = [self.values[idx] for idx in range(max(0, history - _ROLLING_WINDOW + 1), history)]
+        sample.append(value)
+        residual = value - sum(sample) / len(sample)
+
+        self.timestamps.append(ts)
+        self.values.append(value)
+        self._full_residuals.append(residual)
+        if math.isfinite(value):
+            insort(self._sorted, value)
+        self._account(residual, 1)
+
+    def evict_before(self, cutoff: datetime) -> None:
+        while self.timestamps and self.timestamps[0] < cutoff:
+            self.timestamps.popleft()
+            value = self.values.popleft()
+            residual = self._full_residuals.popleft()
+            if math.isfinite(value):
+                del self._sorted[bisect_left(self._sorted, value)]
+            self._account(residual, -1)
+
+    def _account(self, residual: float, sign: int) -> None:
+        if not math.isfinite(residual):
+            self._non_finite += sign
+            return
+        total, squares = _exact(residual)
+        self._res_sum += sign * total
+        self._res_sumsq += sign * squares
+
+    def _median(self) -> float:
+        ordered = self._sorted
+        n = len(ordered)
+        mid = n // 2
+        if n % 2:
+            return ordered[mid]
+        return (ordered[mid - 1] + ordered[mid]) / 2
+
+    def _kth_deviation(self, med: float, split: int, k: int) -> float:
+        # k-th smallest |v - med| from the two sorted runs either side of the median.
+        ordered = self._sorted
+        left_len = split
+        right_len = len(ordered) - split
+
+        def left(i: int) -> float:
+            return med - ordered[split - 1 - i]
+
+        def right(j: int) -> float:
+            return ordered[split + j] - med
+
+        lo, hi = max(0, k + 1 - right_len), min(k + 1, left_len)
+        while lo < hi:
+            i = (lo + hi) // 2
+            if left(i) < right(k - i):
+                lo = i + 1
+            else:
+                hi = i
+        taken_right = k + 1 - lo
+        candidates = []
+        if lo > 0:
+            candidates.append(left(lo - 1))
+        if taken_right > 0:
+            candidates.append(right(taken_right - 1))
+        return max(candidates)
+
+    def _mad(self, med: float) -> float:
+        n = len(self._sorted)
+        split = bisect_left(self._sorted, med)
+        if n % 2:
+            return self._kth_deviation(med, split, n // 2)
+        return (self._kth_deviation(med, split, n // 2 - 1) + self._kth_deviation(med, split, n // 2)) / 2
+
+    def features(self, severity_hint: int | None = None) -> dict[str, Any]:
+        n = len(self.values)
+        if n < 8 or self._non_finite:
+            return compute_anomaly_features(list(self.values), severity_hint=severity_hint)
+
+        values = self.values
+        med = self._median()
+        mad = self._mad(med) or 1e-6
+        robust_z = abs((values[-1] - med) / (1.4826 * mad + 1e-6))
+
+        # Points in the first 11 slots of the window only see a partial rolling mean,
+        # so swap their stored residuals for ones computed from the window start.
+        head = min(_ROLLING_WINDOW - 1, n)
+        res_sum, res_sumsq = self._res_sum, self._res_sumsq
+        for idx in range(head):
+            stored_sum, stored_sq = _exact(self._full_residuals[idx])
+            sample = [values[j] for j in range(idx + 1)]
+            partial_sum, partial_sq = _exact(values[idx] - sum(sample) / len(sample))
+            res_sum += partial_sum - stored_sum
+            res_sumsq += partial_sq - stored_sq
+        last_residual = self._full_residuals[-1] if n > head else values[-1] - sum(values) / n
+
+        scale = 1 << _SCALE_BITS
+        residual_mu = float(Fraction(res_sum, scale * n))
+        variance = Fraction(n * res_sumsq - res_sum * res_sum, n * n * scale * scale)
+        residual_sigma = _sqrt_of_frac(variance.numerator, variance.denominator) or 1e-6
+        residual_z = abs((last_residual - residual_mu) / residual_sigma)
+
+        tail = [values[idx] for idx in range(max(0, n - 30), n)]
+        return finalize_features(tail, robust_z, residual_z, severity_hint)
@@ -1,20 +1,31 @@
 from __future__ import annotations
 
 import asyncio
+import json
 import math
-import random
 import shutil
-import struct
-import tempfile
-import time
 import wave
+from collections.abc import AsyncIterator
 from pathlib import Path
 from typing import Any
 
+import numpy as np
 from opentelemetry import trace
 
 tracer = trace.get_tracer("sonataops.sonification")
 
+# Part of the render cache key: bump whenever either renderer's output changes.
+RENDER_ENGINE_VERSION = "1"
+
+FALLBACK_SAMPLE_RATE = 44100
+FALLBACK_BLOCK_SAMPLES = 16384
+FALLBACK_MAX_ITERATIONS = 64
+# Fixed-point tolerance for the feedback solve, as a fraction of one int16 step.
+FALLBACK_TOLERANCE_STEPS = 0.1
+
+PREVIEW_SECONDS = 30
+STREAM_CHUNK_BYTES = 256 * 1024
+
 
 SC140_ONE_LINERS: dict[str, str] = {
     "pulse_lattice": (
@@ -63,23 +74,41 @@ def _clamp(value: float, low: float, high: float) -> float:
     return max(low, min(high, value))
 
 
-def _softclip(value: float) -> float:
-    return value / (1.0 + abs(value))
+def _softclip(value: np.ndarray) -> np.ndarray:
+    return value / (1.0 + np.abs(value))
 
 
-def _saw(phase: float) -> float:
-    wrapped = phase % 1.0
+def _saw(phase: np.ndarray) -> np.ndarray:
+    wrapped = phase - np.floor(phase)
     return (wrapped * 2.0) - 1.0
 
 
-def _exp_rand(rng: random.Random, low: float, high: float) -> float:
+def _sine(cycles: np.ndarray, offset: float = 0.0) -> np.ndarray:
+    # Wrap the phase in float64, then evaluate in float32: numpy vectorizes the
+    # float32 sine and its error stays far below one int16 step.
+    wrapped = ((cycles - np.floor(cycles)) * (2.0 * math.pi)) + offset
+    return np.sin(wrapped.astype(np.float32)).astype(np.float64)
+
+
+def _exp_rand(rng: np.random.Generator, low: float, high: float, size: int) -> np.ndarray:
     if low <= 0:
         low = 1e-6
-    return low * ((high / low) ** rng.random())
+    return low * ((high / low) ** rng.random(size))
 
 
-def _nearest_grid(value: float, grid: tuple[float, ...]) -> float:
-    return min(grid, key=lambda candidate: abs(candidate - value))
+def _nearest_grid(values: np.ndarray, grid: tuple[float, ...]) -> np.ndarray:
+    points = np.asarray(grid)
+    return points[np.abs(values[:, None] - points[None, :]).argmin(axis=1)]
+
+
+def _envelope(triggers: np.ndarray, index: np.ndarray, last_trigger: int, decay: float) -> tuple[np.ndarray, int]:
+    # Reset to 1 on every trigger and multiplied by decay each sample (trigger
+    # sample included); the last trigger position carries over between blocks.
+    marks = np.where(triggers, index, -1)
+    marks[0] = max(int(marks[0]), last_trigger)
+    latest = np.maximum.accumulate(marks)
+    envelope = np.where(latest >= 0, np.exp(math.log(decay) * (index - latest + 1)), 0.0)
+    return envelope, int(latest[-1])
 
 
 def _strategy_for_controls(controls: dict[str, Any]) -> str:
@@ -126,6 +155,19 @@ def _strategy_for_controls(controls: dict[str, Any]) -> str:
     return "pulse_lattice"
 
 
+WARM_STRATEGIES = (
+    "pulse_lattice",
+    "fm_fold",
+    "noisy_exciter",
+    "gated_drive",
+    "resonant_clicks",
+    "grain_tight",
+    "feedback_mesh",
+    "modart_drift",
+    "clean_harmonics",
+)
+
+
 def _variant_body(strategy: str) -> str:
     variants: dict[str, str] = {
         "pulse_lattice": """
@@ -195,31 +237,33 @@ sig = Pan2.ar(sig, SinOsc.kr(0.03 + (amb * 0.02)) * width);
     return variants.get(strategy, variants["pulse_lattice"])
 
 
-def _supercollider_script(out_wav: Path, duration: int, seed: int, controls: dict[str, Any]) -> tuple[str, str]:
-    out_path = str(out_wav).replace("\\", "\\\\").replace('"', '\\"')
-
-    sub_hz = _clamp(float(controls.get("pitch_center_hz", 180.0)) * 0.24, 30.0, 70.0)
-    tempo = _clamp(float(controls.get("tempo_bpm", 90.0)), 48.0, 170.0)
-    brightness = _clamp(float(controls.get("brightness", 0.5)), 0.05, 1.0)
-    stereo_width = _clamp(float(controls.get("stereo_width", 0.4)), 0.05, 0.95)
-    glitch_density = _clamp(float(controls.get("glitch_density", 0.1)), 0.0, 1.0)
+def _synth_args(controls: dict[str, Any], seed: int) -> dict[str, float | int]:
     intensity = _clamp(float(controls.get("intensity", 0.5)), 0.1, 1.0)
-    harmonizer_mix = _clamp(float(controls.get("harmonizer_mix", 0.5)), 0.0, 1.0)
-    pad_depth = _clamp(float(controls.get("pad_depth", 0.6)), 0.1, 1.0)
-    ambient_mix = _clamp(float(controls.get("ambient_mix", 0.4)), 0.0, 1.0)
-    rhythm_density = _clamp(float(controls.get("rhythm_density", 1.0)), 0.7, 2.2)
     transient_gain = _clamp(float(controls.get("transient_gain", 0.12)), 0.01, 0.5)
+    return {
+        "subHz": _clamp(float(controls.get("pitch_center_hz", 180.0)) * 0.24, 30.0, 70.0),
+        "tempo": _clamp(float(controls.get("tempo_bpm", 90.0)), 48.0, 170.0),
+        "bright": _clamp(float(controls.get("brightness", 0.5)), 0.05, 1.0),
+        "width": _clamp(float(controls.get("stereo_width", 0.4)), 0.05, 0.95),
+        "glitch": _clamp(float(controls.get("glitch_density", 0.1)), 0.0, 1.0),
+        "drive": _clamp((transient_gain * 6.0) + (intensity * 0.4), 0.1, 1.2),
+        "harmMix": _clamp(float(controls.get("harmonizer_mix", 0.5)), 0.0, 1.0),
+        "intensity": intensity,
+        "pad": _clamp(float(controls.get("pad_depth", 0.6)), 0.1, 1.0),
+        "amb": _clamp(float(controls.get("ambient_mix", 0.4)), 0.0, 1.0),
+        "rhythm": _clamp(float(controls.get("rhythm_density", 1.0)), 0.7, 2.2),
+        "seed": int(seed),
+    }
 
-    strategy = _strategy_for_controls(controls)
-    body = _variant_body(strategy)
-    drive = _clamp((transient_gain * 6.0) + (intensity * 0.4), 0.1, 1.2)
 
-    script = f"""
-(
-var outPath = "{out_path}";
-var dur = {float(duration):.3f};
-var seed = {int(seed)};
-var def = SynthDef(\\sonata_render, {{ |out=0, subHz={sub_hz:.4f}, tempo={tempo:.4f}, bright={brightness:.4f}, width={stereo_width:.4f}, glitch={glitch_density:.4f}, drive={drive:.4f}, harmMix={harmonizer_mix:.4f}, intensity={intensity:.4f}, pad={pad_depth:.4f}, amb={ambient_mix:.4f}, rhythm={rhythm_density:.4f}, seed={int(seed)}|
+def _format_arg(value: float | int) -> str:
+    return str(value) if isinstance(value, int) else f"{value:.4f}"
+
+
+def _synthdef_source(def_name: str, strategy: str, args: dict[str, float | int]) -> str:
+    arg_list = ", ".join(f"{name}={_format_arg(value)}" for name, value in args.items())
+    body = _variant_body(strategy)
+    return f"""SynthDef(\\{def_name}, {{ |out=0, {arg_list}|
     var sig;
     var tempoHz = tempo / 60;
     var tFast = Impulse.ar(tempoHz * rhythm * (3.8 + (glitch * 6.5)));
@@ -237,7 +281,26 @@ var def = SynthDef(\\sonata_render, {{ |out=0, subHz={sub_hz:.4f}, tempo={tempo:
     sig = HPF.ar(LeakDC.ar(sig), 24);
     sig = Limiter.ar(sig * (0.06 + (intensity * 0.06)), 0.92);
     Out.ar(out, sig);
-}});
+}})"""
+
+
+def _sc_string(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+def _supercollider_script(out_wav: Path, duration: int, seed: int, controls: dict[str, Any]) -> tuple[str, str]:
+    out_path = _sc_string(str(out_wav))
+    strategy = _strategy_for_controls(controls)
+    synthdef = _synthdef_source("sonata_render", strategy, _synth_args(controls, seed))
+
+    # The header line is a comment to sclang; it lets the stand-in engine render
+    # a cold-path script file too.
+    script = f"""// sonata-render {_render_header("cold", out_wav, duration, seed, controls)}
+(
+var outPath = "{out_path}";
+var dur = {float(duration):.3f};
+var seed = {int(seed)};
+var def = {synthdef};
 Score([
     [0.0, [\\d_recv, def.asBytes]],
     [0.0, [\\s_new, \\sonata_render, 1000, 0, 0]],
@@ -256,8 +319,71 @@ Score([
     return script, strategy
 
 
+def _render_header(request_id: str, out_wav: Path, duration: int, seed: int, controls: dict[str, Any]) -> str:
+    return json.dumps(
+        {"id": request_id, "out": str(out_wav), "duration": duration, "seed": int(seed), "controls": controls},
+        default=str,
+    )
+
+
+# Scripts for a long-lived sclang reading stdin (see sc_pool). Every chunk starts
+# with a one-line "// sonata-*" header so a stand-in engine can serve the same
+# protocol, and answers with a sentinel line on stdout.
+def _warm_boot_script() -> str:
+    defaults = _synth_args({}, 0)
+    defs = "\n".join(
+        f"~sonataDefs[\\{strategy}] = {_synthdef_source(f'sonata_render_{strategy}', strategy, defaults)}.asBytes;"
+        for strategy in WARM_STRATEGIES
+    )
+    return f"""// sonata-boot
+(
+~sonataDefs = IdentityDictionary.new;
+{defs}
+"SONATA_READY".postln;
+)
+"""
+
+
+def _warm_ping_script(token: str) -> str:
+    return f"""// sonata-ping {token}
+"SONATA_PONG {token}".postln;
+"""
+
+
+def _warm_render_script(
+    request_id: str,
+    out_wav: Path,
+    duration: int,
+    seed: int,
+    controls: dict[str, Any],
+) -> tuple[str, str]:
+    strategy = _strategy_for_controls(controls)
+    header = _render_header(request_id, out_wav, duration, seed, controls)
+    args = ", ".join(f"\\{name}, {_format_arg(value)}" for name, value in _synth_args(controls, seed).items())
+    script = f"""// sonata-render {header}
+(
+{{
+    Score([
+        [0.0, [\\d_recv, ~sonataDefs[\\{strategy}]]],
+        [0.0, [\\s_new, \\sonata_render_{strategy}, 1000, 0, 0, {args}]],
+        [{float(duration):.3f}, [\\n_free, 1000]]
+    ]).recordNRT(
+        outputFilePath: "{_sc_string(str(out_wav))}",
+        sampleRate: 44100,
+        headerFormat: "WAV",
+        sampleFormat: "int16",
+        options: ServerOptions.new.numOutputBusChannels_(2).numInputBusChannels_(2),
+        duration: {float(duration) + 0.25:.3f},
+        action: {{ "SONATA_DONE {request_id}".postln; }}
+    );
+}}.try({{ |error| ("SONATA_FAILED {request_id} " ++ error.errorString).postln; }});
+)
+"""
+    return script, strategy
+
+
 def _python_fallback_wav(out_wav: Path, duration: int, controls: dict[str, Any], seed: int) -> None:
-    sample_rate = 44100
+    sample_rate = FALLBACK_SAMPLE_RATE
     total_samples = sample_rate * duration
 
     strategy = _strategy_for_controls(controls)
@@ -272,208 +398,231 @@ def _python_fallback_wav(out_wav: Path, duration: int, controls: dict[str, Any],
     ambient = _clamp(float(controls.get("ambient_mix", 0.4)), 0.0, 1.0)
     rhythm = _clamp(float(controls.get("rhythm_density", 1.0)), 0.7, 2.2)
 
-    rng = random.Random(seed)
+    # One generator per random stream, so the output depends only on the seed and
+    # never on the block size.
+    dt_rng, trigger_rng, noise_rng, texture_rng, grain_rng = (
+        np.random.default_rng(child) for child in np.random.SeedSequence(int(seed)).spawn(5)
+    )
     dt_grid = (0.002, 0.004, 0.008, 0.016)
-    dt_l = 0.004
-    dt_r = 0.008
-
-    delay_size = int(sample_rate * 0.14)
-    delay_l = [0.0] * delay_size
-    delay_r = [0.0] * delay_size
-    fb_l = 0.0
-    fb_r = 0.0
-    click_env = 0.0
-    pulse_env = 0.0
-    grain_l = 0.0
-    grain_r = 0.0
-    grain_hold = 1
 
     tempo_hz = tempo / 60.0
     click_interval = max(1, int(sample_rate / max(1.0, tempo_hz * rhythm * (4.0 + (glitch * 6.0)))))
     pulse_interval = max(1, int(sample_rate / max(1.0, tempo_hz * rhythm * (2.0 + intensity))))
     micro_interval = max(1, int(sample_rate / max(1.0, (8.0 + (glitch * 24.0)) * rhythm)))
     grain_interval = max(1, int(sample_rate / max(1.0, tempo_hz * rhythm * (6.0 + (glitch * 10.0)))))
+    grain_hold = max(1, int((0.012 + (glitch * 0.028)) * sample_rate))
+
+    micro_ticks = total_samples // micro_interval + 1
+    delay_l = (_nearest_grid(_exp_rand(dt_rng, 2e-4, 0.08, micro_ticks), dt_grid) * sample_rate).astype(np.int64)
+    delay_r = (_nearest_grid(_exp_rand(dt_rng, 2e-4, 0.08, micro_ticks), dt_grid) * sample_rate).astype(np.int64)
+    grain_ticks = total_samples // grain_interval + 1
+    grain_gain = 0.6 + (grain_rng.uniform(-0.2, 0.2, grain_ticks) + grain_rng.uniform(-0.2, 0.2, grain_ticks)) * 0.5
+
+    wet_mix = (0.2 + (ambient * 0.45)) * (0.4 + (ambient * 0.35))
+    feedback = 0.18 + (ambient * 0.2)
+    gain = 0.06 + (intensity * 0.06)
+    tolerance = FALLBACK_TOLERANCE_STEPS / (32767 * gain)
+
+    history = int(max(dt_grid) * sample_rate) + 1
+    block = FALLBACK_BLOCK_SAMPLES
+    left_buf = np.zeros(history + block)
+    right_buf = np.zeros(history + block)
+    last_click = -1
+    last_pulse = -1
+    grain_level = 0.0
 
     with wave.open(str(out_wav), "wb") as wf:
         wf.setnchannels(2)
         wf.setsampwidth(2)
         wf.setframerate(sample_rate)
-
-        for i in range(total_samples):
-            t = i / sample_rate
-
-            if i % micro_interval == 0:
-                dt_l = _nearest_grid(_exp_rand(rng, 2e-4, 0.08), dt_grid)
-                dt_r = _nearest_grid(_exp_rand(rng, 2e-4, 0.08), dt_grid)
-
-            if (i % click_interval == 0) or (rng.random() < (glitch * 0.0012)):
-                click_env = 1.0
-            if i % pulse_interval == 0:
-                pulse_env = 1.0
-
-            click_env *= 0.93
-            pulse_env *= 0.985
-
-            drift = math.sin(2.0 * math.pi * (0.015 + (pad_depth * 0.02)) * t)
-            sub = math.sin(2.0 * math.pi * (sub_hz * (1.0 + drift * 0.015)) * t) * 0.92
-            bass_saw = (_saw((t * sub_hz) % 1.0) + _saw((t * sub_hz * 1.003) % 1.0) + _saw((t * sub_hz * 0.5) % 1.0)) * (0.22 / 3.0)
-            click = click_env * rng.uniform(-1.0, 1.0) * (0.25 + (glitch * 0.5))
+        # Final sizes up front and raw frame writes: the header is never patched,
+        # so readers can stream the file while it grows.
+        wf.setnframes(total_samples)
+
+        for start in range(0, total_samples, block):
+            # Renders run in pool processes that cannot be interrupted; removing the
+            # scratch directory is the signal to stop.
+            if not out_wav.parent.is_dir():
+                raise RuntimeError("render cancelled")
+            n = min(block, total_samples - start)
+            index = np.arange(start, start + n)
+            t = index / sample_rate
+
+            click_triggers = (index % click_interval == 0) | (trigger_rng.random(n) < (glitch * 0.0012))
+            click_env, last_click = _envelope(click_triggers, index, last_click, 0.93)
+            pulse_env, last_pulse = _envelope(index % pulse_interval == 0, index, last_pulse, 0.985)
+
+            drift = _sine(t * (0.015 + (pad_depth * 0.02)))
+            sub = _sine(t * (sub_hz * (1.0 + drift * 0.015))) * 0.92
+            bass_saw = (_saw(t * sub_hz) + _saw(t * sub_hz * 1.003) + _saw(t * sub_hz * 0.5)) * (0.22 / 3.0)
+            click = click_env * noise_rng.uniform(-1.0, 1.0, n) * (0.25 + (glitch * 0.5))
             click *= 0.45 + (brightness * 0.4)
-            pulse = pulse_env * math.sin(2.0 * math.pi * (sub_hz * (1.0 + intensity)) * t) * (0.22 + (intensity * 0.2))
+            pulse = pulse_env * _sine(t * (sub_hz * (1.0 + intensity))) * (0.22 + (intensity * 0.2))
 
+            mesh_input = None
             if strategy == "fm_fold":
-                fm = math.sin(2.0 * math.pi * (sub_hz * (2.0 + brightness)) * t) * sub_hz * (0.2 + (harmonizer * 0.4))
-                core = math.sin(2.0 * math.pi * (sub_hz + fm + (click * 70.0)) * t)
+                fm = _sine(t * (sub_hz * (2.0 + brightness))) * sub_hz * (0.2 + (harmonizer * 0.4))
+                core = _sine(t * (sub_hz + fm + (click * 70.0)))
                 dry = _softclip((core * 0.94) + (pulse * 0.74) + (click * 0.6))
             elif strategy == "noisy_exciter":
-                exc = math.sin(2.0 * math.pi * (sub_hz * (8.0 + (brightness * 8.0))) * t) * click * (0.8 + (glitch * 0.8))
-                haze = rng.uniform(-1.0, 1.0) * (0.06 + ambient * 0.18)
-                dry = math.tanh((sub * 1.28) + (bass_saw * 0.35) + (exc * 0.5) + haze)
+                exc = _sine(t * (sub_hz * (8.0 + (brightness * 8.0)))) * click * (0.8 + (glitch * 0.8))
+                haze = texture_rng.uniform(-1.0, 1.0, n) * (0.06 + ambient * 0.18)
+                dry = np.tanh((sub * 1.28) + (bass_saw * 0.35) + (exc * 0.5) + haze)
             elif strategy == "gated_drive":
                 gate = 0.5 + (pulse_env * (0.7 + intensity * 0.7))
-                low = math.tanh((sub * 1.1) + (bass_saw * 0.95))
-                dry = math.tanh((low * gate) + (click * 0.82))
+                low = np.tanh((sub * 1.1) + (bass_saw * 0.95))
+                dry = np.tanh((low * gate) + (click * 0.82))
             elif strategy == "resonant_clicks":
-                res_freq = _exp_rand(rng, sub_hz * 7.0, sub_hz * 28.0)
-                reson = math.sin(2.0 * math.pi * res_freq * t) * click * (0.55 + harmonizer * 0.5)
-                dry = math.tanh((sub * 1.2) + (pulse * 0.35) + reson)
+                res_freq = _exp_rand(texture_rng, sub_hz * 7.0, sub_hz * 28.0, n)
+                reson = _sine(t * res_freq) * click * (0.55 + harmonizer * 0.5)
+                dry = np.tanh((sub * 1.2) + (pulse * 0.35) + reson)
             elif strategy == "grain_tight":
-                src = math.tanh(sub + (bass_saw * 0.35) + (click * 0.5))
-                if i % grain_interval == 0:
-                    grain_hold = max(1, int((0.012 + (glitch * 0.028)) * sample_rate))
-                    grain_l = src * (0.6 + rng.uniform(-0.2, 0.2))
-                    grain_r = src * (0.6 + rng.uniform(-0.2, 0.2))
-                grain_hold = max(0, grain_hold - 1)
-                gr = (grain_l + grain_r) * 0.5 * (1.0 if grain_hold > 0 else 0.0)
-                dry = math.tanh((src * 0.62) + (gr * (0.35 + (harmonizer * 0.35))))
+                src = np.tanh(sub + (bass_saw * 0.35) + (click * 0.5))
+                tick = index // grain_interval
+                offset = index - (tick * grain_interval)
+                fresh = offset == 0
+                levels = np.full(n, np.nan)
+                levels[fresh] = src[fresh] * grain_gain[tick[fresh]]
+                if np.isnan(levels[0]):
+                    levels[0] = grain_level
+                levels = levels[np.maximum.accumulate(np.where(np.isnan(levels), 0, np.arange(n)))]
+                grain_level = float(levels[-1])
+                gr = np.where(offset < grain_hold - 1, levels, 0.0)
+                dry = np.tanh((src * 0.62) + (gr * (0.35 + (harmonizer * 0.35))))
             elif strategy == "feedback_mesh":
-                base = math.tanh((sub * 1.1) + (pulse * 0.45) + (click * 0.3) + ((fb_l + fb_r) * 0.24))
-                dry = base
+                mesh_input = (sub * 1.1) + (pulse * 0.45) + (click * 0.3)
+                dry = np.tanh(mesh_input)
             elif strategy == "modart_drift":
                 cloud = (
-                    math.sin(2.0 * math.pi * sub_hz * t) * 0.45
-                    + math.sin(2.0 * math.pi * (sub_hz * 1.5) * t + 0.4) * 0.18
-                    + math.sin(2.0 * math.pi * (sub_hz * 2.01) * t + 1.2) * 0.12
+                    _sine(t * sub_hz) * 0.45
+                    + _sine(t * (sub_hz * 1.5), 0.4) * 0.18
+                    + _sine(t * (sub_hz * 2.01), 1.2) * 0.12
                 )
-                micro = math.sin(2.0 * math.pi * (sub_hz * (14.0 + (brightness * 12.0))) * t) * click_env * 0.3
-                dry = math.tanh((sub * 1.25) + (cloud * (0.36 + (harmonizer * 0.35))) + (click * 0.3) + micro)
+                micro = _sine(t * (sub_hz * (14.0 + (brightness * 12.0)))) * click_env * 0.3
+                dry = np.tanh((sub * 1.25) + (cloud * (0.36 + (harmonizer * 0.35))) + (click * 0.3) + micro)
             elif strategy == "clean_harmonics":
-                shimmer = (
-                    math.sin(2.0 * math.pi * (sub_hz * 2.0) * t + 0.2) * 0.12
-                    + math.sin(2.0 * math.pi * (sub_hz * 3.01) * t + 1.4) * 0.08
-                )
+                shimmer = _sine(t * (sub_hz * 2.0), 0.2) * 0.12 + _sine(t * (sub_hz * 3.01), 1.4) * 0.08
                 rich = (
-                    math.sin(2.0 * math.pi * sub_hz * t) * 0.65
-                    + math.sin(2.0 * math.pi * (sub_hz * 1.25) * t + 0.8) * 0.22
-                    + math.sin(2.0 * math.pi * (sub_hz * 1.5) * t + 1.2) * 0.18
+                    _sine(t * sub_hz) * 0.65
+                    + _sine(t * (sub_hz * 1.25), 0.8) * 0.22
+                    + _sine(t * (sub_hz * 1.5), 1.2) * 0.18
                 )
-                micro = click_env * (0.09 + glitch * 0.16) * rng.uniform(-1.0, 1.0)
-                dry = math.tanh((sub * 1.2) + (rich * (0.4 + harmonizer * 0.34)) + (shimmer * 0.3) + micro)
-            else:
-                dry = math.tanh(sub + (bass_saw * 0.55) + pulse + (click * (0.42 + (glitch * 0.45))))
-
-            write_idx = i % delay_size
-            read_l = (write_idx - int(dt_l * sample_rate)) % delay_size
-            read_r = (write_idx - int(dt_r * sample_rate)) % delay_size
-
-            wet_l = delay_l[read_l]
-            wet_r = delay_r[read_r]
-            pan = math.sin(2.0 * math.pi * (0.03 + (ambient * 0.05)) * t) * stereo_width
-            left_float = math.tanh((dry * (1.0 - (pan * 0.6))) + (wet_l * (0.2 + (ambient * 0.45))) + (fb_l * 0.12))
-            right_float = math.tanh((dry * (1.0 + (pan * 0.6))) + (wet_r * (0.2 + (ambient * 0.45))) + (fb_r * 0.12))
-
-            fb_l = left_float * (0.18 + ambient * 0.2)
-            fb_r = right_float * (0.18 + ambient * 0.2)
-
-            delay_l[write_idx] = left_float * (0.4 + (ambient * 0.35))
-            delay_r[write_idx] = right_float * (0.4 + (ambient * 0.35))
-
-            gain = 0.06 + (intensity * 0.06)
-            left = int(_clamp(left_float * gain, -1.0, 1.0) * 32767)
-            right = int(_clamp(right_float * gain, -1.0, 1.0) * 32767)
-            wf.writeframesraw(struct.pack("<hh", left, right))
-
-
-async def render_wav(
-    controls: dict[str, Any],
-    duration: int,
-    correlation_seed: int,
-) -> tuple[Path, int, str]:
-    temp_dir = Path(tempfile.mkdtemp(prefix="sonataops-audio-"))
-    wav_path = temp_dir / "render.wav"
-    scd_path = temp_dir / "render.scd"
-
-    script, strategy = _supercollider_script(wav_path, duration, correlation_seed, controls)
-    scd_path.write_text(script, encoding="utf-8")
-
-    started = time.perf_counter()
-    engine = "supercollider"
-
-    with tracer.start_as_current_span("audio.render.supercollider") as span:
-        span.set_attribute("audio.duration_seconds", duration)
-        span.set_attribute("audio.tempo_bpm", controls["tempo_bpm"])
-        span.set_attribute("audio.glitch_density", controls.get("glitch_density", 0.0))
-        span.set_attribute("audio.harmonizer_mix", controls.get("harmonizer_mix", 0.0))
-        span.set_attribute("audio.pad_depth", controls.get("pad_depth", 0.0))
-        span.set_attribute("audio.rhythm_density", controls.get("rhythm_density", 1.0))
-        span.set_attribute("audio.anomaly_mode", str(controls.get("anomaly_mode", "watch")))
-        span.set_attribute("audio.strategy", strategy)
-
-        try:
-            proc = await asyncio.create_subprocess_exec(
-                "sclang",
-                str(scd_path),
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
-            )
-            timeout_seconds = max(120, min(600, int(duration * 8)))
-            stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout=timeout_seconds)
-            span.set_attribute("audio.sclang.return_code", proc.returncode)
-            if proc.returncode != 0 or not wav_path.exists():
-                span.set_attribute("audio.fallback", True)
-                span.set_attribute("audio.sclang.stderr", stderr.decode("utf-8", errors="ignore")[:300])
-                engine = "python_fallback"
-                _python_fallback_wav(wav_path, duration, controls, correlation_seed)
+                micro = click_env * (0.09 + glitch * 0.16) * texture_rng.uniform(-1.0, 1.0, n)
+                dry = np.tanh((sub * 1.2) + (rich * (0.4 + harmonizer * 0.34)) + (shimmer * 0.3) + micro)
             else:
-                span.set_attribute("audio.sclang.stdout", stdout.decode("utf-8", errors="ignore")[:200])
-        except Exception as exc:  # noqa: BLE001
-            span.record_exception(exc)
-            span.set_attribute("audio.fallback", True)
-            engine = "python_fallback"
-            _python_fallback_wav(wav_path, duration, controls, correlation_seed)
-
-    render_ms = int((time.perf_counter() - started) * 1000)
-    return wav_path, render_ms, engine
-
-
-async def create_mp3_preview(wav_path: Path) -> Path:
-    mp3_path = wav_path.with_suffix(".mp3")
-
-    with tracer.start_as_current_span("audio.preview.ffmpeg") as span:
-        if shutil.which("ffmpeg") is None:
-            span.set_attribute("audio.preview.fallback_copy", True)
-            shutil.copyfile(wav_path, mp3_path)
-            return mp3_path
-
-        proc = await asyncio.create_subprocess_exec(
-            "ffmpeg",
-            "-y",
-            "-i",
-            str(wav_path),
-            "-t",
-            "30",
-            "-codec:a",
-            "libmp3lame",
-            "-q:a",
-            "6",
-            str(mp3_path),
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
-        )
-        _, stderr = await proc.communicate()
-        span.set_attribute("audio.preview.return_code", proc.returncode)
-        if proc.returncode != 0:
-            span.set_attribute("audio.preview.stderr", stderr.decode("utf-8", errors="ignore")[:250])
-            shutil.copyfile(wav_path, mp3_path)
-
-    return mp3_path
+                dry = np.tanh(sub + (bass_saw * 0.55) + pulse + (click * (0.42 + (glitch * 0.45))))
+
+            pan = _sine(t * (0.03 + (ambient * 0.05))) * stereo_width
+            pan_l = 1.0 - (pan * 0.6)
+            pan_r = 1.0 + (pan * 0.6)
+
+            # The delay lines and the one-sample feedback make each output depend on
+            # earlier outputs. The map is a contraction (loop gain < 1 through tanh) and
+            # strictly causal, so iterate it over the block until it settles well below
+            # one int16 step, skipping the prefix that has already settled.
+            tick = index // micro_interval
+            read_l = np.arange(history, history + n) - delay_l[tick]
+            read_r = read_l + delay_l[tick] - delay_r[tick]
+            drive_l = dry * pan_l
+            drive_r = dry * pan_r
+            out_l = left_buf[history : history + n]
+            out_r = right_buf[history : history + n]
+            out_l[:] = np.tanh(drive_l)
+            out_r[:] = np.tanh(drive_r)
+            settled = 0
+            for _ in range(FALLBACK_MAX_ITERATIONS):
+                prev_l = left_buf[history + settled - 1 : history + n - 1]
+                prev_r = right_buf[history + settled - 1 : history + n - 1]
+                if mesh_input is not None:
+                    dry = np.tanh(mesh_input[settled:] + ((prev_l + prev_r) * (feedback * 0.24)))
+                    drive_l = dry * pan_l[settled:]
+                    drive_r = dry * pan_r[settled:]
+                    offset = 0
+                else:
+                    offset = settled
+                next_l = np.tanh(drive_l[offset:] + (left_buf[read_l[settled:]] * wet_mix) + (prev_l * (feedback * 0.12)))
+                next_r = np.tanh(drive_r[offset:] + (right_buf[read_r[settled:]] * wet_mix) + (prev_r * (feedback * 0.12)))
+                moving = np.maximum(np.abs(next_l - out_l[settled:]), np.abs(next_r - out_r[settled:])) >= tolerance
+                out_l[settled:] = next_l
+                out_r[settled:] = next_r
+                if not moving.any():
+                    break
+                settled += int(moving.argmax())
+
+            frames = np.empty((n, 2), dtype="<i2")
+            frames[:, 0] = np.trunc(np.clip(out_l * gain, -1.0, 1.0) * 32767)
+            frames[:, 1] = np.trunc(np.clip(out_r * gain, -1.0, 1.0) * 32767)
+            wf.writeframesraw(frames.tobytes())
+
+            left_buf[:history] = left_buf[n : n + history]
+            right_buf[:history] = right_buf[n : n + history]
+
+
+class PreviewEncodeError(RuntimeError):
+    pass
+
+
+async def _feed_encoder(stdin: asyncio.StreamWriter, wav_chunks: AsyncIterator[bytes]) -> None:
+    accepting = True
+    try:
+        async for chunk in wav_chunks:
+            # ffmpeg stops reading once it has the preview length; keep draining
+            # the source so the full WAV still reaches its upload.
+            if not accepting:
+                continue
+            try:
+                stdin.write(chunk)
+                await stdin.drain()
+            except (BrokenPipeError, ConnectionResetError):
+                accepting = False
+    finally:
+        if not stdin.is_closing():
+            stdin.close()
+
+
+# Encodes the first PREVIEW_SECONDS of a WAV byte stream as it arrives, yielding
+# MP3 bytes. Without ffmpeg the preview is the WAV itself.
+async def stream_mp3_preview(wav_chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    if shutil.which("ffmpeg") is None:
+        async for chunk in wav_chunks:
+            yield chunk
+        return
+
+    proc = await asyncio.create_subprocess_exec(
+        "ffmpeg",
+        "-hide_banner",
+        "-f",
+        "wav",
+        "-i",
+        "pipe:0",
+        "-t",
+        str(PREVIEW_SECONDS),
+        "-codec:a",
+        "libmp3lame",
+        "-q:a",
+        "6",
+        "-f",
+        "mp3",
+        "pipe:1",
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    assert proc.stdin is not None and proc.stdout is not None and proc.stderr is not None
+    feeder = asyncio.create_task(_feed_encoder(proc.stdin, wav_chunks))
+    stderr = asyncio.create_task(proc.stderr.read())
+    try:
+        while chunk := await proc.stdout.read(STREAM_CHUNK_BYTES):
+            yield chunk
+        await feeder
+        return_code = await proc.wait()
+        if return_code != 0:
+            message = (await stderr).decode("utf-8", errors="ignore")[-250:]
+            raise PreviewEncodeError(f"ffmpeg exited with {return_code}: {message}")
+    finally:
+        if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+        for task in (feeder, stderr):
+            task.cancel()
+        await asyncio.gather(feeder, stderr, return_exceptions=True)
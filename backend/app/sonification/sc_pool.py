@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from pathlib import Path
+from typing import Any
+
+from app.metrics import sclang_pool_restarts_total, sclang_pool_workers
+from app.sonification.sc_engine import _warm_boot_script, _warm_ping_script, _warm_render_script
+from app.utils.ids import new_id
+
+logger = logging.getLogger(__name__)
+
+# sclang evaluates everything it has read from stdin when it sees a form feed.
+_EXECUTE = b"\x0c"
+
+
+# One long-lived sclang process with the sonata_render SynthDefs compiled at boot.
+# Requests go over stdin; completion is a sentinel line on stdout.
+class WarmSclangWorker:
+    def __init__(self, command: list[str], name: str) -> None:
+        self.command = command
+        self.name = name
+        self._proc: asyncio.subprocess.Process | None = None
+        self.restart_after = 0.0
+
+    @property
+    def alive(self) -> bool:
+        return self._proc is not None and self._proc.returncode is None
+
+    async def start(self, boot_timeout: float) -> None:
+        await self.stop()
+        self._proc = await asyncio.create_subprocess_exec(
+            *self.command,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+        )
+        try:
+            await self._request(_warm_boot_script(), "SONATA_READY", None, boot_timeout)
+        except BaseException:
+            await self.stop()
+            raise
+        logger.info("warm sclang %s ready pid=%s", self.name, self._proc.pid)
+
+    async def stop(self) -> None:
+        proc, self._proc = self._proc, None
+        if proc is None or proc.returncode is not None:
+            return
+        proc.kill()
+        await proc.wait()
+
+    async def ping(self, timeout: float) -> None:
+        token = new_id()
+        await self._request(_warm_ping_script(token), f"SONATA_PONG {token}", None, timeout)
+
+    async def render(
+        self,
+        out_wav: Path,
+        duration: int,
+        seed: int,
+        controls: dict[str, Any],
+        timeout: float,
+    ) -> None:
+        request_id = new_id()
+        script, _ = _warm_render_script(request_id, out_wav, duration, seed, controls)
+        await self._request(script, f"SONATA_DONE {request_id}", f"SONATA_FAILED {request_id}", timeout)
+
+    async def _request(self, script: str, done: str, failed: str | None, timeout: float) -> None:
+        proc = self._proc
+        if proc is None or proc.stdin is None or proc.stdout is None or proc.returncode is not None:
+            raise RuntimeError(f"warm sclang {self.name} is not running")
+        proc.stdin.write(script.encode("utf-8") + _EXECUTE)
+        await proc.stdin.drain()
+        await asyncio.wait_for(self._read_until(proc.stdout, done, failed), timeout=timeout)
+
+    async def _read_until(self, stdout: asyncio.StreamReader, done: str, failed: str | None) -> None:
+        while True:
+            raw = await stdout.readline()
+            if not raw:
+                raise RuntimeError(f"warm sclang {self.name} exited")
+            line = raw.decode("utf-8", errors="ignore").strip()
+            if line == done:
+                return
+            if failed and line.startswith(failed):
+                raise RuntimeError(line[len(failed) :].strip() or "sclang render failed")
+            logger.debug("sclang %s: %s", self.name, line)
+
+
+# Fixed set of warm workers handed out one render at a time. A worker that times
+# out, crashes or fails a health check is killed and rebooted before its next use,
+# with a backoff so a broken install does not spin; callers fall back to the
+# Python renderer on any error.
+class SclangPool:
+    def __init__(
+        self,
+        command: list[str],
+        size: int,
+        boot_timeout_seconds: float,
+        health_check_interval_seconds: float,
+        restart_backoff_seconds: float,
+    ) -> None:
+        self.command = command
+        self.size = size
+        self.boot_timeout_seconds = boot_timeout_seconds
+        self.health_check_interval_seconds = health_check_interval_seconds
+        self.restart_backoff_seconds = restart_backoff_seconds
+        self._idle: asyncio.Queue[WarmSclangWorker] = asyncio.Queue()
+        self._workers = [WarmSclangWorker(command, f"sclang-{idx}") for idx in range(size)]
+        self._health_task: asyncio.Task[None] | None = None
+
+    def start(self) -> None:
+        if self._health_task is not None:
+            return
+        for worker in self._workers:
+            self._idle.put_nowait(worker)
+        self._health_task = asyncio.create_task(self._health_loop())
+
+    async def close(self) -> None:
+        if self._health_task is not None:
+            self._health_task.cancel()
+            await asyncio.gather(self._health_task, return_exceptions=True)
+            self._health_task = None
+        for worker in self._workers:
+            await worker.stop()
+        sclang_pool_workers.set(0)
+
+    async def render(
+        self,
+        out_wav: Path,
+        duration: int,
+        seed: int,
+        controls: dict[str, Any],
+        timeout: float,
+    ) -> None:
+        worker = await self._idle.get()
+        try:
+            await self._ensure_running(worker)
+            await worker.render(out_wav, duration, seed, controls, timeout)
+        except BaseException:
+            # The process may still be busy with this request; never hand it out again.
+            await self._discard(worker, "render")
+            raise
+        finally:
+            self._idle.put_nowait(worker)
+
+    async def _ensure_running(self, worker: WarmSclangWorker) -> None:
+        if worker.alive:
+            return
+        if time.monotonic() < worker.restart_after:
+            raise RuntimeError(f"warm sclang {worker.name} is backing off after a failure")
+        try:
+            await worker.start(self.boot_timeout_seconds)
+        except BaseException:
+            worker.restart_after = time.monotonic() + self.restart_backoff_seconds
+            raise
+        finally:
+            self._update_gauge()
+
+    async def _discard(self, worker: WarmSclangWorker, reason: str) -> None:
+        was_alive = worker.alive
+        await worker.stop()
+        if was_alive:
+            sclang_pool_restarts_total.labels(reason=reason).inc()
+        self._update_gauge()
+
+    async def _health_loop(self) -> None:
+        while True:
+            # Only idle workers are checked; busy ones prove themselves by finishing.
+            # The first pass boots the whole pool.
+            for _ in range(self._idle.qsize()):
+                worker = self._idle.get_nowait()
+                try:
+                    if worker.alive:
+                        await worker.ping(self.boot_timeout_seconds)
+                    elif time.monotonic() >= worker.restart_after:
+                        await self._ensure_running(worker)
+                except Exception:  # noqa: BLE001
+                    logger.warning("warm sclang %s failed health check", worker.name, exc_info=True)
+                    await self._discard(worker, "health_check")
+                finally:
+                    self._idle.put_nowait(worker)
+            await asyncio.sleep(self.health_check_interval_seconds)
+
+    def _update_gauge(self) -> None:
+        sclang_pool_workers.set(sum(1 for worker in self._workers if worker.alive))
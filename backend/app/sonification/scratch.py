@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import shutil
+import tempfile
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+from app.metrics import audio_scratch_bytes_reserved
+
+logger = logging.getLogger(__name__)
+
+_DIR_PREFIX = "render-"
+
+
+# Byte budget for render scratch directories. Each render reserves its expected
+# WAV size before it starts and its directory is removed on the way out, whatever
+# happened; renders beyond the budget wait for space.
+class ScratchSpace:
+    def __init__(self, root: Path, max_bytes: int) -> None:
+        self.root = root
+        self.max_bytes = max_bytes
+        self._reserved = 0
+        self._changed = asyncio.Condition()
+
+    def purge_stale(self, older_than_seconds: float) -> int:
+        # Directories left behind by a worker that was killed mid-render.
+        self.root.mkdir(parents=True, exist_ok=True)
+        cutoff = time.time() - older_than_seconds
+        removed = 0
+        for path in self.root.glob(f"{_DIR_PREFIX}*"):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    shutil.rmtree(path, ignore_errors=True)
+                    removed += 1
+            except FileNotFoundError:
+                continue
+        return removed
+
+    @asynccontextmanager
+    async def reserve(self, nbytes: int) -> AsyncIterator[Path]:
+        # A single render larger than the whole budget runs alone rather than never.
+        nbytes = min(nbytes, self.max_bytes)
+        async with self._changed:
+            await self._changed.wait_for(lambda: self._reserved + nbytes <= self.max_bytes)
+            self._reserved += nbytes
+            audio_scratch_bytes_reserved.set(self._reserved)
+        try:
+            self.root.mkdir(parents=True, exist_ok=True)
+            path = Path(tempfile.mkdtemp(prefix=_DIR_PREFIX, dir=self.root))
+            try:
+                yield path
+            finally:
+                shutil.rmtree(path, ignore_errors=True)
+        finally:
+            async with self._changed:
+                self._reserved -= nbytes
+                audio_scratch_bytes_reserved.set(self._reserved)
+                self._changed.notify_all()
@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import json
+import sys
+from pathlib import Path
+from typing import Any
+
+from app.sonification.sc_engine import _python_fallback_wav
+
+# Stand-in for sclang, for machines without SuperCollider:
+#   SCLANG_COMMAND="python -m app.sonification.standin_sclang"
+# Warm pool: reads the same form-feed separated stdin chunks as sclang and
+# dispatches on the "// sonata-*" header line. Cold path: renders the script file
+# given as the argument from its "// sonata-render" header. Both render with the
+# NumPy fallback.
+
+
+def _render(request: dict[str, Any]) -> None:
+    _python_fallback_wav(
+        Path(request["out"]),
+        int(request["duration"]),
+        request["controls"],
+        int(request["seed"]),
+    )
+
+
+def _handle(chunk: str) -> None:
+    header = chunk.lstrip().split("\n", 1)[0]
+    if header.startswith("// sonata-boot"):
+        print("SONATA_READY", flush=True)
+    elif header.startswith("// sonata-ping "):
+        print(f"SONATA_PONG {header.split(' ', 2)[2].strip()}", flush=True)
+    elif header.startswith("// sonata-render "):
+        request = json.loads(header.split(" ", 2)[2])
+        try:
+            _render(request)
+        except Exception as exc:  # noqa: BLE001
+            print(f"SONATA_FAILED {request['id']} {exc}", flush=True)
+        else:
+            print(f"SONATA_DONE {request['id']}", flush=True)
+
+
+def render_file(path: Path) -> int:
+    header = path.read_text(encoding="utf-8").lstrip().split("\n", 1)[0]
+    if not header.startswith("// sonata-render "):
+        print(f"standin_sclang: {path} has no '// sonata-render' header", file=sys.stderr)
+        return 2
+    try:
+        _render(json.loads(header.split(" ", 2)[2]))
+    except Exception as exc:  # noqa: BLE001
+        print(f"standin_sclang: render failed: {exc}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def main() -> None:
+    if len(sys.argv) > 1:
+        sys.exit(render_file(Path(sys.argv[1])))
+
+    pending = b""
+    stream = sys.stdin.buffer
+    while True:
+        data = stream.read1(65536)
+        if not data:
+            return
+        pending += data
+        *chunks, pending = pending.split(b"\x0c")
+        for chunk in chunks:
+            _handle(chunk.decode("utf-8", errors="ignore"))
+
+
+if __name__ == "__main__":
+    main()
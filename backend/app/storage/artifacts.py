@@ -1,6 +1,28 @@
 from __future__ import annotations
 
+import hashlib
+import json
+from typing import Any
 
-def artifact_keys(workspace_id: str, metric_name: str, artifact_id: str) -> tuple[str, str]:
-    prefix = f"{workspace_id}/audio/{metric_name}/{artifact_id}"
+from app.sonification.sc_engine import RENDER_ENGINE_VERSION
+
+
+def _canonical_controls(controls: dict[str, Any]) -> str:
+    return json.dumps(controls, sort_keys=True, separators=(",", ":"), default=str)
+
+
+def render_seed(controls: dict[str, Any], duration: int) -> int:
+    # Same controls and duration always render with the same seed, so repeat
+    # requests are byte-identical and can share one cached artifact.
+    digest = hashlib.sha256(f"{_canonical_controls(controls)}|{int(duration)}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % 2_000_000
+
+
+def render_hash(controls: dict[str, Any], duration: int, seed: int) -> str:
+    payload = f"{RENDER_ENGINE_VERSION}|{_canonical_controls(controls)}|{int(duration)}|{int(seed)}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def artifact_keys(workspace_id: str, content_hash: str) -> tuple[str, str]:
+    prefix = f"{workspace_id}/audio/renders/{content_hash[:2]}/{content_hash}"
     return f"{prefix}.wav", f"{prefix}.mp3"
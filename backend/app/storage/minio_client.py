@@ -1,8 +1,11 @@
 from __future__ import annotations
 
+import asyncio
 import logging
+from collections.abc import AsyncIterator
 from datetime import timedelta
 from pathlib import Path
+from typing import Any
 from urllib.parse import urlparse
 
 from minio import Minio
@@ -14,11 +17,40 @@ logger = logging.getLogger(__name__)
 
 _minio: "MinioService | None" = None
 
+_STREAM_QUEUE_CHUNKS = 8
+
+
+# File-like view of an asyncio queue of byte chunks, read by the blocking MinIO
+# client in a worker thread. None ends the stream; an exception aborts it, which
+# makes the client abort the multipart upload.
+class _ChunkReader:
+    def __init__(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._loop = loop
+        self.queue: asyncio.Queue[bytes | BaseException | None] = asyncio.Queue(_STREAM_QUEUE_CHUNKS)
+        self._buffer = b""
+        self._eof = False
+
+    def read(self, size: int = -1) -> bytes:
+        while not self._eof and (size < 0 or len(self._buffer) < size):
+            item = asyncio.run_coroutine_threadsafe(self.queue.get(), self._loop).result()
+            if item is None:
+                self._eof = True
+            elif isinstance(item, BaseException):
+                raise RuntimeError("upload stream aborted") from item
+            else:
+                self._buffer += item
+        if size < 0:
+            size = len(self._buffer)
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
 
 class MinioService:
     def __init__(self) -> None:
         settings = get_settings()
         self.bucket = settings.minio_bucket
+        self.part_size = settings.minio_part_size_bytes
+        self.parallel_part_uploads = settings.minio_parallel_part_uploads
         self.internal_client = Minio(
             endpoint=settings.minio_endpoint,
             access_key=settings.minio_access_key,
@@ -55,6 +87,58 @@ class MinioService:
                 content_type=content_type,
             )
 
+    async def upload_stream(self, object_key: str, chunks: AsyncIterator[bytes], content_type: str) -> int:
+        # Multipart upload of a byte stream of unknown length: parts go out from a
+        # worker thread while the producer is still writing. Returns bytes sent.
+        loop = asyncio.get_running_loop()
+        reader = _ChunkReader(loop)
+        tracer = trace.get_tracer("sonataops.minio")
+        with tracer.start_as_current_span("minio.upload_stream") as span:
+            span.set_attribute("storage.key", object_key)
+            upload = loop.run_in_executor(None, self._put_stream, object_key, reader, content_type)
+            size = 0
+            try:
+                async for chunk in chunks:
+                    size += len(chunk)
+                    await self._feed(reader, upload, chunk)
+                await self._feed(reader, upload, None)
+                await upload
+            except BaseException as exc:
+                if not upload.done():
+                    while not reader.queue.empty():
+                        reader.queue.get_nowait()
+                    reader.queue.put_nowait(exc)
+                await asyncio.gather(upload, return_exceptions=True)
+                raise
+            span.set_attribute("storage.bytes", size)
+            return size
+
+    async def _feed(self, reader: _ChunkReader, upload: asyncio.Future[Any], item: bytes | None) -> None:
+        # Waits for queue space, but gives up if the upload thread has already failed.
+        if reader.queue.full():
+            put = asyncio.ensure_future(reader.queue.put(item))
+            try:
+                await asyncio.wait({put, upload}, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                if not put.done():
+                    put.cancel()
+            if put.done() and not put.cancelled():
+                return
+            upload.result()
+            raise RuntimeError("upload finished before the stream ended")
+        reader.queue.put_nowait(item)
+
+    def _put_stream(self, object_key: str, reader: _ChunkReader, content_type: str) -> None:
+        self.internal_client.put_object(
+            bucket_name=self.bucket,
+            object_name=object_key,
+            data=reader,
+            length=-1,
+            content_type=content_type,
+            part_size=self.part_size,
+            num_parallel_uploads=self.parallel_part_uploads,
+        )
+
     def signed_url(self, object_key: str, expires_seconds: int = 300) -> str:
         tracer = trace.get_tracer("sonataops.minio")
         with tracer.start_as_current_span("minio.presigned_get") as span:
@@ -2,69 +2,75 @@ from __future__ import annotations
 
 import asyncio
 import json
+import time
+from contextlib import aclosing
 from typing import AsyncGenerator
 
-from fastapi import APIRouter, Query, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, HTTPException, Query, WebSocket, WebSocketDisconnect
 from fastapi.responses import StreamingResponse
 
 from app.config import get_settings
-from app.db.postgres import fetch
+from app.metrics import realtime_send_seconds, realtime_sent_bytes_total
+from app.kpi_stream import kpi_delta_stream, wire_batch
+from app.realtime import OVERFLOW_POLICIES, EventFilter, StreamOverflow, compact_batch, event_stream
 
 router = APIRouter(tags=["events"])
 
+# Close code for a client that fell behind under the disconnect policy; the
+# reason carries the id to resume from.
+WS_CLOSE_OVERFLOW = 4008
 
-async def _poll_events(
-    workspace_id: str,
-    last_id: int,
-) -> tuple[list[dict[str, object]], int]:
-    rows = await fetch(
-        """
-        SELECT id, event_type, payload, created_at
-        FROM realtime_events
-        WHERE workspace_id = $1 AND id > $2
-        ORDER BY id ASC
-        LIMIT 100
-        """,
-        workspace_id,
-        last_id,
-    )
-    events: list[dict[str, object]] = []
-    for row in rows:
-        event = {
-            "id": int(row["id"]),
-            "type": str(row["event_type"]),
-            "payload": row["payload"],
-            "created_at": row["created_at"].isoformat(),
-        }
-        events.append(event)
-        last_id = max(last_id, int(row["id"]))
-    return events, last_id
+# json: one frame per event, {"id","type","payload","created_at"} with the
+# payload as a JSON string (the original format). compact: one frame per batch,
+# an array of {"i","t","c","p"} with epoch-ms timestamps, the payload inlined and
+# bulky fields omitted; binary frames on the WebSocket, `event: batch` on SSE.
+ENCODINGS = ("json", "compact")
 
 
 async def _sse_generator(
     workspace_id: str,
     start_id: int,
+    overflow: str | None,
+    event_filter: EventFilter,
+    encoding: str,
 ) -> AsyncGenerator[str, None]:
-    last_id = start_id
-    while True:
-        events, last_id = await _poll_events(workspace_id, last_id)
-        if events:
-            for event in events:
-                yield f"id: {event['id']}\n"
-                yield f"event: {event['type']}\n"
-                yield f"data: {json.dumps(event)}\n\n"
-        else:
-            yield ": keepalive\n\n"
-        await asyncio.sleep(1)
+    try:
+        async with aclosing(event_stream(workspace_id, start_id, "sse", overflow, event_filter)) as stream:
+            async for events in stream:
+                if events is None:
+                    yield ": keepalive\n\n"
+                    continue
+                if encoding == "compact":
+                    chunk = f"id: {events[-1].id}\nevent: batch\ndata: {compact_batch(events).decode()}\n\n"
+                else:
+                    chunk = "".join(event.sse_chunk() for event in events)
+                started = time.perf_counter()
+                # Resumes once the server has written the chunk to the client.
+                yield chunk
+                realtime_send_seconds.labels(connection="sse").observe(time.perf_counter() - started)
+                realtime_sent_bytes_total.labels(connection="sse", encoding=encoding).inc(len(chunk))
+    except StreamOverflow as exc:
+        yield f"event: overflow\ndata: {json.dumps({'last_event_id': exc.last_event_id})}\n\n"
 
 
 @router.get("/events/sse")
 async def stream_sse(
     workspace_id: str = Query(default_factory=lambda: get_settings().default_workspace_id),
     last_event_id: int = Query(default=0, ge=0),
+    overflow: str | None = Query(default=None, pattern="^(drop_oldest|coalesce|disconnect)$"),
+    types: str | None = Query(default=None),
+    metrics: str | None = Query(default=None),
+    min_severity: int | None = Query(default=None, ge=0, le=100),
+    encoding: str = Query(default="json", pattern="^(json|compact)$"),
 ) -> StreamingResponse:
     return StreamingResponse(
-        _sse_generator(workspace_id=workspace_id, start_id=last_event_id),
+        _sse_generator(
+            workspace_id=workspace_id,
+            start_id=last_event_id,
+            overflow=overflow,
+            event_filter=EventFilter.from_params(types, metrics, min_severity),
+            encoding=encoding,
+        ),
         media_type="text/event-stream",
         headers={
             "Cache-Control": "no-cache",
@@ -74,17 +80,131 @@ async def stream_sse(
     )
 
 
+async def _wait_disconnect(ws: WebSocket) -> None:
+    # Clients never send anything; reading is only how a close is noticed while
+    # no events are flowing.
+    while (await ws.receive())["type"] != "websocket.disconnect":
+        pass
+
+
+async def _send_events(
+    ws: WebSocket,
+    workspace_id: str,
+    last_id: int,
+    overflow: str | None,
+    event_filter: EventFilter,
+    encoding: str,
+) -> None:
+    try:
+        async with aclosing(event_stream(workspace_id, last_id, "ws", overflow, event_filter)) as stream:
+            async for events in stream:
+                if not events:
+                    continue
+                started = time.perf_counter()
+                if encoding == "compact":
+                    frame = compact_batch(events)
+                    await ws.send_bytes(frame)
+                    size = len(frame)
+                else:
+                    size = 0
+                    for event in events:
+                        text = event.ws_text()
+                        await ws.send_text(text)
+                        size += len(text)
+                realtime_send_seconds.labels(connection="ws").observe(time.perf_counter() - started)
+                realtime_sent_bytes_total.labels(connection="ws", encoding=encoding).inc(size)
+    except StreamOverflow as exc:
+        await ws.close(code=WS_CLOSE_OVERFLOW, reason=f"last_event_id={exc.last_event_id}")
+
+
 @router.websocket("/ws/events")
 async def websocket_events(ws: WebSocket) -> None:
+    params = ws.query_params
+    encoding = params.get("encoding", "json")
+    try:
+        last_id = int(params.get("last_event_id", "0"))
+        min_severity = int(params["min_severity"]) if params.get("min_severity") else None
+    except ValueError:
+        last_id = -1
+        min_severity = None
+    if encoding not in ENCODINGS or last_id < 0 or params.get("overflow") not in (None, *OVERFLOW_POLICIES):
+        # Rejects the handshake before accept.
+        await ws.close(code=1008, reason="invalid query parameters")
+        return
     await ws.accept()
-    workspace_id = ws.query_params.get("workspace_id", get_settings().default_workspace_id)
-    last_id = int(ws.query_params.get("last_event_id", "0"))
+    workspace_id = params.get("workspace_id", get_settings().default_workspace_id)
+    event_filter = EventFilter.from_params(params.get("types"), params.get("metrics"), min_severity)
 
+    sender = asyncio.create_task(
+        _send_events(ws, workspace_id, last_id, params.get("overflow"), event_filter, encoding)
+    )
+    closed = asyncio.create_task(_wait_disconnect(ws))
     try:
-        while True:
-            events, last_id = await _poll_events(workspace_id, last_id)
-            for event in events:
-                await ws.send_json(event)
-            await asyncio.sleep(1)
-    except WebSocketDisconnect:
+        await asyncio.wait({sender, closed}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in (sender, closed):
+            task.cancel()
+        results = await asyncio.gather(sender, closed, return_exceptions=True)
+    for result in results:
+        if isinstance(result, Exception) and not isinstance(result, WebSocketDisconnect):
+            raise result
+
+
+def _metric_set(metrics: str | None) -> frozenset[str]:
+    return frozenset(part.strip() for part in (metrics or "").split(",") if part.strip())
+
+
+async def _kpi_sse_generator(workspace_id: str, metrics: frozenset[str]) -> AsyncGenerator[str, None]:
+    async with aclosing(kpi_delta_stream(workspace_id, "sse", metrics)) as stream:
+        async for deltas in stream:
+            if deltas is None:
+                yield ": keepalive\n\n"
+                continue
+            yield f"event: kpi\ndata: {wire_batch(deltas).decode()}\n\n"
+
+
+@router.get("/kpis/stream")
+async def stream_kpis_sse(
+    workspace_id: str = Query(default_factory=lambda: get_settings().default_workspace_id),
+    metrics: str | None = Query(default=None),
+) -> StreamingResponse:
+    if not get_settings().kpi_stream_enabled:
+        raise HTTPException(status_code=404, detail="kpi stream is disabled")
+    return StreamingResponse(
+        _kpi_sse_generator(workspace_id, _metric_set(metrics)),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no",
+        },
+    )
+
+
+async def _send_kpi_deltas(ws: WebSocket, workspace_id: str, metrics: frozenset[str]) -> None:
+    async with aclosing(kpi_delta_stream(workspace_id, "ws", metrics)) as stream:
+        async for deltas in stream:
+            if deltas:
+                await ws.send_text(wire_batch(deltas).decode())
+
+
+@router.websocket("/ws/kpis")
+async def websocket_kpis(ws: WebSocket) -> None:
+    if not get_settings().kpi_stream_enabled:
+        await ws.close(code=1008, reason="kpi stream is disabled")
         return
+    await ws.accept()
+    workspace_id = ws.query_params.get("workspace_id", get_settings().default_workspace_id)
+    metrics = _metric_set(ws.query_params.get("metrics"))
+
+    sender = asyncio.create_task(_send_kpi_deltas(ws, workspace_id, metrics))
+    closed = asyncio.create_task(_wait_disconnect(ws))
+    try:
+        await asyncio.wait({sender, closed}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in (sender, closed):
+            task.cancel()
+        results = await asyncio.gather(sender, closed, return_exceptions=True)
+    for result in results:
+        if isinstance(result, Exception) and not isinstance(result, WebSocketDisconnect):
+            raise result
@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import math
+import random
+from statistics import mean, median, pstdev
+from typing import Any
+
+import pytest
+
+from app.sonification.features import compute_anomaly_features, compute_anomaly_features_many
+
+# Frozen copy of the statistics-based feature engine that the vectorized one
+# replaced; the vectorized results must stay interchangeable with it.
+
+
+def _baseline_rolling_mean(values: list[float], index: int, window: int = 10) -> float:
+    start = max(0, index - window + 1)
+    sample = values[start : index + 1]
+    return sum(sample) / len(sample)
+
+
+def _baseline_linear_slope(values: list[float]) -> float:
+    n = len(values)
+    if n < 2:
+        return 0.0
+    x_mean = (n - 1) / 2
+    y_mean = sum(values) / n
+    numerator = sum((i - x_mean) * (v - y_mean) for i, v in enumerate(values))
+    denominator = sum((i - x_mean) ** 2 for i in range(n)) or 1.0
+    return numerator / denominator
+
+
+def baseline_features(values: list[float], severity_hint: int | None = None) -> dict[str, Any]:
+    if len(values) < 8:
+        return {
+            "trend": 0.0,
+            "volatility": 0.0,
+            "residual": 0.0,
+            "robust_z": 0.0,
+            "change_point": 0.0,
+            "confidence": 0.5,
+            "severity": severity_hint or 0,
+        }
+
+    med = median(values)
+    deviations = [abs(v - med) for v in values]
+    mad = median(deviations) or 1e-6
+    robust_z = abs((values[-1] - med) / (1.4826 * mad + 1e-6))
+
+    residuals = [v - _baseline_rolling_mean(values, idx, window=12) for idx, v in enumerate(values)]
+    residual_mu = mean(residuals)
+    residual_sigma = pstdev(residuals) or 1e-6
+    residual_z = abs((residuals[-1] - residual_mu) / residual_sigma)
+
+    tail = values[-30:]
+    recent = tail[-20:] if len(tail) >= 20 else tail
+    level = abs(mean(recent)) + 1e-6
+    volatility = (pstdev(recent) or 0.0) / level
+
+    trend = _baseline_linear_slope(tail)
+    trend_norm = max(-1.0, min(1.0, trend / (level / 12 + 1e-6)))
+
+    change_point = abs(tail[-1] - tail[-2]) / ((pstdev(recent) or 1.0) + 1e-6)
+    confidence = max(0.05, min(1.0, 1.0 - min(volatility, 1.0) * 0.7))
+
+    severity = severity_hint
+    if severity is None:
+        severity = int(max(0.0, min(100.0, (robust_z * 24) + (residual_z * 20) + (change_point * 14) + (volatility * 45))))
+
+    return {
+        "trend": float(trend_norm),
+        "volatility": float(volatility),
+        "residual": float(residual_z),
+        "robust_z": float(robust_z),
+        "change_point": float(change_point),
+        "confidence": float(confidence),
+        "severity": int(severity),
+    }
+
+
+FLOAT_KEYS = ("trend", "volatility", "residual", "robust_z", "change_point", "confidence")
+
+
+def assert_parity(actual: dict[str, Any], expected: dict[str, Any]) -> None:
+    assert actual.keys() == expected.keys()
+    for key in FLOAT_KEYS:
+        assert math.isclose(actual[key], expected[key], rel_tol=1e-9, abs_tol=1e-9), key
+    assert actual["severity"] == expected["severity"]
+
+
+def _series(rng: random.Random, length: int) -> list[float]:
+    base = rng.uniform(-500.0, 5000.0)
+    scale = rng.uniform(0.1, 50.0)
+    values = [base + rng.gauss(0.0, scale) + idx * rng.uniform(-1.0, 1.0) for idx in range(length)]
+    if length and rng.random() < 0.5:
+        values[-1] += rng.choice((-1, 1)) * scale * rng.uniform(2.0, 12.0)
+    return values
+
+
+RAGGED = [_series(random.Random(seed), length) for seed, length in enumerate([0, 1, 2, 7, 8, 9, 12, 13, 20, 21, 30, 31, 90, 180])]
+
+
+def test_many_matches_baseline_on_ragged_batch() -> None:
+    results = compute_anomaly_features_many(RAGGED)
+    assert len(results) == len(RAGGED)
+    for values, actual in zip(RAGGED, results):
+        assert_parity(actual, baseline_features(values))
+
+
+@pytest.mark.parametrize("values", RAGGED, ids=[f"len{len(values)}" for values in RAGGED])
+def test_wrapper_matches_baseline(values: list[float]) -> None:
+    assert_parity(compute_anomaly_features(values), baseline_features(values))
+
+
+def test_empty_batch() -> None:
+    assert compute_anomaly_features_many([]) == []
+
+
+@pytest.mark.parametrize("length", [0, 1, 7])
+def test_short_series_get_defaults(length: int) -> None:
+    values = [float(idx) for idx in range(length)]
+    assert compute_anomaly_features(values) == baseline_features(values)
+    assert compute_anomaly_features(values, severity_hint=42) == baseline_features(values, severity_hint=42)
+
+
+@pytest.mark.parametrize("level", [0.0, 1.0, -3.5, 12_500.0])
+@pytest.mark.parametrize("length", [8, 25, 60])
+def test_constant_series(level: float, length: int) -> None:
+    values = [level] * length
+    assert_parity(compute_anomaly_features(values), baseline_features(values))
+
+
+def test_constant_series_with_spike() -> None:
+    values = [100.0] * 40 + [180.0]
+    assert_parity(compute_anomaly_features(values), baseline_features(values))
+
+
+def test_severity_hint_overrides() -> None:
+    values = _series(random.Random(7), 64)
+    assert compute_anomaly_features(values, severity_hint=17)["severity"] == 17
+    assert_parity(compute_anomaly_features(values, severity_hint=17), baseline_features(values, severity_hint=17))
+
+
+def test_severity_equal_on_random_series() -> None:
+    rng = random.Random(20260101)
+    series = [_series(rng, rng.randint(0, 240)) for _ in range(500)]
+    for values, actual in zip(series, compute_anomaly_features_many(series)):
+        assert actual["severity"] == baseline_features(values)["severity"]
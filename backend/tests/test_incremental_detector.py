@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import asyncio
+import random
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.agents.detector import IncrementalAnomalyDetector
+from app.sonification.features import compute_anomaly_features_many
+from app.sonification.rolling import RollingFeatureWindow
+from app.utils.time import utcnow
+
+WINDOW_MINUTES = 180
+LATENESS_SECONDS = 120
+
+
+# Answers recent_series the way RECENT_SERIES_QUERY does, from points held in memory.
+class FakeClickHouse:
+    def __init__(self) -> None:
+        self.points: dict[str, list[tuple[datetime, float]]] = {}
+
+    def add(self, metric: str, points: list[tuple[datetime, float]]) -> None:
+        self.points.setdefault(metric, []).extend(points)
+
+    async def recent_series(
+        self,
+        workspace_id: str,
+        minutes: int = 180,
+        since: datetime | None = None,
+        metrics: list[str] | None = None,
+    ) -> dict[str, list[tuple[datetime, float]]]:
+        start = utcnow() - timedelta(minutes=minutes)
+        floor = since or datetime.fromtimestamp(0, timezone.utc)
+        series = {}
+        for metric, points in self.points.items():
+            if metrics is not None and metric not in metrics:
+                continue
+            kept = sorted((ts, value) for ts, value in points if ts >= start and ts > floor)
+            if kept:
+                series[metric] = kept
+        return series
+
+
+def _series(end: datetime, count: int, step_seconds: int, rng: random.Random) -> list[tuple[datetime, float]]:
+    return [(end - timedelta(seconds=step_seconds * (count - 1 - i)), 100 + rng.gauss(0, 5)) for i in range(count)]
+
+
+def _assert_matches_batch(clickhouse: FakeClickHouse, windows: dict[str, RollingFeatureWindow]) -> None:
+    batch = asyncio.run(clickhouse.recent_series("ws", minutes=WINDOW_MINUTES))
+    assert sorted(windows) == sorted(batch)
+    names = sorted(batch)
+    expected = compute_anomaly_features_many([[value for _, value in batch[name]] for name in names])
+    for name, features in zip(names, expected):
+        window = windows[name]
+        assert list(zip(window.timestamps, window.values)) == batch[name]
+        actual = window.features()
+        assert actual["severity"] == features["severity"]
+        assert {key: actual[key] for key in features} == pytest.approx(features, rel=1e-9, abs=1e-12)
+
+
+def _detector() -> IncrementalAnomalyDetector:
+    # Resync only on the first cycle, so every later one is incremental.
+    return IncrementalAnomalyDetector(WINDOW_MINUTES, LATENESS_SECONDS, resync_cycles=10_000)
+
+
+def test_lagging_metric_keeps_every_point() -> None:
+    rng = random.Random(7)
+    now = utcnow()
+    clickhouse = FakeClickHouse()
+    clickhouse.add("fast", _series(now - timedelta(minutes=30), 60, 30, rng))
+    clickhouse.add("slow", _series(now - timedelta(minutes=60), 60, 30, rng))
+    detector = _detector()
+    _assert_matches_batch(clickhouse, asyncio.run(detector.refresh(clickhouse, "ws")))
+
+    # The fast metric moves on first; the slow one catches up a cycle later
+    # with points well behind the fast metric's newest.
+    clickhouse.add("fast", _series(now, 10, 60, rng))
+    _assert_matches_batch(clickhouse, asyncio.run(detector.refresh(clickhouse, "ws")))
+    clickhouse.add("slow", _series(now - timedelta(minutes=45), 10, 60, rng))
+    windows = asyncio.run(detector.refresh(clickhouse, "ws"))
+    assert len(windows["slow"]) == 70
+    _assert_matches_batch(clickhouse, windows)
+
+
+def test_duplicate_timestamps_are_kept() -> None:
+    rng = random.Random(11)
+    now = utcnow()
+    points = _series(now - timedelta(minutes=5), 30, 30, rng)
+    points.append((points[-1][0], 250.0))
+    clickhouse = FakeClickHouse()
+    clickhouse.add("orders", points)
+    detector = _detector()
+    windows = asyncio.run(detector.refresh(clickhouse, "ws"))
+    assert len(windows["orders"]) == 31
+    _assert_matches_batch(clickhouse, windows)
+
+    # A second point at the newest timestamp, then ordinary new points.
+    clickhouse.add("orders", [(points[-1][0], 90.0)])
+    _assert_matches_batch(clickhouse, asyncio.run(detector.refresh(clickhouse, "ws")))
+    clickhouse.add("orders", _series(now, 5, 30, rng))
+    windows = asyncio.run(detector.refresh(clickhouse, "ws"))
+    assert len(windows["orders"]) == 37
+    _assert_matches_batch(clickhouse, windows)
+
+
+def test_late_point_inside_the_allowance_is_merged() -> None:
+    rng = random.Random(3)
+    now = utcnow()
+    points = _series(now - timedelta(minutes=1), 40, 10, rng)
+    clickhouse = FakeClickHouse()
+    clickhouse.add("orders", points)
+    detector = _detector()
+    asyncio.run(detector.refresh(clickhouse, "ws"))
+
+    clickhouse.add("orders", [(points[-3][0] + timedelta(seconds=5), 400.0), (now, 101.0)])
+    windows = asyncio.run(detector.refresh(clickhouse, "ws"))
+    assert len(windows["orders"]) == 42
+    _assert_matches_batch(clickhouse, windows)
@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app import kpi_stream
+from app.kpi_stream import BUCKET_MS, KpiDelta
+
+START = datetime(2026, 10, 17, tzinfo=timezone.utc)
+
+
+def _points(minutes: int, per_minute: int = 6) -> list[tuple[datetime, float]]:
+    step = 60 / per_minute
+    return [(START + timedelta(seconds=step * i), i + 0.123456789) for i in range(minutes * per_minute)]
+
+
+def test_small_delta_keeps_everything() -> None:
+    delta = KpiDelta.from_points("orders", _points(3), 100)
+    decoded = KpiDelta.from_wire(delta.wire())
+    assert len(decoded.points) == 18
+    assert len(decoded.rollup) == 3
+    assert decoded.dropped == 0
+    assert not decoded.refetch
+
+
+@pytest.mark.parametrize("minutes", [30, 300, 1440])
+def test_backfill_fits_in_a_notify(minutes: int) -> None:
+    delta = KpiDelta.from_points("orders", _points(minutes), 100)
+    full_rollup = dict(delta.rollup)
+    wire = delta.wire()
+    assert len(wire) < 8000
+    decoded = KpiDelta.from_wire(wire)
+    assert decoded.rollup
+    # Kept buckets are the newest ones, unchanged.
+    kept = sorted(decoded.rollup)
+    assert kept == sorted(full_rollup)[-len(kept) :]
+    assert all(decoded.rollup[bucket] == pytest.approx(full_rollup[bucket]) for bucket in kept)
+    assert decoded.refetch == (len(kept) < len(full_rollup))
+    assert all(ts_ms >= kept[0] for ts_ms, _ in decoded.points)
+    assert decoded.dropped + len(decoded.points) == minutes * 6
+
+
+def test_refetch_survives_merge() -> None:
+    backfill = KpiDelta.from_points("orders", _points(300), 100)
+    backfill.wire()
+    assert backfill.refetch
+    live = KpiDelta.from_points("orders", [(START + timedelta(minutes=301), 1.0)], 100)
+    merged = live.merge(backfill, 100)
+    assert merged.refetch
+    assert max(merged.rollup) == int((START + timedelta(minutes=301)).timestamp() * 1000) // BUCKET_MS * BUCKET_MS
+
+
+def test_oversized_delta_does_not_block_the_flush(monkeypatch: pytest.MonkeyPatch) -> None:
+    sent: list[list[str]] = []
+
+    async def fake_execute(_query: str, _channels: list[str], payloads: list[str]) -> str:
+        sent.append(payloads)
+        return "SELECT 1"
+
+    monkeypatch.setattr(kpi_stream, "execute", fake_execute)
+    publisher = kpi_stream.KpiDeltaPublisher(1.0, 100)
+    oversized = KpiDelta.from_points("m" * 9000, _points(1), 100)
+    backfill = KpiDelta.from_points("orders", _points(300), 100)
+    asyncio.run(publisher._send([("ws", oversized), ("ws", backfill)]))
+    assert len(sent) == 1
+    assert [KpiDelta.from_wire(payload.encode()).metric_name for payload in sent[0]] == ["orders"]
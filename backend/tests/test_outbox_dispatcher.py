@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import asyncio
+from datetime import timedelta
+from typing import Any
+
+import httpx
+import pytest
+
+from app.agents import n8n_client, outbox
+from app.agents.n8n_client import N8NClient
+from app.agents.outbox import OutboxDispatcher
+from app.agents.stub_n8n import build_app
+from app.utils.time import utcnow
+
+MAX_ATTEMPTS = 3
+
+
+def _row(outbox_id: int, webhook: str = "anomaly_correlator", attempts: int = 1) -> dict[str, Any]:
+    return {
+        "outbox_id": outbox_id,
+        "workspace_id": "ws",
+        "webhook": webhook,
+        "payload": '{"anomaly_id": "a-%d"}' % outbox_id,
+        "attempts": attempts,
+        "created_at": utcnow() - timedelta(seconds=5),
+    }
+
+
+# Delivers a batch through the real n8n client to the stub over ASGITransport
+# and returns how _settle would update each row, read from its statements.
+def _dispatch(
+    monkeypatch: pytest.MonkeyPatch,
+    rows: list[dict[str, Any]],
+    **stub_options: Any,
+) -> tuple[dict[str, Any], dict[str, Any]]:
+    stub = build_app(**stub_options)
+    settled: dict[str, Any] = {"delivered": [], "retry": {}, "failed": {}}
+
+    async def fake_execute(query: str, *args: Any) -> str:
+        if "status = 'delivered'" in query:
+            settled["delivered"] = list(args[0])
+        elif "status = 'failed'" in query:
+            settled["failed"] = dict(zip(args[0], args[1]))
+        else:
+            settled["retry"] = {outbox_id: (delay, error) for outbox_id, delay, error in zip(*args)}
+        return "UPDATE"
+
+    async def run() -> dict[str, Any]:
+        client = N8NClient()
+        client.settings = client.settings.model_copy(update={"n8n_mock_mode": False})
+        dispatcher = OutboxDispatcher(
+            client,
+            batch_size=len(rows),
+            concurrency=2,
+            max_attempts=MAX_ATTEMPTS,
+            retry_base_seconds=10.0,
+            retention_hours=1.0,
+        )
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=stub)) as http:
+            monkeypatch.setattr(n8n_client, "_http", http)
+            slots = asyncio.Semaphore(dispatcher.concurrency)
+            errors = await asyncio.gather(*(dispatcher._deliver(row, slots) for row in rows))
+            await dispatcher._settle(rows, errors)
+            return (await http.get("http://n8n/received")).json()
+
+    monkeypatch.setattr(outbox, "execute", fake_execute)
+    report = asyncio.run(run())
+    return settled, report
+
+
+def test_batch_is_delivered_and_unknown_webhooks_fail(monkeypatch: pytest.MonkeyPatch) -> None:
+    rows = [_row(1), _row(2, "incident_narrator"), _row(3, "no_such_hook")]
+    settled, report = _dispatch(monkeypatch, rows)
+    assert sorted(settled["delivered"]) == [1, 2]
+    assert settled["retry"] == {}
+    assert list(settled["failed"]) == [3]
+    assert settled["failed"][3].startswith("ValueError")
+    assert report["received"] == {"anomaly-correlator": 1, "incident-narrator": 1}
+
+
+def test_server_errors_retry_until_max_attempts(monkeypatch: pytest.MonkeyPatch) -> None:
+    rows = [_row(1, attempts=1), _row(2, attempts=2), _row(3, attempts=MAX_ATTEMPTS)]
+    settled, report = _dispatch(monkeypatch, rows, fail_rate=1.0, fail_status=503)
+    assert settled["delivered"] == []
+    assert sorted(settled["retry"]) == [1, 2]
+    # Jittered exponential backoff: base * 2 ** (attempts - 1), +-20%.
+    assert 8.0 <= settled["retry"][1][0] <= 12.0
+    assert 16.0 <= settled["retry"][2][0] <= 24.0
+    assert all(error.startswith("HTTPStatusError") for _, error in settled["retry"].values())
+    assert list(settled["failed"]) == [3]
+    assert report["failed"] == {"anomaly-correlator": 3}
+
+
+@pytest.mark.parametrize("status", [400, 404, 422])
+def test_client_errors_are_not_retried(monkeypatch: pytest.MonkeyPatch, status: int) -> None:
+    settled, _ = _dispatch(monkeypatch, [_row(1, attempts=1)], fail_rate=1.0, fail_status=status)
+    assert settled["retry"] == {}
+    assert list(settled["failed"]) == [1]
+
+
+@pytest.mark.parametrize("status", [408, 429])
+def test_throttling_statuses_are_retried(monkeypatch: pytest.MonkeyPatch, status: int) -> None:
+    settled, _ = _dispatch(monkeypatch, [_row(1, attempts=1)], fail_rate=1.0, fail_status=status)
+    assert list(settled["retry"]) == [1]
+    assert settled["failed"] == {}